@@ -0,0 +1,396 @@
+"""Load-test the HTTP server end to end against synthetic corpora and a local Mobius stub.
+
+For each corpus size the script generates an ``indexes.json`` with that many
+entries (same generator as bench_search.py) plus a set of multi-page PDFs, starts
+the server on it in a subprocess (``CONTENT_ASSETS_DIR``), starts a fake Mobius
+in-process (``MOBIUS_SCHEME=http``), and drives each scenario at a fixed
+concurrency:
+
+    python scripts/bench_load.py
+    python scripts/bench_load.py --sizes 1000,100000 --concurrency 32 --requests 2000
+    python scripts/bench_load.py --scenarios search_equality,askme --mobius-latency-ms 50
+    python scripts/bench_load.py --output after.json --baseline before.json
+
+Results (p50/p95/p99 latency, throughput, errors per scenario; startup time and
+peak RSS of the server per size) are written as JSON to ``--output`` (default
+stdout) together with the git commit, so runs can be compared across commits;
+``--baseline`` prints the change against an earlier result file. Generated
+corpora are deterministic for a given ``--seed``.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from bench_search import generate  # same directory
+from fake_mobius import FakeMobius
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SERVER = REPO_ROOT / "src" / "content_mcp_server.py"
+
+WORDS = ("account balance invoice payment schedule agreement customer policy coverage premium "
+         "deductible renewal term interest principal maturity statement service license fee "
+         "amendment party notice clause warranty liability termination effective date").split()
+
+# (method, path, json body, headers) for the i-th request of a scenario
+RequestSpec = Tuple[str, str, Optional[dict], Optional[dict]]
+
+
+# ------------------------------------------------------------------ corpus
+
+def _pdf_string(text: str) -> str:
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def write_pdf(path: Path, pages: List[List[str]]) -> None:
+    """Minimal PDF (Helvetica text, one content stream per page) that PyPDF2 can extract."""
+    objects: List[bytes] = []
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for pid, lines in zip(page_ids, pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>".encode()
+        )
+        ops = ["BT /F1 10 Tf 12 TL 50 750 Td"] + [f"{_pdf_string(line)} '" for line in lines] + ["ET"]
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def build_corpus(root: Path, size: int, documents: int, pages: int, seed: int) -> List[str]:
+    """Write ``root/indexes.json`` and PDFs for the first ``documents`` IDs; returns those IDs."""
+    if root.exists():
+        shutil.rmtree(root)
+    (root / "texts").mkdir(parents=True)
+    data = generate(size, seed)
+    (root / "indexes.json").write_text(json.dumps(data), encoding="utf-8")
+    rng = random.Random(seed)
+    doc_ids = list(data)[:documents]
+    for doc_id in doc_ids:
+        content = [
+            [f"{doc_id} page {page + 1}"]
+            + [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(40)]
+            for page in range(pages)
+        ]
+        write_pdf(root / doc_id, content)
+    return doc_ids
+
+
+# ------------------------------------------------------------------ server
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """Peak resident set size of a running process (Linux /proc), in MiB."""
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class Server:
+    """The content server in a subprocess, pointed at one corpus and the fake Mobius."""
+
+    def __init__(self, assets_dir: Path, mobius_port: int, env: Dict[str, str]):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.env = {
+            **os.environ,
+            "MCP_SERVER_MODE": "http",
+            "PORT": str(self.port),
+            "CONTENT_ASSETS_DIR": str(assets_dir),
+            "MOBIUS_SCHEME": "http",
+            "MOBIUS_SERVER": "127.0.0.1",
+            "MOBIUS_PORT": str(mobius_port),
+            "MOBIUS_REPOSITORY_ID": "bench",
+            "LOG_LEVEL": "WARNING",
+            **env,
+        }
+        self.process: Optional[subprocess.Popen] = None
+        self.startup_seconds: Optional[float] = None
+
+    def start(self, timeout: float = 120.0) -> None:
+        start = time.perf_counter()
+        self.process = subprocess.Popen([sys.executable, str(SERVER)], env=self.env, cwd=str(REPO_ROOT),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        while time.perf_counter() - start < timeout:
+            if self.process.poll() is not None:
+                raise SystemExit(f"Server exited during startup:\n{self.process.stderr.read().decode()}")
+            try:
+                if httpx.get(f"{self.base_url}/health", timeout=1.0).status_code == 200:
+                    self.startup_seconds = time.perf_counter() - start
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+        self.stop()
+        raise SystemExit(f"Server did not become healthy within {timeout:.0f}s")
+
+    def stop(self) -> Optional[float]:
+        """Stop the server; returns its peak RSS in MiB."""
+        if self.process is None:
+            return None
+        rss = peak_rss_mb(self.process.pid)
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        if rss is None:
+            # Not Linux: the largest child seen so far (KiB on Linux, bytes on macOS)
+            maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            rss = maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+        self.process = None
+        return rss
+
+
+# ---------------------------------------------------------------- scenarios
+
+def scenarios(doc_ids: List[str], size: int, pages: int) -> Dict[str, Tuple[Callable[[int], RequestSpec], Optional[int]]]:
+    """name -> (request factory, fixed request count or None for --requests)."""
+    customers = max(size // 50, 10)
+    auth = {"Authorization": "Basic " + base64.b64encode(b"bench:bench").decode()}
+    doc = lambda i: doc_ids[i % len(doc_ids)]  # noqa: E731
+    return {
+        # Every document once, before anything has extracted it
+        "document_cold": (lambda i: ("GET", f"/api/v1/documents/{doc_ids[i]}/json", None, None), len(doc_ids)),
+        "health": (lambda i: ("GET", "/health", None, None), None),
+        "indexes": (lambda i: ("GET", "/api/v1/indexes?facets=true&max_values=10", None, None), None),
+        "search_equality": (lambda i: ("POST", "/api/v1/search", {
+            "filters": {"customer": [f"Customer {i % customers}"]}, "limit": 50}, None), None),
+        "search_range_sorted": (lambda i: ("POST", "/api/v1/search", {
+            "filters": {"invoice_amount": ["between 4000..7000"]}, "limit": 50,
+            "sort_by": "invoice_amount", "order": "desc"}, None), None),
+        "search_grammar": (lambda i: ("POST", "/api/v1/search", {
+            "filters": {"document_type": ["!loan agreement"], "issued": [">=2024-06-01"], "customer": ["customer 1*"]},
+            "limit": 50}, None), None),
+        "document_text": (lambda i: ("GET", f"/api/v1/document_text?doc_id={doc(i)}", None, None), None),
+        "document_page": (lambda i: ("GET", f"/api/v1/documents/{doc(i)}/json?page={i % pages + 1}", None, None), None),
+        "documents_batch": (lambda i: ("POST", "/api/v1/documents/batch", {
+            "doc_ids": [doc(i + k) for k in range(10)], "max_chars": 2000}, None), None),
+        # A distinct question each time, so the answer cache (if enabled) never hits
+        "askme": (lambda i: ("POST", "/askme", {"userQuery": f"What is the balance of account {i}?"}, auth), None),
+    }
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+async def drive(client: httpx.AsyncClient, factory: Callable[[int], RequestSpec], count: int,
+                concurrency: int) -> Dict[str, Any]:
+    """Send ``count`` requests from ``concurrency`` workers; latency in ms, errors are non-2xx/3xx or failures."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < count:
+            i = next_index
+            next_index += 1
+            method, path, body, headers = factory(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                await response.aread()
+                status = str(response.status_code)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, count))))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    errors = sum(n for status, n in statuses.items() if not (status.isdigit() and int(status) < 400))
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+    }
+
+
+async def run_size(server: Server, doc_ids: List[str], size: int, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    available = scenarios(doc_ids, size, args.pages)
+    selected = [name for name in available if name in args.scenarios]
+    results = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=server.base_url, limits=limits, timeout=args.timeout) as client:
+        for name in selected:
+            factory, fixed = available[name]
+            if fixed is None and args.warmup:
+                await drive(client, factory, args.warmup, args.concurrency)
+            result = await drive(client, factory, fixed or args.requests, args.concurrency)
+            results.append({"size": size, "scenario": name, "concurrency": args.concurrency, **result})
+            lat = result["latency_ms"]
+            print(f"  {name:<22}{result['requests']:>7}{result['errors']:>7}{result['throughput_rps']:>10.1f}"
+                  f"{lat['p50']:>10.2f}{lat['p95']:>10.2f}{lat['p99']:>10.2f}", file=sys.stderr)
+    return results
+
+
+# ------------------------------------------------------------------ report
+
+def git_revision() -> Dict[str, Any]:
+    def git(*cmd: str) -> str:
+        return subprocess.run(["git", *cmd], cwd=str(REPO_ROOT), capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "src"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def compare(results: List[Dict[str, Any]], baseline_file: Path) -> None:
+    baseline = json.loads(baseline_file.read_text(encoding="utf-8"))
+    before = {(r["size"], r["scenario"]): r for r in baseline["results"]}
+    print(f"\nChange vs {baseline_file} ({(baseline.get('git') or {}).get('commit') or 'unknown commit'}):",
+          file=sys.stderr)
+    print(f"  {'size':>9} {'scenario':<22}{'p50':>10}{'p95':>10}{'p99':>10}{'rps':>10}", file=sys.stderr)
+    for result in results:
+        old = before.get((result["size"], result["scenario"]))
+        if old is None:
+            continue
+
+        def change(new: float, prev: float) -> str:
+            return f"{(new - prev) / prev * 100:+.1f}%" if prev else "n/a"
+
+        lat, old_lat = result["latency_ms"], old["latency_ms"]
+        print(f"  {result['size']:>9,} {result['scenario']:<22}{change(lat['p50'], old_lat['p50']):>10}"
+              f"{change(lat['p95'], old_lat['p95']):>10}{change(lat['p99'], old_lat['p99']):>10}"
+              f"{change(result['throughput_rps'], old['throughput_rps']):>10}", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Index entries per corpus")
+    parser.add_argument("--documents", type=int, default=100, help="PDFs per corpus")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per PDF")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="Unrecorded requests before each scenario")
+    parser.add_argument("--scenarios", default=None, help="Comma-separated subset of the scenarios")
+    parser.add_argument("--mobius-latency-ms", type=float, default=100.0)
+    parser.add_argument("--mobius-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", type=Path, default=None, help="Where corpora are generated (default: a temp dir)")
+    parser.add_argument("--server-env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra server setting, e.g. INDEX_BACKEND=columnar (repeatable)")
+    parser.add_argument("--output", type=Path, default=None, help="Write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", type=Path, default=None, help="Earlier --output file to compare against")
+    args = parser.parse_args()
+
+    names = list(scenarios(["x"], 1, 1))
+    args.scenarios = names if args.scenarios is None else [s.strip() for s in args.scenarios.split(",")]
+    unknown = set(args.scenarios) - set(names)
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s): {', '.join(sorted(unknown))}; choose from {', '.join(names)}")
+    # EXTRACTION_WORKERS=0 keeps extraction in the server process, so its peak RSS covers it
+    server_env = {"EXTRACTION_WORKERS": "0"}
+    server_env.update(item.split("=", 1) for item in args.server_env)
+
+    mobius = FakeMobius(latency_ms=args.mobius_latency_ms, jitter_ms=args.mobius_jitter_ms, seed=args.seed)
+    mobius_port = mobius.start()
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="bench_load_"))
+    results: List[Dict[str, Any]] = []
+    servers: List[Dict[str, Any]] = []
+    try:
+        for size in (int(s) for s in args.sizes.split(",")):
+            start = time.perf_counter()
+            doc_ids = build_corpus(workdir / f"corpus_{size}", size, args.documents, args.pages, args.seed)
+            generate_s = time.perf_counter() - start
+            server = Server(workdir / f"corpus_{size}", mobius_port, server_env)
+            server.start()
+            print(f"\n{size:,} index entries, {len(doc_ids)} PDFs x {args.pages} pages "
+                  f"(generated in {generate_s:.1f}s, server ready in {server.startup_seconds:.2f}s)", file=sys.stderr)
+            print(f"  {'scenario':<22}{'reqs':>7}{'errs':>7}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+                  file=sys.stderr)
+            try:
+                results += asyncio.run(run_size(server, doc_ids, size, args))
+            finally:
+                rss = server.stop()
+            servers.append({"size": size, "startup_s": round(server.startup_seconds, 3),
+                            "peak_rss_mb": None if rss is None else round(rss, 1)})
+            print(f"  peak RSS {rss:.1f} MiB" if rss is not None else "  peak RSS unavailable", file=sys.stderr)
+    finally:
+        mobius.stop()
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "settings": {
+            "documents": args.documents, "pages": args.pages, "concurrency": args.concurrency,
+            "requests": args.requests, "warmup": args.warmup, "seed": args.seed,
+            "mobius_latency_ms": args.mobius_latency_ms, "mobius_jitter_ms": args.mobius_jitter_ms,
+            "server_env": server_env,
+        },
+        "servers": servers,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
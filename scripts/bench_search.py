@@ -0,0 +1,146 @@
+"""Benchmark /api/v1/search filtering: indexed QueryEngine vs. the original linear scan.
+
+Generates synthetic index data at several sizes, checks that the JSON-backed and
+columnar (INDEX_BACKEND=columnar) engines return the same results as the scan,
+and prints per-query latency:
+
+    python scripts/bench_search.py
+    python scripts/bench_search.py --sizes 10000,100000 --repeat 20
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+from columnar_index import ColumnarIndex, ColumnarQueryEngine, write_columnar  # noqa: E402
+from query_engine import QueryEngine  # noqa: E402
+from search_filters import _MISSING, parse_filters  # noqa: E402
+
+DOCUMENT_TYPES = ["Software License Agreement", "Loan Agreement", "Auto Insurance Policy",
+                  "Master Services Agreement", "Investment Advisory Agreement"]
+
+QUERIES = {
+    "customer equality": {"customer": ["Customer 42"]},
+    "invoice > 9000": {"invoice_amount": [">9000"]},
+    "balance < 10": {"balance": ["<10"]},
+    "type + invoice > 5000": {"document_type": ["loan agreement"], "invoice_amount": [">5000"]},
+    "customer + balance > 0": {"customer": ["customer 7", "customer 8"], "balance": [">0"]},
+}
+
+# Filter grammar added after the original scan; checked against grammar_scan() instead
+GRAMMAR_QUERIES = {
+    "invoice 4000..7000 + G*": {"invoice_amount": ["between 4000..7000"], "customer": ["customer 1*"]},
+    "issued in March": {"issued": ["between 2024-03-01..2024-03-31"]},
+    "not loan + balance>=1000": {"document_type": ["!loan agreement"], "balance": [">=1000"]},
+}
+
+
+def generate(count: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    customers = max(count // 50, 10)
+    data = {}
+    for i in range(count):
+        meta = {
+            "document_type": rng.choice(DOCUMENT_TYPES),
+            "customer": f"Customer {rng.randrange(customers)}",
+            "issued": f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+        }
+        # Some documents have no amounts, like 000005.pdf in the sample index
+        if rng.random() < 0.9:
+            meta["invoice_amount"] = rng.randrange(100, 10000)
+            meta["balance"] = rng.choice([0, 0, 50, rng.randrange(0, 2000)])
+        data[f"{i:08d}.pdf"] = meta
+    return data
+
+
+def scan_search(idx: dict, filters: dict) -> list:
+    """The pre-index implementation of search_indexes(), kept as the reference."""
+    matches = []
+    for docid, meta in idx.items():
+        ok = True
+        for key, vals in filters.items():
+            if key not in meta:
+                ok = False
+                break
+            value = meta.get(key)
+            val_str = str(value)
+            matched_any = False
+            for v in vals:
+                if isinstance(value, (int, float)) and (v.startswith('>') or v.startswith('<')):
+                    try:
+                        cmp_val = float(v[1:])
+                        if v[0] == '>' and float(value) > cmp_val:
+                            matched_any = True
+                            break
+                        if v[0] == '<' and float(value) < cmp_val:
+                            matched_any = True
+                            break
+                    except Exception:
+                        continue
+                else:
+                    if val_str.lower() == str(v).lower():
+                        matched_any = True
+                        break
+            if not matched_any:
+                ok = False
+                break
+        if ok:
+            matches.append(docid)
+    return matches
+
+
+def grammar_scan(idx: dict, filters: dict) -> list:
+    parsed = parse_filters(filters)
+    return [docid for docid, meta in idx.items() if all(f.matches(meta.get(f.field, _MISSING)) for f in parsed)]
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        data = generate(size)
+        start = time.perf_counter()
+        engine = QueryEngine(data)
+        build_ms = (time.perf_counter() - start) * 1000
+        with tempfile.TemporaryDirectory() as tmp:
+            columnar_file = Path(tmp) / "indexes.cidx"
+            write_columnar(data, columnar_file)
+            start = time.perf_counter()
+            columnar = ColumnarQueryEngine(ColumnarIndex(columnar_file))
+            load_ms = (time.perf_counter() - start) * 1000
+            print(f"\n{size:,} documents (index build {build_ms:,.0f} ms, columnar load {load_ms:,.1f} ms)")
+            print(f"  {'query':<24}{'hits':>9}{'scan ms':>12}{'indexed ms':>12}{'speedup':>10}{'columnar ms':>13}")
+            queries = [(name, filters, scan_search) for name, filters in QUERIES.items()]
+            queries += [(name, filters, grammar_scan) for name, filters in GRAMMAR_QUERIES.items()]
+            for name, filters, scan in queries:
+                expected = scan(data, filters)
+                actual = engine.search(filters)
+                if actual != expected or columnar.search(filters) != expected:
+                    raise SystemExit(f"Result mismatch for {name!r} at {size} documents")
+                scan_ms = timed(lambda: scan(data, filters), max(1, args.repeat // 2))
+                indexed_ms = timed(lambda: engine.search(filters), args.repeat)
+                columnar_ms = timed(lambda: columnar.search(filters), args.repeat)
+                print(f"  {name:<24}{len(actual):>9,}{scan_ms:>12.2f}{indexed_ms:>12.3f}"
+                      f"{scan_ms / max(indexed_ms, 1e-6):>9.0f}x{columnar_ms:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Measure cold-start time: module import per run mode and the first requests of a fresh HTTP server.
+
+Every run starts a new interpreter, so only the OS page cache carries over:
+
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --runs 10 --size 100000
+    python scripts/bench_startup.py --output after.json --baseline before.json
+
+Measurements (median, min and max over ``--runs``):
+
+* ``import_<mode>_s`` - ``import content_mcp_server`` with ``MCP_SERVER_MODE=<mode>``
+  (``http``, which is also the Lambda path, and ``mcp`` when fastmcp is
+  installed); ``loaded`` lists the heavy optional modules that import pulled in
+* ``process_<mode>_s`` - the same, including interpreter startup
+* ``ready_s`` / ``warm_s`` - from spawning the HTTP server to its first ``/health``
+  response, and until ``/api/health`` reports ready
+* ``first_<request>_ms`` - latency of the first search, document text (extracted
+  on demand), ``/askme`` (against the local Mobius stub) and Salesforce OpenAPI
+  request on a fresh server, sent ``--settle`` seconds after it is ready (default
+  0, like a cold Lambda invocation; use e.g. ``--settle 2`` for a long-running
+  server that has finished its background warm-up)
+
+Pass ``--server-env AWS_LAMBDA_FUNCTION_NAME=bench`` to start the server the way
+it runs on Lambda.
+
+Results are written as JSON to ``--output`` (default stdout) together with the
+git commit; ``--baseline`` prints the change against an earlier result file.
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from bench_load import REPO_ROOT, SERVER, build_corpus, free_port, git_revision  # same directory
+from fake_mobius import FakeMobius
+
+HEAVY_MODULES = ("fastapi", "pydantic", "uvicorn", "httpx", "PyPDF2", "fastmcp")
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+import content_mcp_server
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(mode: str) -> Dict[str, Any]:
+    env = {**os.environ, "MCP_SERVER_MODE": mode}
+    probe = IMPORT_PROBE.format(src=str(REPO_ROOT / "src"), heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    done = subprocess.run([sys.executable, "-c", probe], env=env, cwd=str(REPO_ROOT), capture_output=True, text=True)
+    process_s = time.perf_counter() - start
+    if done.returncode != 0:
+        raise RuntimeError(done.stderr.strip().splitlines()[-1] if done.stderr.strip() else f"exit {done.returncode}")
+    result = json.loads(done.stdout.strip().splitlines()[-1])
+    return {"import_s": result["seconds"], "process_s": process_s, "loaded": result["loaded"]}
+
+
+def first_requests(doc_id: str) -> Dict[str, tuple]:
+    auth = {"Authorization": "Basic " + base64.b64encode(b"bench:bench").decode()}
+    return {
+        "search": ("POST", "/api/v1/search", {"filters": {"customer": ["Customer 1"]}, "limit": 50}, None),
+        "document_text": ("GET", f"/api/v1/document_text?doc_id={doc_id}", None, None),
+        "askme": ("POST", "/askme", {"userQuery": "What is the balance of account 42?"}, auth),
+        "openapi": ("GET", "/openapi_salesforce.json", None, None),
+    }
+
+
+def measure_server(assets_dir: Path, mobius_port: int, doc_id: str, server_env: Dict[str, str],
+                   settle: float = 0.0, timeout: float = 120.0) -> Dict[str, float]:
+    """Start a fresh HTTP server, time its readiness and first requests, and stop it."""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "MCP_SERVER_MODE": "http",
+        "PORT": str(port),
+        "CONTENT_ASSETS_DIR": str(assets_dir),
+        "MOBIUS_SCHEME": "http",
+        "MOBIUS_SERVER": "127.0.0.1",
+        "MOBIUS_PORT": str(mobius_port),
+        "MOBIUS_REPOSITORY_ID": "bench",
+        "LOG_LEVEL": "WARNING",
+        **server_env,
+    }
+    result: Dict[str, float] = {}
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, str(SERVER)], env=env, cwd=str(REPO_ROOT),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        with httpx.Client(base_url=base_url, timeout=timeout) as client:
+            for key, path in (("ready_s", "/health"), ("warm_s", "/api/health")):
+                while True:
+                    if process.poll() is not None:
+                        raise RuntimeError(f"Server exited during startup:\n{process.stderr.read().decode()}")
+                    if time.perf_counter() - start > timeout:
+                        raise RuntimeError(f"Server did not become ready within {timeout:.0f}s")
+                    try:
+                        if client.get(path).status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        pass
+                    time.sleep(0.002)
+                result[key] = time.perf_counter() - start
+            time.sleep(settle)
+            for name, (method, path, body, headers) in first_requests(doc_id).items():
+                request_start = time.perf_counter()
+                response = client.request(method, path, json=body, headers=headers)
+                result[f"first_{name}_ms"] = (time.perf_counter() - request_start) * 1000
+                if response.status_code >= 400:
+                    raise RuntimeError(f"{method} {path} returned {response.status_code}: {response.text[:200]}")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return result
+
+
+def summarize(samples: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        key: {
+            "median": round(statistics.median(s[key] for s in samples), 4),
+            "min": round(min(s[key] for s in samples), 4),
+            "max": round(max(s[key] for s in samples), 4),
+        }
+        for key in samples[0]
+    }
+
+
+def compare(metrics: Dict[str, Dict[str, float]], baseline_file: Path) -> None:
+    baseline = json.loads(baseline_file.read_text(encoding="utf-8"))
+    before = baseline["metrics"]
+    print(f"\nChange vs {baseline_file} ({(baseline.get('git') or {}).get('commit') or 'unknown commit'}):",
+          file=sys.stderr)
+    for key, value in metrics.items():
+        old = before.get(key)
+        if old is None or not old["median"]:
+            continue
+        change = (value["median"] - old["median"]) / old["median"] * 100
+        print(f"  {key:<26}{old['median']:>10.4f} -> {value['median']:<10.4f}{change:+.1f}%", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--size", type=int, default=10000, help="Index entries in the generated corpus")
+    parser.add_argument("--documents", type=int, default=20, help="PDFs in the generated corpus")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per PDF")
+    parser.add_argument("--settle", type=float, default=0.0, help="Seconds between readiness and the first requests")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", type=Path, default=None, help="Where the corpus is generated (default: a temp dir)")
+    parser.add_argument("--server-env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra server setting, e.g. INDEX_BACKEND=columnar (repeatable)")
+    parser.add_argument("--output", type=Path, default=None, help="Write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", type=Path, default=None, help="Earlier --output file to compare against")
+    args = parser.parse_args()
+
+    # EXTRACTION_WORKERS=0 extracts in the server process, so the first document
+    # request measures the extraction itself rather than starting a process pool
+    server_env = {"EXTRACTION_WORKERS": "0"}
+    server_env.update(item.split("=", 1) for item in args.server_env)
+
+    samples: Dict[str, List[Dict[str, float]]] = {}
+    loaded: Dict[str, List[str]] = {}
+    for mode in ("http", "mcp"):
+        try:
+            runs = [measure_import(mode) for _ in range(args.runs)]
+        except RuntimeError as exc:
+            print(f"Skipping {mode} import: {exc}", file=sys.stderr)
+            continue
+        loaded[mode] = runs[-1]["loaded"]
+        samples[mode] = [{f"import_{mode}_s": r["import_s"], f"process_{mode}_s": r["process_s"]} for r in runs]
+
+    mobius = FakeMobius(latency_ms=0.0)
+    mobius_port = mobius.start()
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="bench_startup_"))
+    try:
+        assets_dir = workdir / f"corpus_{args.size}"
+        doc_ids = build_corpus(assets_dir, args.size, args.documents, args.pages, args.seed)
+        server_runs = []
+        for run in range(args.runs):
+            # A different document each run, so every first document request extracts
+            server_runs.append(measure_server(assets_dir, mobius_port, doc_ids[run % len(doc_ids)], server_env,
+                                              args.settle))
+        samples["server"] = server_runs
+    finally:
+        mobius.stop()
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    metrics: Dict[str, Dict[str, float]] = {}
+    for group in samples.values():
+        metrics.update(summarize(group))
+    for key, value in metrics.items():
+        print(f"  {key:<26}median {value['median']:.4f}  (min {value['min']:.4f}, max {value['max']:.4f})",
+              file=sys.stderr)
+    for mode, modules in loaded.items():
+        print(f"  {mode} import loads: {', '.join(modules) or 'none of ' + ', '.join(HEAVY_MODULES)}", file=sys.stderr)
+
+    report = {
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "settings": {
+            "runs": args.runs, "size": args.size, "documents": args.documents, "pages": args.pages,
+            "settle": args.settle, "seed": args.seed, "server_env": server_env,
+        },
+        "loaded_modules": loaded,
+        "metrics": metrics,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.baseline:
+        compare(metrics, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
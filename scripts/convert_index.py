@@ -0,0 +1,53 @@
+"""Convert assets/indexes.json to the compact columnar format (assets/indexes.cidx).
+
+Run from the repository root after changing indexes.json:
+
+    python scripts/convert_index.py
+    python scripts/convert_index.py --input other.json --output other.cidx
+
+The server reads the columnar file when started with INDEX_BACKEND=columnar.
+The result is checked against the JSON index before the script exits.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+from columnar_index import ColumnarIndex, write_columnar  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert indexes.json to the columnar index format")
+    parser.add_argument("--input", type=Path, default=REPO_ROOT / "assets" / "indexes.json")
+    parser.add_argument("--output", type=Path, default=REPO_ROOT / "assets" / "indexes.cidx")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = json.loads(args.input.read_text(encoding="utf-8"))
+    parse_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    header = write_columnar(data, args.output)
+    write_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = ColumnarIndex(args.output)
+    load_s = time.perf_counter() - start
+    if list(index) != list(data) or any(index.row(pos) != meta for pos, meta in enumerate(data.values())):
+        print(f"Columnar index {args.output} does not match {args.input}")
+        sys.exit(1)
+
+    kinds = {field: spec["kind"] for field, spec in header["fields"].items()}
+    print(f"{len(data):,} documents, {len(kinds)} fields: "
+          + ", ".join(f"{field} ({kind})" for field, kind in kinds.items()))
+    print(f"{args.input.name}: {args.input.stat().st_size:,} bytes, parsed in {parse_s * 1000:.0f} ms")
+    print(f"{args.output.name}: {args.output.stat().st_size:,} bytes, written in {write_s * 1000:.0f} ms, "
+          f"mapped in {load_s * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Local stand-in for the Mobius conversation service, for load tests and manual /askme checks.
+
+Answers ``POST /mobius/rest/conversations`` after a configurable delay, over
+plain HTTP with keep-alive. Point the server at it with:
+
+    MOBIUS_SCHEME=http MOBIUS_SERVER=127.0.0.1 MOBIUS_PORT=9443 MOBIUS_REPOSITORY_ID=bench
+
+and run it standalone:
+
+    python scripts/fake_mobius.py --port 9443 --latency-ms 250 --jitter-ms 50
+
+``scripts/bench_load.py`` starts it in-process instead (``FakeMobius.start()``).
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+from typing import Optional
+
+PATH = "/mobius/rest/conversations"
+RESPONSE_TYPE = "application/vnd.conversation-response.v1+json"
+
+
+class FakeMobius:
+    """Minimal HTTP/1.1 server answering conversation requests after ``latency_ms`` (+/- ``jitter_ms``)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 200.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 7):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    async def serve(self) -> asyncio.AbstractServer:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    def start(self) -> int:
+        """Serve from a background thread (with its own event loop); returns the port."""
+        ready = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.serve())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="fake-mobius", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.port
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+
+    def _delay(self) -> float:
+        jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                status, payload = await self._respond(method, path, headers, body)
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: {RESPONSE_TYPE}\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method: str, path: str, headers: dict, body: bytes):
+        if method != "POST" or path.split("?", 1)[0] != PATH:
+            return "404 Not Found", {"error": f"No route for {method} {path}"}
+        if "authorization" not in headers:
+            return "401 Unauthorized", {"error": "Missing credentials"}
+        self.requests += 1
+        await asyncio.sleep(self._delay())
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.errors += 1
+            return "503 Service Unavailable", {"error": "Injected failure"}
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            return "400 Bad Request", {"error": "Invalid JSON"}
+        question = request.get("userQuery", "")
+        conversation = request.get("context", {}).get("conversation", "")
+        return "200 OK", {
+            "answer": f"Stub answer to: {question}",
+            "context": {"conversation": f"{conversation}|{self.requests}" if conversation else str(self.requests)},
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9443)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    fake = FakeMobius(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+
+    async def run() -> None:
+        server = await fake.serve()
+        print(f"Fake Mobius listening on http://{args.host}:{fake.port}{PATH}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
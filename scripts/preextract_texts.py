@@ -3,60 +3,176 @@
 Run from the repository root (or with Python path pointing here):
 
     python scripts/preextract_texts.py
+    python scripts/preextract_texts.py --workers 8 --force
+
+PDFs are extracted in parallel with the same code the server uses
+(src/pdf_text.py). Each PDF produces <stem>.txt plus a <stem>.pages.json page
+offset index used for paged retrieval. A manifest (assets/texts/.manifest.json)
+records each PDF's mtime, size and SHA-256 so unchanged files are skipped on the
+next run; output files are written atomically. A PDF that cannot be read gets
+neither a text file nor a manifest entry, so the next run tries it again, and
+the script exits with status 1. The full-text search index
+(assets/texts/.fulltext_index/) is then updated for the changed files.
 
 The script requires PyPDF2 (installed via requirements.txt).
 """
-from pathlib import Path
+import argparse
+import hashlib
+import json
+import os
 import sys
-
-try:
-    from PyPDF2 import PdfReader
-except Exception as exc:
-    print("PyPDF2 is required. Install with 'pip install PyPDF2' or 'pip install -r requirements.txt'")
-    raise
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
-ASSETS_DIR = REPO_ROOT / "assets"
-TEXT_DIR = ASSETS_DIR / "texts"
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+import pdf_text  # noqa: E402
+from fulltext_index import INDEX_DIR_NAME, FullTextIndex  # noqa: E402
+from pdf_text import extract_pages, page_index_path, write_pages, write_text_atomic  # noqa: E402
+
+MANIFEST_NAME = ".manifest.json"
+
 
-if not ASSETS_DIR.exists():
-    print(f"Assets directory not found at {ASSETS_DIR}")
-    sys.exit(1)
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-TEXT_DIR.mkdir(parents=True, exist_ok=True)
 
-pdf_files = sorted([p for p in ASSETS_DIR.glob("*.pdf") if p.is_file()])
-if not pdf_files:
-    print("No PDF files found in assets/ to process.")
-    sys.exit(0)
+def extract_one(pdf: str, out_file: str) -> dict:
+    """Worker: extract one PDF, write its text atomically and report timing; raises if the PDF can't be read."""
+    start = time.perf_counter()
+    pages = extract_pages(pdf, raise_errors=True)
+    extracted = write_pages(Path(out_file), pages)
+    return {
+        "pages": len(pages),
+        "chars": len(extracted),
+        "seconds": time.perf_counter() - start,
+        "sha256": file_sha256(Path(pdf)),
+    }
 
-summary = []
-for pdf in pdf_files:
+
+def load_manifest(path: Path) -> dict:
     try:
-        reader = PdfReader(str(pdf))
-        parts = []
-        for page in reader.pages:
-            try:
-                txt = page.extract_text() or ""
-            except Exception:
-                txt = ""
-            parts.append(txt)
-        extracted = "\n".join(parts)
-    except Exception as exc:
-        print(f"Failed to extract {pdf.name}: {exc}")
-        extracted = ""
-
-    out_file = TEXT_DIR / f"{pdf.stem}.txt"
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def is_unchanged(pdf: Path, out_file: Path, entry: dict) -> bool:
+    """True when the text file exists and the PDF matches its manifest entry."""
+    if not entry or not out_file.exists() or not page_index_path(out_file).exists():
+        return False
+    st = pdf.stat()
+    if entry.get("mtime_ns") == st.st_mtime_ns and entry.get("size") == st.st_size:
+        return True
+    # Touched but not modified (e.g. a fresh checkout): compare content hashes
+    if entry.get("sha256") == file_sha256(pdf):
+        entry["mtime_ns"], entry["size"] = st.st_mtime_ns, st.st_size
+        return True
+    return False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-extract PDF text into assets/texts/")
+    parser.add_argument("--assets-dir", type=Path, default=REPO_ROOT / "assets")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Extraction processes (default: number of CPUs)")
+    parser.add_argument("--force", action="store_true", help="Re-extract every PDF, ignoring the manifest")
+    args = parser.parse_args()
+
+    if pdf_text.load_pdf_reader() is None:
+        print("PyPDF2 is required. Install with 'pip install PyPDF2' or 'pip install -r requirements.txt'")
+        sys.exit(1)
+
+    assets_dir = args.assets_dir
+    text_dir = assets_dir / "texts"
+    if not assets_dir.exists():
+        print(f"Assets directory not found at {assets_dir}")
+        sys.exit(1)
+
+    text_dir.mkdir(parents=True, exist_ok=True)
+
+    pdf_files = sorted([p for p in assets_dir.glob("*.pdf") if p.is_file()])
+    if not pdf_files:
+        print("No PDF files found in assets/ to process.")
+        sys.exit(0)
+
+    manifest_path = text_dir / MANIFEST_NAME
+    manifest = {} if args.force else load_manifest(manifest_path)
+
+    todo = []
+    skipped = 0
+    for pdf in pdf_files:
+        out_file = text_dir / f"{pdf.stem}.txt"
+        if not args.force and is_unchanged(pdf, out_file, manifest.get(pdf.name, {})):
+            skipped += 1
+            continue
+        todo.append((pdf, out_file))
+
+    print(f"{len(pdf_files)} PDFs found, {skipped} unchanged, {len(todo)} to extract "
+          f"with {args.workers} worker(s)")
+
+    summary = []
+    total_pages = 0
+    total_bytes = 0
+    start = time.perf_counter()
     try:
-        out_file.write_text(extracted, encoding="utf-8")
-        print(f"WROTE: {out_file.relative_to(REPO_ROOT)} ({len(extracted)} chars)")
-        summary.append((pdf.name, True, len(extracted)))
-    except Exception as exc:
-        print(f"Failed to write text for {pdf.name}: {exc}")
-        summary.append((pdf.name, False, 0))
-
-print("\nSummary:")
-for name, ok, length in summary:
-    print(f" - {name}: {'ok' if ok else 'failed'} ({length} chars)")
-
-print(f"\nDone. Text files are under: {TEXT_DIR}")
+        with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+            futures = {pool.submit(extract_one, str(pdf), str(out)): (pdf, out) for pdf, out in todo}
+            for future in as_completed(futures):
+                pdf, out_file = futures[future]
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    print(f"Failed to extract {pdf.name}: {exc}")
+                    # No manifest entry, so the next run extracts it again
+                    manifest.pop(pdf.name, None)
+                    summary.append((pdf.name, False, 0, 0.0))
+                    continue
+
+                st = pdf.stat()
+                manifest[pdf.name] = {
+                    "mtime_ns": st.st_mtime_ns,
+                    "size": st.st_size,
+                    "sha256": result["sha256"],
+                    "pages": result["pages"],
+                    "chars": result["chars"],
+                }
+                total_pages += result["pages"]
+                total_bytes += st.st_size
+                print(f"WROTE: {out_file.relative_to(assets_dir.parent)} ({result['chars']} chars, "
+                      f"{result['pages']} pages, {result['seconds'] * 1000:.0f} ms)")
+                summary.append((pdf.name, True, result["chars"], result["seconds"]))
+    finally:
+        write_text_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+
+    elapsed = time.perf_counter() - start
+    print("\nSummary:")
+    for name, ok, length, seconds in sorted(summary):
+        print(f" - {name}: {'ok' if ok else 'failed'} ({length} chars, {seconds * 1000:.0f} ms)")
+
+    if todo and elapsed > 0:
+        print(f"\nThroughput: {len(summary) / elapsed:.1f} files/s, {total_pages / elapsed:.1f} pages/s, "
+              f"{total_bytes / elapsed / (1024 * 1024):.2f} MB/s over {elapsed:.2f}s")
+    fulltext = FullTextIndex(text_dir, text_dir / INDEX_DIR_NAME)
+    start = time.perf_counter()
+    updated = fulltext.refresh(save=False)
+    fulltext.save()
+    stats = fulltext.stats()
+    print(f"\nFull-text index: {updated} document(s) updated in {time.perf_counter() - start:.2f}s "
+          f"({stats['documents']} documents, {stats['terms']} terms)")
+
+    failed = sum(1 for _, ok, _, _ in summary if not ok)
+    if failed:
+        print(f"\n{failed} PDF(s) failed to extract; they will be retried on the next run.")
+        sys.exit(1)
+    print(f"\nDone. Text files are under: {text_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+TTL + LRU cache for ``/askme`` answers, with request coalescing.
+
+Entries are keyed by a hash of everything that can change Mobius' answer:
+repository ID, user query, conversation context and the caller's credentials.
+Concurrent misses for the same key share a single upstream call, which runs as
+its own task: a caller that disconnects is cancelled on its own, without
+cancelling the call the others are waiting for. Failed calls are never cached.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def answer_key(repository_id: str, user_query: str, conversation: str, credentials: Tuple[str, str]) -> str:
+    """Stable cache key; credentials are included so users never see answers fetched for someone else."""
+    raw = json.dumps([repository_id, user_query, conversation, list(credentials)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Bounded LRU of upstream answers that expire ``ttl`` seconds after they were fetched."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Task[Any]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]], bypass: bool = False) -> Tuple[Any, str]:
+        """Return ``(value, status)`` where status is HIT, MISS, COALESCED or BYPASS."""
+        if bypass or not self.enabled:
+            self.bypassed += 1
+            value = await fetch()
+            if bypass and self.enabled:
+                # A forced refresh still updates the cache for later callers
+                self._store(key, value)
+            return value, "BYPASS"
+
+        value = self._lookup(key)
+        if value is not None:
+            self.hits += 1
+            return value, "HIT"
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending), "COALESCED"
+
+        self.misses += 1
+        task = asyncio.ensure_future(fetch())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._fetched(key, done))
+        return await asyncio.shield(task), "MISS"
+
+    def _fetched(self, key: str, task: "asyncio.Task[Any]") -> None:
+        # Runs before any waiter resumes, so the answer is cached by the time they return
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # exception() also marks a failure retrieved, so it is not logged when nobody awaits it
+        if not task.cancelled() and task.exception() is None:
+            self._store(key, task.result())
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,578 @@
+"""
+Compact binary, column-oriented form of the document index (``indexes.cidx``).
+
+``indexes.json`` must be parsed into one Python dict per document. The
+columnar file is instead memory-mapped and read in place, so loading is
+near-instant and its pages are shared by every worker process that maps it.
+Each field is stored as one column:
+
+* fields whose values are all integers (or all finite floats) become typed
+  ``int64``/``float64`` arrays with a presence mask, plus the values in sorted
+  order (with their document positions) for ``>``/``<`` filters;
+* all other fields are dictionary-encoded: an ``int32`` code per document into
+  a table of distinct JSON-encoded values, with the positions of each value
+  stored contiguously (CSR postings) for equality filters.
+
+Sorted pages walk the same structures: the sorted numeric arrays, or each
+dictionary column's distinct values in sort order with their postings.
+
+Document IDs are a string table with the positions in doc_id order alongside,
+so lookups binary-search the mapped file instead of building a per-process
+dict; the field catalog (facets) is computed at conversion time and kept in
+the header. ``write_columnar()`` converts the JSON
+index; ``scripts/convert_index.py`` wraps it.
+
+Layout: ``b"CIDX"``, ``u32`` version, ``u64`` header length, the JSON header,
+then the arrays, each 8-byte aligned and referenced from the header by offset.
+"""
+
+import heapq
+import json
+import math
+import mmap
+import pathlib
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set
+
+try:
+    from .field_catalog import FieldCatalog
+    from .pdf_text import write_bytes_atomic
+    from .query_engine import MISSING, NUMBER, TEXT, QueryEngine, SortEntry, iteration_key, sort_entry, walk_sorted
+    from .search_filters import _MISSING, FieldFilter, Term, parse_filters
+except ImportError:  # src/ is on sys.path rather than imported as a package
+    from field_catalog import FieldCatalog
+    from pdf_text import write_bytes_atomic
+    from query_engine import MISSING, NUMBER, TEXT, QueryEngine, SortEntry, iteration_key, sort_entry, walk_sorted
+    from search_filters import _MISSING, FieldFilter, Term, parse_filters
+
+MAGIC = b"CIDX"
+FORMAT_VERSION = 1
+PREFIX = struct.Struct("<4sIQ")
+# /api/v1/indexes caps facet values at 1000 per field
+MAX_FACET_VALUES = 1000
+# Integers beyond 2**53 would compare differently once converted to float
+_MAX_EXACT_INT = 2 ** 53
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def _column_kind(values: List[Any]) -> str:
+    # type() rather than isinstance(): bools are not numbers here
+    if values and all(type(v) is int and -_MAX_EXACT_INT <= v <= _MAX_EXACT_INT for v in values):
+        return "int64"
+    if values and all(type(v) is float and math.isfinite(v) for v in values):
+        return "float64"
+    return "dict"
+
+
+class _Writer:
+    """Accumulates aligned arrays and returns header references to them."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, typecode: str, values: Iterable[Any]) -> Dict[str, Any]:
+        arr = values if isinstance(values, array) else array(typecode, values)
+        ref = {"offset": self.size, "type": typecode, "count": len(arr)}
+        self._append(arr.tobytes())
+        return ref
+
+    def add_bytes(self, raw: bytes) -> Dict[str, Any]:
+        ref = {"offset": self.size, "type": "B", "count": len(raw)}
+        self._append(raw)
+        return ref
+
+    def add_strings(self, strings: Iterable[str]) -> Dict[str, Any]:
+        offsets = array("Q", [0])
+        blobs = []
+        total = 0
+        for s in strings:
+            encoded = s.encode("utf-8")
+            blobs.append(encoded)
+            total += len(encoded)
+            offsets.append(total)
+        return {"offsets": self.add("Q", offsets), "blob": self.add_bytes(b"".join(blobs))}
+
+    def _append(self, raw: bytes) -> None:
+        padded = _align(len(raw))
+        self.chunks.append(raw)
+        if padded != len(raw):
+            self.chunks.append(b"\0" * (padded - len(raw)))
+        self.size += padded
+
+
+def write_columnar(data: Mapping[str, Mapping[str, Any]], path: pathlib.Path) -> Dict[str, Any]:
+    """Convert ``{doc_id: metadata}`` to the columnar format at ``path`` (atomically); returns the header."""
+    rows = list(data.values())
+    encoded_ids = [doc_id.encode("utf-8") for doc_id in data]
+    writer = _Writer()
+    header: Dict[str, Any] = {
+        "byteorder": sys.byteorder,
+        "documents": len(rows),
+        "doc_ids": writer.add_strings(data.keys()),
+        "doc_id_order": writer.add("I", sorted(range(len(rows)), key=encoded_ids.__getitem__)),
+        "catalog": FieldCatalog(data).to_dict(MAX_FACET_VALUES),
+        "fields": {},
+    }
+
+    field_order: Dict[str, None] = {}
+    for meta in rows:
+        field_order.update(dict.fromkeys(meta))
+
+    for field in field_order:
+        present = [(pos, meta[field]) for pos, meta in enumerate(rows) if field in meta]
+        kind = _column_kind([value for _, value in present])
+        column: Dict[str, Any] = {"kind": kind, "present": len(present)}
+        if kind == "dict":
+            codes = array("i", [-1]) * len(rows)
+            table: Dict[str, int] = {}
+            members: List[List[int]] = []
+            for pos, value in present:
+                code = table.setdefault(json.dumps(value, ensure_ascii=False), len(table))
+                if code == len(members):
+                    members.append([])
+                members[code].append(pos)
+                codes[pos] = code
+            offsets = array("I", [0])
+            positions = array("I")
+            for plist in members:
+                positions.extend(plist)
+                offsets.append(len(positions))
+            column.update(
+                codes=writer.add("i", codes),
+                values=writer.add_strings(table),
+                offsets=writer.add("I", offsets),
+                positions=writer.add("I", positions),
+            )
+        else:
+            typecode = "q" if kind == "int64" else "d"
+            values = array(typecode, [0]) * len(rows)
+            mask = bytearray(len(rows))
+            for pos, value in present:
+                values[pos] = value
+                mask[pos] = 1
+            ordered = sorted(present, key=lambda item: (item[1], item[0]))
+            column.update(
+                values=writer.add(typecode, values),
+                mask=writer.add_bytes(bytes(mask)),
+                sorted_values=writer.add(typecode, (value for _, value in ordered)),
+                sorted_positions=writer.add("I", (pos for pos, _ in ordered)),
+            )
+        header["fields"][field] = column
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    prefix = PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes))
+    padding = b"\0" * (_align(len(prefix) + len(header_bytes)) - len(prefix) - len(header_bytes))
+    write_bytes_atomic(path, [prefix, header_bytes, padding, *writer.chunks])
+    return header
+
+
+class _StringTable(Sequence[str]):
+    """UTF-8 strings decoded on access from an offsets array and a blob."""
+
+    def __init__(self, index: "ColumnarIndex", ref: Mapping[str, Any]):
+        self.offsets = index._array(ref["offsets"])
+        self.blob = index._array(ref["blob"])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        offsets = self.offsets
+        # offsets has one more entry than there are strings, so i + 1 bounds-checks i
+        return str(self.blob[offsets[i]:offsets[i + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        blob = self.blob.tobytes()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield blob[start:end].decode("utf-8")
+
+
+class _DictColumn:
+    kind = "dict"
+
+    def __init__(self, index: "ColumnarIndex", spec: Mapping[str, Any]):
+        self.present = spec["present"]
+        self.codes = index._array(spec["codes"])
+        self.table = _StringTable(index, spec["values"])
+        self.offsets = index._array(spec["offsets"])
+        self.positions = index._array(spec["positions"])
+        self._decoded: List[Any] = []
+        self._by_lower: Dict[str, List[int]] = {}
+        self._sort_groups: List[tuple] = []
+        self._segments: Dict[int, tuple] = {}
+
+    @property
+    def decoded(self) -> List[Any]:
+        # Decoded on first use: the number of distinct values is usually small
+        if not self._decoded and len(self.table):
+            self._decoded = json.loads("[" + ",".join(self.table) + "]")
+        return self._decoded
+
+    @property
+    def by_lower(self) -> Dict[str, List[int]]:
+        """``str(value).lower()`` -> codes, for the case-insensitive equality filters."""
+        if not self._by_lower and len(self.table):
+            by_lower: Dict[str, List[int]] = {}
+            for code, value in enumerate(self.decoded):
+                by_lower.setdefault(str(value).lower(), []).append(code)
+            self._by_lower = by_lower
+        return self._by_lower
+
+    @property
+    def sort_groups(self) -> List[tuple]:
+        """``((segment, sort value), codes)`` in ascending sort order, for sorted pages."""
+        if not self._sort_groups and len(self.table):
+            groups: Dict[tuple, List[int]] = {}
+            for code, value in enumerate(self.decoded):
+                groups.setdefault(sort_entry(value, 0)[:2], []).append(code)
+            self._sort_groups = sorted(groups.items())
+        return self._sort_groups
+
+    def segment(self, segment: int) -> tuple:
+        """``(offset, values)``: where ``segment``'s groups start in ``sort_groups``, and their sort values."""
+        if not self._segments and len(self.table):
+            for seg in (NUMBER, TEXT):
+                members = [i for i, ((s, _), _) in enumerate(self.sort_groups) if s == seg]
+                self._segments[seg] = (members[0] if members else 0,
+                                       [self.sort_groups[i][0][1] for i in members])
+        return self._segments.get(segment, (0, []))
+
+    def term_codes(self, term: Term) -> List[int]:
+        """Codes of the distinct values matching a single term (ignoring negation)."""
+        if term.kind == "equal":
+            return self.by_lower.get(term.text, [])
+        groups = self.sort_groups
+        if term.kind == "range":
+            offset, values = self.segment(NUMBER if term.numeric else TEXT)
+            lo, hi = term.span(values)
+            selected = groups[offset + lo:offset + hi]
+            if term.check is not None:
+                selected = [group for group in selected if term.check(group[0][1])]
+        else:
+            selected = [group for group in groups if group[0][0] == TEXT and term.regex.fullmatch(group[0][1])]
+        return [code for _, codes in selected for code in codes]
+
+    def walk(self, after: Optional[SortEntry], descending: bool) -> Iterator[SortEntry]:
+        """Positions that have the field as sort entries in page order, starting after ``after``."""
+        groups = self.sort_groups
+        keys = [group for group, _ in groups]
+        if after is None:
+            indices: Iterable[int] = range(len(groups) - 1, -1, -1) if descending else range(len(groups))
+        elif after[0] == MISSING:
+            return
+        elif descending:
+            indices = range(bisect_right(keys, after[:2]) - 1, -1, -1)
+        else:
+            indices = range(bisect_left(keys, after[:2]), len(groups))
+        for i in indices:
+            (segment, value), codes = groups[i]
+            if len(codes) == 1:
+                positions = self.postings(codes[0]).tolist()
+            else:
+                positions = list(heapq.merge(*(self.postings(code).tolist() for code in codes)))
+            if after is not None and keys[i] == after[:2]:
+                cut = bisect_left(positions, after[2]) if descending else bisect_right(positions, after[2])
+                positions = positions[:cut] if descending else positions[cut:]
+            for pos in (reversed(positions) if descending else positions):
+                yield (segment, value, pos)
+
+    def get(self, pos: int) -> Any:
+        code = self.codes[pos]
+        return _MISSING if code < 0 else self.decoded[code]
+
+    def count(self, code: int) -> int:
+        return self.offsets[code + 1] - self.offsets[code]
+
+    def postings(self, code: int) -> Sequence[int]:
+        return self.positions[self.offsets[code]:self.offsets[code + 1]]
+
+
+class _NumberColumn:
+    kind = "number"
+
+    def __init__(self, index: "ColumnarIndex", spec: Mapping[str, Any]):
+        self.present = spec["present"]
+        self.values = index._array(spec["values"])
+        self.mask = index._array(spec["mask"])
+        self.sorted_values = index._array(spec["sorted_values"])
+        self.sorted_positions = index._array(spec["sorted_positions"])
+
+    def get(self, pos: int) -> Any:
+        return self.values[pos] if self.mask[pos] else _MISSING
+
+    def walk(self, after: Optional[SortEntry], descending: bool) -> Iterator[SortEntry]:
+        for segment, value, pos in walk_sorted(self.sorted_values, self.sorted_positions, NUMBER, after, descending):
+            # Sort entries hold floats, like QueryEngine's numeric columns
+            yield (segment, float(value), pos)
+
+    def term_span(self, term: Term) -> slice:
+        """Slice of the sorted arrays that can match a single term (ignoring negation)."""
+        if term.kind == "range" and term.numeric:
+            return slice(*term.span(self.sorted_values))
+        if term.kind != "equal":
+            return slice(0, 0)
+        try:
+            number = float(term.text)
+        except ValueError:
+            return slice(0, 0)
+        if math.isnan(number):
+            return slice(0, 0)
+        # Equal numbers are candidates; the string comparison decides
+        return slice(bisect_left(self.sorted_values, number), bisect_right(self.sorted_values, number))
+
+
+class ColumnarIndex(Mapping[str, Dict[str, Any]]):
+    """Read-only, memory-mapped ``{doc_id: metadata}`` view of a columnar index file."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        with open(self.path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = PREFIX.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} columnar index")
+        header = json.loads(self._mmap[PREFIX.size:PREFIX.size + header_len])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{self.path} was written on a {header['byteorder']}-endian machine")
+        self._buffer = memoryview(self._mmap)
+        self._data_start = _align(PREFIX.size + header_len)
+
+        self.documents: int = header["documents"]
+        self.doc_ids = _StringTable(self, header["doc_ids"])
+        self.catalog = FieldCatalog.from_dict(header["catalog"])
+        self.columns: Dict[str, Any] = {
+            field: (_DictColumn if spec["kind"] == "dict" else _NumberColumn)(self, spec)
+            for field, spec in header["fields"].items()
+        }
+        if "doc_id_order" in header:
+            self._doc_id_order: Sequence[int] = self._array(header["doc_id_order"])
+        else:
+            # Written before the order was stored: sort once in this process
+            # (rerun scripts/convert_index.py to share it through the mapping)
+            blob = self.doc_ids.blob.tobytes()
+            offsets = self.doc_ids.offsets
+            self._doc_id_order = array("I", sorted(range(self.documents),
+                                                   key=lambda pos: blob[offsets[pos]:offsets[pos + 1]]))
+
+    def _array(self, ref: Mapping[str, Any]) -> memoryview:
+        start = self._data_start + ref["offset"]
+        size = ref["count"] * array(ref["type"]).itemsize
+        return self._buffer[start:start + size].cast(ref["type"])
+
+    def row(self, pos: int) -> Dict[str, Any]:
+        """Metadata of the document at ``pos``, with fields in first-seen order."""
+        row = {}
+        for field, column in self.columns.items():
+            value = column.get(pos)
+            if value is not _MISSING:
+                row[field] = value
+        return row
+
+    def position(self, doc_id: str) -> Optional[int]:
+        """Position of ``doc_id``, binary-searched in the mapped doc_id order (UTF-8 byte order)."""
+        key = doc_id.encode("utf-8")
+        order = self._doc_id_order
+        offsets = self.doc_ids.offsets
+        blob = self.doc_ids.blob
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = order[mid]
+            probe = blob[offsets[pos]:offsets[pos + 1]].tobytes()
+            if probe == key:
+                return pos
+            if probe < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def __getitem__(self, doc_id: str) -> Dict[str, Any]:
+        pos = self.position(doc_id)
+        if pos is None:
+            raise KeyError(doc_id)
+        return self.row(pos)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.doc_ids)
+
+    def __len__(self) -> int:
+        return self.documents
+
+
+class ColumnarQueryEngine(QueryEngine):
+    """``QueryEngine`` over a ``ColumnarIndex``, answering filters from the mapped columns.
+
+    The file is read-only, so upserts go to a small in-memory ``QueryEngine``
+    (``delta``) and the mapped positions they replace or delete are shadowed.
+    Each changed document keeps an order key (its mapped position when it
+    replaced one, otherwise after every mapped document) so results stay in
+    index order.
+    """
+
+    def __init__(self, index: ColumnarIndex):
+        self.index = index
+        self.doc_ids = index.doc_ids
+        self.deleted: Set[int] = set()
+        self.delta = QueryEngine({})
+        self.delta_order: Dict[str, int] = {}
+        self.delta_by_order: Dict[int, str] = {}
+        self.shadowed: Set[int] = set()
+        self._next_order = index.documents
+        self._lock = threading.RLock()
+
+    def get(self, doc_id: str) -> Optional[Mapping[str, Any]]:
+        with self._lock:
+            row = self.delta.get(doc_id)
+            if row is not None:
+                return row
+            pos = self.index.position(doc_id)
+            if pos is None or pos in self.shadowed:
+                return None
+            return self.index.row(pos)
+
+    def upsert(self, doc_id: str, meta: Mapping[str, Any]) -> int:
+        with self._lock:
+            if doc_id not in self.delta_order:
+                pos = self.index.position(doc_id)
+                if pos is not None and pos not in self.shadowed:
+                    self.shadowed.add(pos)
+                    self.delta_order[doc_id] = pos
+                else:
+                    self.delta_order[doc_id] = self._next_order
+                    self._next_order += 1
+                self.delta_by_order[self.delta_order[doc_id]] = doc_id
+            self.delta.upsert(doc_id, meta)
+            return self.delta_order[doc_id]
+
+    def delete(self, doc_id: str) -> bool:
+        with self._lock:
+            if self.delta.delete(doc_id):
+                del self.delta_by_order[self.delta_order.pop(doc_id)]
+                return True
+            pos = self.index.position(doc_id)
+            if pos is None or pos in self.shadowed:
+                return False
+            self.shadowed.add(pos)
+            return True
+
+    def __len__(self) -> int:
+        return self.index.documents - len(self.shadowed) + len(self.delta)
+
+    def search(self, filters: Mapping[str, List[str]]) -> List[str]:
+        with self._lock:
+            return [self.doc_id_at(key) for key in self.search_keys(filters)]
+
+    def search_keys(self, filters: Mapping[str, List[str]]) -> List[int]:
+        parsed = parse_filters(filters)
+        positions = self._search_positions(parsed)
+        if not self.delta_order and not self.shadowed:
+            return positions
+        mapped = (p for p in positions if p not in self.shadowed)
+        delta = self.delta
+        changed = sorted(self.delta_order[delta.doc_ids[p]] for p in delta._search_positions(parsed))
+        return list(heapq.merge(mapped, changed))
+
+    def doc_id_at(self, key: int) -> str:
+        doc_id = self.delta_by_order.get(key)
+        return self.doc_ids[key] if doc_id is None else doc_id
+
+    def sort_value(self, key: int, field: str) -> Any:
+        doc_id = self.delta_by_order.get(key)
+        if doc_id is not None:
+            return self.delta.get(doc_id).get(field, _MISSING)
+        column = self.index.columns.get(field)
+        return _MISSING if column is None else column.get(key)
+
+    def walk(self, field: str, descending: bool, after: Optional[SortEntry]) -> Iterator[SortEntry]:
+        column = self.index.columns.get(field)
+        shadowed = self.shadowed
+        start = after[2] + 1 if after is not None and after[0] == MISSING else 0
+        if column is None:
+            missing: Iterable[int] = range(start, self.index.documents)
+            present: Iterable[SortEntry] = ()
+        else:
+            if column.kind == "dict":
+                missing = (p for p in range(start, self.index.documents) if column.codes[p] < 0)
+            else:
+                missing = (p for p in range(start, self.index.documents) if not column.mask[p])
+            present = column.walk(after, descending)
+        mapped = chain((e for e in present if e[2] not in shadowed),
+                       ((MISSING, 0, p) for p in missing if p not in shadowed))
+
+        def order(entry: SortEntry) -> tuple:
+            return iteration_key(entry, descending)
+
+        # The changed documents are few: sort them for every request
+        changed = sorted((sort_entry(self.delta.get(d).get(field, _MISSING), key)
+                          for d, key in self.delta_order.items()), key=order)
+        if after is not None:
+            changed = changed[bisect_right(changed, order(after), key=order):]
+        return heapq.merge(mapped, changed, key=order)
+
+    def _term_positions(self, field: str, term: Term) -> Iterable[int]:
+        column = self.index.columns[field]
+        if column.kind == "dict":
+            matched: List[int] = []
+            for code in column.term_codes(term):
+                matched.extend(column.postings(code).tolist())
+            return matched
+        positions = column.sorted_positions[column.term_span(term)].tolist()
+        if term.kind != "equal":
+            return positions
+        return [p for p in positions if str(column.values[p]).lower() == term.text]
+
+    def _has_field(self, field: str) -> bool:
+        return field in self.index.columns
+
+    def estimate(self, flt: FieldFilter) -> int:
+        column = self.index.columns.get(flt.field)
+        if not flt.terms:
+            return self.index.documents if flt.negated else 0
+        if column is None:
+            return 0
+        total = 0
+        for term in flt.terms:
+            if column.kind == "dict":
+                total += sum(column.count(code) for code in column.term_codes(term))
+            else:
+                span = column.term_span(term)
+                total += span.stop - span.start
+        return min(total, column.present)
+
+    def _row_matches(self, pos: int, flt: FieldFilter) -> bool:
+        column = self.index.columns.get(flt.field)
+        return flt.matches(_MISSING if column is None else column.get(pos))
+
+
+class ColumnarView(Mapping[str, Mapping[str, Any]]):
+    """``{doc_id: metadata}`` view of a columnar index with its engine's in-memory changes applied."""
+
+    def __init__(self, engine: ColumnarQueryEngine):
+        self.engine = engine
+
+    def __getitem__(self, doc_id: str) -> Mapping[str, Any]:
+        row = self.engine.get(doc_id)
+        if row is None:
+            raise KeyError(doc_id)
+        return row
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.engine.search({}))
+
+    def __len__(self) -> int:
+        return len(self.engine)
@@ -0,0 +1,137 @@
+"""
+Per-endpoint-class concurrency limits for the HTTP mode.
+
+Each class of endpoint (``askme``, ``extraction``, ``search``) gets its own
+``ConcurrencyLimiter``: at most ``limit`` of its requests run at once and the
+rest wait in arrival order, for up to ``timeout`` seconds, before being turned
+away with ``LimiterTimeout`` (served as 503). A class that is stuck on slow
+Mobius calls or PDF extractions therefore only delays its own requests.
+
+Blocking work goes through ``run()``, which executes it on the limiter's own
+thread pool (``limit`` threads), so it never occupies the threadpool the rest
+of the server, including the health checks, relies on.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+try:
+    from .observability import observe_stage
+except ImportError:  # src/ is on sys.path rather than imported as a package
+    from observability import observe_stage
+
+
+class LimiterTimeout(Exception):
+    """No slot became free within the limiter's timeout."""
+
+    def __init__(self, name: str, timeout: float):
+        super().__init__(f"Too many concurrent {name} requests; retry shortly")
+        self.name = name
+        self.timeout = timeout
+
+
+class ConcurrencyLimiter:
+    """FIFO semaphore for one endpoint class, with an optional thread pool for blocking work."""
+
+    def __init__(self, name: str, limit: int, timeout: float = 30.0):
+        if limit < 1:
+            raise ValueError(f"{name} concurrency limit must be at least 1")
+        self.name = name
+        self.limit = limit
+        self.timeout = timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except BaseException as exc:
+            observe_stage(f"{self.name}_queue", time.perf_counter() - start)
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                self.rejected += 1
+                raise LimiterTimeout(self.name, self.timeout) from None
+            raise
+        observe_stage(f"{self.name}_queue", time.perf_counter() - start)
+        self.admitted += 1
+
+    def release(self) -> None:
+        # Hand the slot straight to the oldest waiter, so in_flight never dips
+        # and a newcomer can't overtake the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.release()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.limit, thread_name_prefix=f"{self.name}-worker")
+            return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run blocking ``func(*args)`` on this class's threads once a slot is free."""
+        await self.acquire()
+        # Carry the request's context (its stage timings) over to the worker thread
+        context = contextvars.copy_context()
+        future = asyncio.get_running_loop().run_in_executor(self._get_executor(), context.run, func, *args)
+        try:
+            result = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The client went away, but the thread keeps running: hold the slot until it is done
+            future.add_done_callback(lambda _: self.release())
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.release()
+        return result
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "timeout": self.timeout,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
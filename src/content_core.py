@@ -0,0 +1,331 @@
+"""
+Index and document services shared by the HTTP and MCP modes.
+
+``ContentCore`` owns the process-wide caches - the index snapshot
+(``IndexStore``), the document text LRU (``DocumentStore``), the PDF extraction
+pool and the full-text index - and implements listing index fields, searching
+and reading document text on top of them. The REST endpoints and the MCP tools
+are thin wrappers around the same instance, so both get the same warm caches.
+
+Bad input (an invalid filter, cursor, sort order or page selection) raises
+``InvalidRequest``, a ``ValueError``; an unknown document raises
+``DocumentNotFound``. Each mode turns these into its own error responses.
+"""
+
+import os
+import pathlib
+import time
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+try:
+    from .document_store import DocumentStore
+    from .fulltext_index import INDEX_DIR_NAME as FULLTEXT_INDEX_DIR_NAME, FullTextIndex
+    from .index_store import IndexStore
+    from .observability import stage
+    from .pdf_text import PdfExtractor
+    from .query_engine import decode_cursor, encode_cursor
+    from .search_filters import FilterError
+except ImportError:  # src/ is on sys.path rather than imported as a package
+    from document_store import DocumentStore
+    from fulltext_index import INDEX_DIR_NAME as FULLTEXT_INDEX_DIR_NAME, FullTextIndex
+    from index_store import IndexStore
+    from observability import stage
+    from pdf_text import PdfExtractor
+    from query_engine import decode_cursor, encode_cursor
+    from search_filters import FilterError
+
+ASSETS_DIR = pathlib.Path(__file__).resolve().parents[1] / "assets"
+
+SEARCH_MAX_LIMIT = 1000
+
+
+class InvalidRequest(ValueError):
+    """A search or read request that can't be served as given (HTTP 400)."""
+
+
+class DocumentNotFound(LookupError):
+    """No PDF under ``assets/`` for the requested document ID (HTTP 404)."""
+
+    def __init__(self, doc_id: str):
+        super().__init__(f"Document '{doc_id}' not found in assets")
+        self.doc_id = doc_id
+
+
+def parse_page_range(page_range: str) -> Tuple[int, Optional[int]]:
+    """Parse "3", "2-5" or "4-" into 1-based inclusive (first, last); last may be None."""
+    first, sep, last = page_range.partition("-")
+    try:
+        start = int(first)
+        end = (int(last) if last.strip() else None) if sep else start
+    except ValueError:
+        raise InvalidRequest(f"Invalid page_range '{page_range}'. Use e.g. '2-5'")
+    return start, end
+
+
+class ContentCore:
+    """The index, text caches and extraction pool of one server process."""
+
+    def __init__(
+        self,
+        assets_dir: pathlib.Path = ASSETS_DIR,
+        index_backend: str = "json",
+        index_reload_interval: float = 1.0,
+        compact_every: int = 10000,
+        extraction_workers: int = 2,
+        text_cache_max_bytes: int = 64 * 1024 * 1024,
+        fulltext_refresh_interval: float = 5.0,
+        fulltext_persist_interval: float = 30.0,
+    ):
+        self.assets_dir = pathlib.Path(assets_dir)
+        self.text_dir = self.assets_dir / "texts"
+        # The columnar backend serves the memory-mapped indexes.cidx written by
+        # scripts/convert_index.py instead of parsing indexes.json
+        index_file = self.assets_dir / ("indexes.cidx" if index_backend == "columnar" else "indexes.json")
+        # Upserts and deletes are appended to indexes.log and folded back into the
+        # index file every compact_every changes
+        self.index_store = IndexStore(
+            index_file,
+            check_interval=index_reload_interval,
+            backend=index_backend,
+            log_file=self.assets_dir / "indexes.log",
+            compact_every=compact_every,
+        )
+        self.pdf_extractor = PdfExtractor(workers=extraction_workers)
+        self.document_store = DocumentStore(
+            self.assets_dir,
+            self.text_dir,
+            self.pdf_extractor,
+            max_bytes=text_cache_max_bytes,
+        )
+        self.fulltext_index = FullTextIndex(
+            self.text_dir,
+            self.text_dir / FULLTEXT_INDEX_DIR_NAME,
+            check_interval=fulltext_refresh_interval,
+            persist_interval=fulltext_persist_interval,
+        )
+        # "pending" until warm_text_cache() has run (or "disabled"); see readiness()
+        self.warmup: Dict[str, Any] = {"state": "pending"}
+
+    @classmethod
+    def from_env(cls, assets_dir: Optional[pathlib.Path] = None) -> "ContentCore":
+        """
+        Build the core from the CONTENT_ASSETS_DIR, INDEX_*, EXTRACTION_WORKERS, TEXT_CACHE_* and
+        FULLTEXT_* settings. CONTENT_ASSETS_DIR (default: the repository's assets/) points the server
+        at another corpus, e.g. one generated by scripts/bench_load.py.
+        """
+        return cls(
+            assets_dir or pathlib.Path(os.getenv("CONTENT_ASSETS_DIR") or ASSETS_DIR),
+            index_backend=os.getenv("INDEX_BACKEND", "json").strip().lower(),
+            index_reload_interval=float(os.getenv("INDEX_RELOAD_INTERVAL", "1.0")),
+            compact_every=int(os.getenv("INDEX_COMPACT_EVERY", "10000")),
+            # EXTRACTION_WORKERS=0 extracts inline in the calling thread (Lambda has no
+            # shared memory for multiprocessing, so it defaults to inline there)
+            extraction_workers=int(
+                os.getenv("EXTRACTION_WORKERS", "0" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "2")
+            ),
+            text_cache_max_bytes=int(os.getenv("TEXT_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+            fulltext_refresh_interval=float(os.getenv("FULLTEXT_REFRESH_INTERVAL", "5.0")),
+            fulltext_persist_interval=float(os.getenv("FULLTEXT_PERSIST_INTERVAL", "30.0")),
+        )
+
+    def warm_up(self) -> None:
+        """Parse the index and load the full-text index up front so the first request doesn't pay for it."""
+        self.index_store.reload()
+        self.fulltext_index.refresh()
+
+    def warm_text_cache(self) -> Dict[str, Any]:
+        """
+        Load pre-extracted texts (newest first) and their page offsets from ``texts/`` into memory,
+        stopping before the text cache would start evicting. Only existing text files are read;
+        nothing is extracted. Run by the prefork parent so workers inherit a hot cache.
+        """
+        self.warmup = {"state": "warming"}
+        start = time.perf_counter()
+        store = self.document_store
+        loaded = 0
+        try:
+            text_files = sorted(self.text_dir.glob("*.txt"), key=lambda f: f.stat().st_mtime_ns, reverse=True)
+        except OSError:
+            text_files = []
+        for text_file in text_files:
+            pdf_path = store.resolve(f"{text_file.stem}.pdf")
+            if pdf_path is None:
+                continue
+            try:
+                # str objects take at least one byte per character
+                if store.stats()["bytes"] + text_file.stat().st_size > store.max_bytes:
+                    break
+                store.get_text(pdf_path)
+                store.get_page_table(pdf_path)
+            except OSError:
+                continue
+            loaded += 1
+        self.warmup = {
+            "state": "ready",
+            "documents": loaded,
+            "bytes": store.stats()["bytes"],
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        return self.warmup
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """Whether the index is loaded and the text cache warm-up has finished, plus the warm-up details."""
+        ready = self.index_store.stats()["loaded"] and self.warmup["state"] in ("ready", "disabled")
+        return ready, self.warmup
+
+    def shutdown(self) -> None:
+        self.pdf_extractor.shutdown()
+        try:
+            self.fulltext_index.save()  # full-text changes still waiting for the debounced write
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------------ indexes
+
+    def list_indexes(self, maxcount: int = 9999, facets: bool = False, max_values: int = 25) -> Dict[str, Any]:
+        """Index field names, optionally with the distinct values and counts of each field."""
+        catalog = self.index_store.get().catalog
+        result = {
+            "success": True,
+            "count": min(maxcount, catalog.document_count),
+            "fields": catalog.field_names(maxcount),
+        }
+        if facets:
+            # Facets always describe the whole index, not just the first maxcount documents
+            result["facets"] = catalog.facet_summary(max_values)
+        return result
+
+    def search(
+        self,
+        filters: Mapping[str, List[str]],
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        order: str = "asc",
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        One page of the documents matching ``filters`` (see search_filters for the grammar).
+        ``limit`` is capped at SEARCH_MAX_LIMIT; ``cursor`` is the previous page's next_cursor.
+        """
+        if order not in {"asc", "desc"}:
+            raise InvalidRequest("order must be 'asc' or 'desc'")
+        descending = order == "desc"
+        limit = None if limit is None else max(1, min(limit, SEARCH_MAX_LIMIT))
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor, sort_by, descending)
+            except ValueError as exc:
+                raise InvalidRequest(str(exc))
+
+        engine = self.index_store.get().engine
+        try:
+            with stage("filter"):
+                matches, total, last = engine.page(filters, sort_by, descending, limit, after)
+        except FilterError as exc:
+            raise InvalidRequest(str(exc))
+        result: Dict[str, Any] = {
+            "success": True,
+            "count": total,
+            "document_ids": matches,
+            "next_cursor": None if last is None else encode_cursor(sort_by, descending, last),
+        }
+        if fields is not None:
+            rows = [(doc_id, engine.get(doc_id) or {}) for doc_id in matches]
+            result["results"] = [
+                {"document_id": doc_id, "metadata": {f: meta[f] for f in fields if f in meta}}
+                for doc_id, meta in rows
+            ]
+        return result
+
+    # ---------------------------------------------------------------- documents
+
+    def resolve(self, doc_id: str) -> pathlib.Path:
+        pdf_path = self.document_store.resolve(doc_id)
+        if pdf_path is None:
+            raise DocumentNotFound(doc_id)
+        return pdf_path
+
+    def read_document(
+        self,
+        pdf_path: pathlib.Path,
+        page: Optional[int] = None,
+        page_range: Optional[str] = None,
+        offset: Optional[int] = None,
+        length: Optional[int] = None,
+        stream: bool = False,
+    ) -> Tuple[Union[str, Iterator[str]], Optional[Dict[str, Any]]]:
+        """
+        Return (content, range_info) for a document. range_info is None for the full text.
+        With ``stream`` the content is an iterator of text chunks instead of a string.
+        """
+        selectors = [name for name, value in (("page", page), ("page_range", page_range), ("offset", offset))
+                     if value is not None]
+        if len(selectors) > 1:
+            raise InvalidRequest(f"Use only one of page, page_range or offset/length (got {', '.join(selectors)})")
+        if length is not None and offset is None:
+            if selectors:
+                raise InvalidRequest(f"length applies to offset, not {selectors[0]}")
+            offset = 0
+        if not selectors and offset is None:
+            if stream:
+                return self.document_store.iter_text(pdf_path), None
+            return self.document_store.get_text(pdf_path), None
+
+        table = self.document_store.get_page_table(pdf_path)
+        info: Dict[str, Any] = {"page_count": table.page_count, "total_chars": table.total_chars}
+        if offset is not None:
+            end = table.total_chars if length is None else offset + length
+            content = self.document_store.read_range(pdf_path, offset, end)
+            info.update(offset=offset, length=len(content))
+        else:
+            first, last = (page, page) if page is not None else parse_page_range(page_range)
+            last = table.page_count if last is None else last
+            if first < 1 or last < first or last > table.page_count:
+                raise InvalidRequest(
+                    f"Pages {first}-{last} out of range; document '{pdf_path.name}' has {table.page_count} page(s)"
+                )
+            content = self.document_store.read_pages(pdf_path, first, last)
+            info.update(page_range=f"{first}-{last}")
+        return (iter([content]) if stream else content), info
+
+    def document_page(
+        self,
+        doc_id: str,
+        page: Optional[int] = None,
+        page_range: Optional[str] = None,
+        offset: Optional[int] = None,
+        max_chars: int = 20000,
+    ) -> Dict[str, Any]:
+        """
+        A bounded slice of a document's text for clients that page through it: pages
+        (``page``/``page_range``) or ``max_chars`` characters from ``offset`` (default 0).
+        ``next_offset``/``next_page`` say where the next call should continue, or are None at the end;
+        when the pages are cut to ``max_chars``, ``next_offset`` points at the rest of them instead.
+        """
+        pdf_path = self.resolve(doc_id)
+        if max_chars < 1:
+            raise InvalidRequest("max_chars must be at least 1")
+        if page is None and page_range is None:
+            start = offset or 0
+            if start < 0:
+                raise InvalidRequest("offset must not be negative")
+            content, info = self.read_document(pdf_path, offset=start, length=max_chars)
+            end = start + len(content)
+            info["next_offset"] = end if end < info["total_chars"] else None
+        elif offset is not None:
+            raise InvalidRequest("Use either page/page_range or offset, not both")
+        else:
+            content, info = self.read_document(pdf_path, page=page, page_range=page_range)
+            first, last = (int(p) for p in info["page_range"].split("-"))
+            info["truncated"] = len(content) > max_chars
+            if info["truncated"]:
+                # Continue by offset through the rest of the pages (and on to the end)
+                start, _ = self.document_store.get_page_table(pdf_path).page_span(first, last)
+                info["next_offset"], info["next_page"] = start + max_chars, None
+                content = content[:max_chars]
+            else:
+                info["next_offset"] = None
+                info["next_page"] = last + 1 if last < info["page_count"] else None
+        return {"doc_id": pdf_path.name, **info, "content": content}
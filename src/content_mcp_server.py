@@ -11,40 +11,93 @@ For Salesforce AgentForce integration (recommended):
 MCP_SERVER_MODE=http PORT=10000 python src/content_mcp_server.py
 """
 
+import asyncio
 import inspect
 import json
 import os
 import base64
 from typing import Any, Callable, Dict, List, Optional
 
-from fastapi.params import Query
-from copy import deepcopy
-from pydantic import BaseModel
-import requests
-from requests.auth import HTTPBasicAuth
+# Only what both modes need is imported here; FastAPI, pydantic and the Mobius
+# client are imported in the HTTP branch below and fastmcp in the MCP branch,
+# so each mode (and a cold Lambda start) only loads its own dependencies
+try:
+    from .content_core import ContentCore, DocumentNotFound, InvalidRequest, parse_page_range
+    from .observability import REGISTRY as METRICS, RequestMetricsMiddleware, configure_logging, stage
+    from .search_filters import FilterError
+except ImportError:  # executed as a script: python src/content_mcp_server.py
+    from content_core import ContentCore, DocumentNotFound, InvalidRequest, parse_page_range
+    from observability import REGISTRY as METRICS, RequestMetricsMiddleware, configure_logging, stage
+    from search_filters import FilterError
 
 TOOL_REGISTRY: Dict[str, Callable[..., Any]] = {}
 
 
-def register_tool(func: Callable[..., Any]):
-    """Register a tool function and return it unchanged."""
-    TOOL_REGISTRY[func.__name__] = func
-    return func
+def register_tool(func: Optional[Callable[..., Any]] = None, *, name: Optional[str] = None):
+    """Register a tool function (under ``name``, default its own name) and return it unchanged."""
+    def register(func: Callable[..., Any]) -> Callable[..., Any]:
+        TOOL_REGISTRY[name or func.__name__] = func
+        return func
 
+    return register if func is None else register(func)
 
-mcp: Any | None = None
-
-class DocumentTextResponse(BaseModel):
-    doc_id: str
-    content: str  # this is the full document text
 
-class AskMeRequest(BaseModel):
-    userQuery: str
-    conversation: Optional[str] = ""
+mcp: Any | None = None
 
-class AskMeResponse(BaseModel):
-    answer: str
-    conversationContext: str  # Flattened from nested context.conversation
+# The index, text caches and extraction pool are shared by the REST endpoints
+# and the MCP tools below; nothing is loaded until first use (or warm_up())
+core = ContentCore.from_env()
+
+# MCP tools. They run the blocking index and document work in a thread so an
+# MCP session over SSE keeps serving other calls meanwhile.
+MCP_TEXT_PAGE_CHARS = int(os.getenv("MCP_TEXT_PAGE_CHARS", "20000"))
+
+
+@register_tool(name="list_indexes")
+async def list_indexes_tool(facets: bool = False, max_values: int = 25) -> Dict[str, Any]:
+    """
+    List the metadata fields documents can be searched by. With facets=True, also return
+    each field's most common values and their document counts (at most max_values per field).
+    """
+    return await asyncio.to_thread(core.list_indexes, facets=facets, max_values=max(1, min(max_values, 1000)))
+
+
+@register_tool(name="search")
+async def search_tool(
+    filters: Dict[str, List[str]],
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    order: str = "asc",
+    fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Find documents by metadata, e.g. {"customer": ["XYY"], "invoice_amount": [">5000"]}.
+    A document matches when every field matches one of its values. Values also take
+    >=, <=, "between 4000..7000", ISO dates, prefixes/wildcards ("G*") and negation ("!XYY").
+    Returns count (all matches), document_ids (this page) and next_cursor; pass next_cursor
+    back as cursor for the next page. sort_by/order ("asc" or "desc") sort by a field, and
+    fields returns those metadata fields for each document.
+    """
+    return await asyncio.to_thread(core.search, filters, limit, cursor, sort_by, order, fields)
+
+
+# Not named get_document_text: the REST endpoint of that name (and OpenAPI operationId) is defined below
+@register_tool(name="get_document_text")
+async def get_document_text_tool(
+    doc_id: str,
+    offset: Optional[int] = None,
+    page: Optional[int] = None,
+    page_range: Optional[str] = None,
+    max_chars: int = MCP_TEXT_PAGE_CHARS,
+) -> Dict[str, Any]:
+    """
+    Read a document's text one bounded slice at a time: max_chars characters from offset
+    (default 0), or whole pages with page (1-based) or page_range ("2-5", "3-").
+    Continue with next_offset (or next_page) until it is null; a page cut to max_chars
+    continues with next_offset. page_count and total_chars give the document's size.
+    """
+    return await asyncio.to_thread(core.document_page, doc_id, page, page_range, offset, max_chars)
 
 # Determine desired runtime mode (HTTP/REST or MCP)
 _mode_env = os.getenv("MCP_SERVER_MODE")
@@ -58,13 +111,103 @@ else:
 # Check if running in HTTP mode for Salesforce integration
 if _runtime_mode in {"http", "rest"}:
     # HTTP mode for cloud deployment
-    from fastapi import FastAPI, HTTPException, Request, Header
+    from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request, Header, Query, Response
     from fastapi.middleware.cors import CORSMiddleware
-    from fastapi.responses import HTMLResponse
-    import uvicorn
-
-    app = FastAPI(title="Banking Content Server")
+    from fastapi.responses import HTMLResponse, JSONResponse
+    from contextlib import asynccontextmanager
+    from copy import deepcopy
+    from pydantic import BaseModel
+    import signal
 
+    try:
+        from .answer_cache import AnswerCache, answer_key
+        from .concurrency import ConcurrencyLimiter, LimiterTimeout
+        from .mobius_client import MobiusClient, MobiusError
+        from .pdf_text import load_pdf_reader
+    except ImportError:  # executed as a script: python src/content_mcp_server.py
+        from answer_cache import AnswerCache, answer_key
+        from concurrency import ConcurrencyLimiter, LimiterTimeout
+        from mobius_client import MobiusClient, MobiusError
+        from pdf_text import load_pdf_reader
+
+    class DocumentTextResponse(BaseModel):
+        doc_id: str
+        content: str  # this is the full document text
+
+    class AskMeRequest(BaseModel):
+        userQuery: str
+        conversation: Optional[str] = ""
+
+    class AskMeResponse(BaseModel):
+        answer: str
+        conversationContext: str  # Flattened from nested context.conversation
+
+    # Pre-extracted texts are loaded into the text cache at startup (in the
+    # background; /api/health reports "warming" until done). Under the prefork
+    # supervisor the parent does this once and the workers inherit the cache.
+    TEXT_CACHE_WARM = os.getenv("TEXT_CACHE_WARM", "true").strip().lower() not in {"0", "false", "no", "off"}
+
+    # What startup leaves to first use (httpx and the Mobius TLS context, PyPDF2,
+    # the Salesforce OpenAPI document) is prepared in the background once the
+    # server is accepting requests. Not on Lambda, where the first invocation
+    # arrives right away and would only compete with it.
+    WARM_DEFERRED = not os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+
+    def warm_deferred() -> None:
+        mobius_client.start()
+        load_pdf_reader()
+        salesforce_openapi_cached()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Parse the index once up front so the first request doesn't pay for it
+        core.warm_up()
+        warm_task = None
+        if core.warmup["state"] == "pending":
+            if TEXT_CACHE_WARM:
+                warm_task = asyncio.create_task(asyncio.to_thread(core.warm_text_cache))
+            else:
+                core.warmup = {"state": "disabled"}
+        deferred_task = asyncio.create_task(asyncio.to_thread(warm_deferred)) if WARM_DEFERRED else None
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, mobius_client.request_reload)
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+            pass  # no SIGHUP on Windows or off the main thread; the certificate file is still watched
+        yield
+        for task in (deferred_task, warm_task):
+            if task is not None:
+                await task
+        await mobius_client.close()
+        for limiter in limiters.values():
+            limiter.shutdown()
+        core.shutdown()
+
+    app = FastAPI(title="Banking Content Server", lifespan=lifespan)
+
+    # Handlers are async; each endpoint class runs at most *_CONCURRENCY requests
+    # at once (blocking work on its own threads) and queues the rest for up to
+    # CONCURRENCY_WAIT_TIMEOUT seconds, so one slow class can't starve the others
+    _wait_timeout = float(os.getenv("CONCURRENCY_WAIT_TIMEOUT", "30"))
+    limiters = {
+        "askme": ConcurrencyLimiter("askme", int(os.getenv("ASKME_CONCURRENCY", "32")), _wait_timeout),
+        "extraction": ConcurrencyLimiter("extraction", int(os.getenv("EXTRACTION_CONCURRENCY", "4")), _wait_timeout),
+        "search": ConcurrencyLimiter("search", int(os.getenv("SEARCH_CONCURRENCY", "8")), _wait_timeout),
+    }
+    askme_limiter = limiters["askme"]
+    extraction_limiter = limiters["extraction"]
+    search_limiter = limiters["search"]
+
+    @app.exception_handler(LimiterTimeout)
+    async def limiter_timeout_handler(request: Request, exc: LimiterTimeout):
+        return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+    @app.exception_handler(InvalidRequest)
+    async def invalid_request_handler(request: Request, exc: InvalidRequest):
+        return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+    @app.exception_handler(DocumentNotFound)
+    async def document_not_found_handler(request: Request, exc: DocumentNotFound):
+        return JSONResponse(status_code=404, content={"detail": str(exc)})
 
     # Add CORS for Salesforce integration
     app.add_middleware(
@@ -75,15 +218,33 @@ if _runtime_mode in {"http", "rest"}:
         allow_headers=["*"],
     )
 
+    # Compress large responses (document text). Brotli is used when the optional
+    # brotli-asgi package is installed, otherwise gzip.
+    try:
+        from brotli_asgi import BrotliMiddleware  # type: ignore
+    except ModuleNotFoundError:
+        from fastapi.middleware.gzip import GZipMiddleware
+        app.add_middleware(GZipMiddleware, minimum_size=1024)
+    else:
+        app.add_middleware(BrotliMiddleware, minimum_size=1024, gzip_fallback=True)
+
+    # Outermost, so the latency and Server-Timing cover the other middleware too;
+    # requests slower than SLOW_REQUEST_SECONDS are logged with their stage timings
+    logger = configure_logging("content_server")
+    app.add_middleware(
+        RequestMetricsMiddleware,
+        registry=METRICS,
+        logger=logger,
+        slow_seconds=float(os.getenv("SLOW_REQUEST_SECONDS", "1.0")),
+    )
 
 
     @app.get("/health")
-    def health():
+    async def health():
         return {"status": "ok", "message": "Content MCP Server is running in HTTP mode"}
 
 
-    @app.get("/openapi_salesforce.json")
-    def openapi_salesforce():
+    def build_salesforce_openapi() -> dict:
         schema = deepcopy(app.openapi())
         # Force spec version to 3.0.3 for Salesforce
         schema["openapi"] = "3.0.3"
@@ -102,8 +263,32 @@ if _runtime_mode in {"http", "rest"}:
         fix_schemas(schema)
         return schema
 
+    # The adapted schema is built once and served as pre-serialized bytes; it is
+    # rebuilt only when the route table changes (routes added or replaced)
+    _salesforce_openapi: Dict[str, Any] = {"routes": None, "body": b"", "etag": ""}
+
+    def salesforce_openapi_cached() -> Dict[str, Any]:
+        routes = tuple(map(id, app.routes))
+        if _salesforce_openapi["routes"] != routes:
+            app.openapi_schema = None  # let FastAPI regenerate its own cached schema as well
+            body = json.dumps(build_salesforce_openapi(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            _salesforce_openapi.update(
+                routes=routes,
+                body=body,
+                etag=f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"',
+            )
+        return _salesforce_openapi
+
+    @app.get("/openapi_salesforce.json")
+    async def openapi_salesforce(if_none_match: Optional[str] = Header(None)):
+        cached = salesforce_openapi_cached()
+        headers = {"ETag": cached["etag"], "Cache-Control": "public, max-age=300, must-revalidate"}
+        if etag_matches(if_none_match, cached["etag"]):
+            return Response(status_code=304, headers=headers)
+        return Response(cached["body"], media_type="application/json", headers=headers)
+
     @app.get("/", response_class=HTMLResponse)
-    def test_interface():
+    async def test_interface():
         """Simple web interface to test the server."""
         return """
         <!DOCTYPE html>
@@ -163,21 +348,46 @@ if _runtime_mode in {"http", "rest"}:
         </html>
         """
 
-    # Health check for AWS/Salesforce
+    # Health check for AWS/Salesforce; 503 until the index is loaded and the text
+    # cache warmed, so a load balancer only routes to ready workers (/health is
+    # plain liveness)
     @app.get("/api/health")
-    def health_check():
-        return {
-            "status": "healthy",
+    async def health_check():
+        ready, warmup = core.readiness()
+        content = {
+            "status": "healthy" if ready else "warming",
             "service": "content-mcp-server",
             "version": "0.1.0",
-            "capabilities": ["mcp", "rest-api", "salesforce-integration"]
+            "capabilities": ["mcp", "rest-api", "salesforce-integration"],
+            "ready": ready,
+            "warmup": warmup,
+            "worker": os.getpid(),
         }
+        return content if ready else JSONResponse(status_code=503, content=content, headers={"Retry-After": "1"})
 
     # AskMe API endpoint for external service integration
+    # MOBIUS_* settings and the TLS context are loaded once (at startup, on
+    # SIGHUP, or when the certificate file changes) and shared by all requests
+    mobius_client = MobiusClient(
+        pool_size=int(os.getenv("MOBIUS_POOL_SIZE", "20")),
+        timeout=float(os.getenv("MOBIUS_TIMEOUT", "30")),
+        connect_timeout=float(os.getenv("MOBIUS_CONNECT_TIMEOUT", "5")),
+        retries=int(os.getenv("MOBIUS_RETRIES", "2")),
+        backoff=float(os.getenv("MOBIUS_RETRY_BACKOFF", "0.25")),
+    )
+    # Identical questions from the same user are answered from memory for
+    # ASKME_CACHE_TTL seconds (0, the default, disables caching)
+    answer_cache = AnswerCache(
+        max_entries=int(os.getenv("ASKME_CACHE_MAX_ENTRIES", "1024")),
+        ttl=float(os.getenv("ASKME_CACHE_TTL", "0")),
+    )
+
     @app.post("/askme", response_model=AskMeResponse)
-    def ask_me(
+    async def ask_me(
         req: AskMeRequest,
-        authorization: str = Header(None, description="Basic Auth header with Mobius credentials")
+        response: Response,
+        authorization: str = Header(None, description="Basic Auth header with Mobius credentials"),
+        cache_control: Optional[str] = Header(None, description="'no-cache' skips the answer cache"),
     ):
         """
         Proxy endpoint that forwards questions to an external Mobius service.
@@ -190,6 +400,7 @@ if _runtime_mode in {"http", "rest"}:
         
         Headers:
         - Authorization: Basic Auth header with Mobius credentials (Basic base64(username:password))
+        - Cache-Control: (Optional) "no-cache" forces a fresh answer from Mobius
         
         Environment variables required:
         - MOBIUS_SERVER: The Mobius server hostname
@@ -198,8 +409,6 @@ if _runtime_mode in {"http", "rest"}:
         - MOBIUS_CERT_CONTENT: (Optional) SSL certificate content as a string
         - MOBIUS_CERT_PATH: (Optional) Path to SSL certificate file
         """
-        import tempfile
-        
         # Get authorization from header parameter
         auth_header = authorization
         if not auth_header:
@@ -226,310 +435,522 @@ if _runtime_mode in {"http", "rest"}:
                 detail=f"Invalid Authorization header format: {str(e)}"
             )
         
-        # Get configuration from environment variables
-        mobius_server = os.getenv("MOBIUS_SERVER")
-        mobius_port = os.getenv("MOBIUS_PORT")
-        mobius_repo_id = os.getenv("MOBIUS_REPOSITORY_ID")
-        mobius_cert_path = os.getenv("MOBIUS_CERT_PATH")
-        mobius_cert_content = os.getenv("MOBIUS_CERT_CONTENT")
-        
-        # Validate required environment variables
-        missing_vars = []
-        if not mobius_server:
-            missing_vars.append("MOBIUS_SERVER")
-        if not mobius_port:
-            missing_vars.append("MOBIUS_PORT")
-        if not mobius_repo_id:
-            missing_vars.append("MOBIUS_REPOSITORY_ID")
-        
-        if missing_vars:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Missing required environment variables: {', '.join(missing_vars)}"
-            )
-        
-        # Build the Mobius service URL
-        mobius_url = f"https://{mobius_server}:{mobius_port}/mobius/rest/conversations"
-        
-        # Build the request payload
-        payload = {
-            "userQuery": req.userQuery,
-            "documentIDs": [],
-            "repositories": [
-                {"id": mobius_repo_id}
-            ],
-            "context": {
-                "conversation": req.conversation or ""
-            }
-        }
-        
-        # Set up headers
-        headers = {
-            "Content-Type": "application/vnd.conversation-request.v1+json",
-            "Accept": "application/vnd.conversation-response.v1+json"
-        }
-        
-        # Determine SSL verification setting
-        ssl_verify = True  # Default to standard verification
-        temp_cert_file = None
-        
+        credentials = (mobius_username, mobius_password)
+        mobius_client.start()
+        repository_id = mobius_client.config.repository_id or ""
+        key = answer_key(repository_id, req.userQuery, req.conversation or "", credentials)
+        bypass = bool(cache_control) and any(
+            d.strip().lower() in ("no-cache", "no-store") for d in cache_control.split(",")
+        )
+        async def ask_mobius() -> Dict[str, Any]:
+            # Only calls that reach Mobius take an askme slot; cached and coalesced answers don't
+            async with askme_limiter:
+                with stage("mobius"):
+                    return await mobius_client.converse(req.userQuery, req.conversation or "", auth=credentials)
+
         try:
-            # If certificate content is provided, write it to a temporary file
-            if mobius_cert_content:
-                temp_cert = tempfile.NamedTemporaryFile(mode='w', suffix='.pem', delete=False)
-                temp_cert.write(mobius_cert_content)
-                temp_cert.close()
-                ssl_verify = temp_cert.name
-                temp_cert_file = temp_cert.name
-            # Otherwise, if certificate path is provided, use it
-            elif mobius_cert_path:
-                if os.path.exists(mobius_cert_path):
-                    ssl_verify = mobius_cert_path
-                else:
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Certificate file not found at path: {mobius_cert_path}"
-                    )
-            
-            try:
-                # Make the request to Mobius service with credentials from Authorization header
-                response = requests.post(
-                    mobius_url,
-                    json=payload,
-                    headers=headers,
-                    auth=HTTPBasicAuth(mobius_username, mobius_password),
-                    verify=ssl_verify,
-                    timeout=30
-                )
-                
-                # Raise exception for bad status codes
-                response.raise_for_status()
-                
-                # Parse the response
-                mobius_response = response.json()
-                
-                # Extract answer and conversation data from the response
-                answer = mobius_response.get("answer", "")
-                conversation_data = mobius_response.get("context", {}).get("conversation", "")
-                
-                # Return in the expected format (flat structure for Agentforce compatibility)
-                return AskMeResponse(
-                    answer=answer,
-                    conversationContext=conversation_data
-                )
-                
-            except requests.exceptions.Timeout:
-                raise HTTPException(
-                    status_code=504,
-                    detail="Mobius service request timed out"
-                )
-            except requests.exceptions.SSLError as e:
-                raise HTTPException(
-                    status_code=503,
-                    detail=f"SSL certificate verification failed. Verify MOBIUS_CERT_CONTENT or MOBIUS_CERT_PATH is set correctly. Error: {str(e)}"
-                )
-            except requests.exceptions.ConnectionError as e:
-                raise HTTPException(
-                    status_code=503,
-                    detail=f"Failed to connect to Mobius service: {str(e)}"
-                )
-            except requests.exceptions.HTTPError as e:
-                raise HTTPException(
-                    status_code=502,
-                    detail=f"Mobius service returned an error: {str(e)}"
-                )
-            except ValueError as e:
-                raise HTTPException(
-                    status_code=502,
-                    detail=f"Invalid response from Mobius service: {str(e)}"
-                )
-            except Exception as e:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error communicating with Mobius service: {str(e)}"
-                )
-        finally:
-            # Clean up temporary certificate file if created
-            if temp_cert_file and os.path.exists(temp_cert_file):
-                try:
-                    os.unlink(temp_cert_file)
-                except Exception:
-                    pass
+            # Make the request to Mobius service with credentials from Authorization header
+            mobius_response, cache_status = await answer_cache.get_or_fetch(key, ask_mobius, bypass=bypass)
+        except MobiusError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+        # Extract answer and conversation data from the response
+        answer = mobius_response.get("answer", "")
+        conversation_data = mobius_response.get("context", {}).get("conversation", "")
+        
+        response.headers["X-Cache"] = cache_status
+        # Return in the expected format (flat structure for Agentforce compatibility)
+        return AskMeResponse(
+            answer=answer,
+            conversationContext=conversation_data
+        )
 
     # OpenAPI schema endpoint for Salesforce External Service registration
 
     # ------------------ Document / Index APIs for AgentForce ------------------
+    import hashlib
+    import hmac
+    import itertools
     import pathlib
-    from fastapi.responses import FileResponse, PlainTextResponse
-    try:
-        from PyPDF2 import PdfReader
-    except Exception:
-        PdfReader = None
+    from typing import Iterator
+    from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+    index_store = core.index_store
+    document_store = core.document_store
+    fulltext_index = core.fulltext_index
 
-    ASSETS_DIR = pathlib.Path(__file__).resolve().parents[1] / "assets"
-    TEXT_DIR = ASSETS_DIR / "texts"
-    INDEX_FILE = ASSETS_DIR / "indexes.json"
+    def load_indexes():
+        """Return the cached index ({doc_id: metadata}), reloading it if the index file changed on disk."""
+        return index_store.get().data
 
-    def ensure_text_dir():
-        TEXT_DIR.mkdir(parents=True, exist_ok=True)
+    @app.get("/api/v1/indexes")
+    async def get_indexes(
+        maxcount: int = Query(default=9999, ge=1),
+        facets: bool = Query(default=False, description="Include distinct values and document counts per field"),
+        max_values: int = Query(default=25, ge=1, le=1000, description="Cap on facet values returned per field"),
+    ):
+        """Return available index fields, optionally with value facets for suggesting filters"""
+        return await search_limiter.run(core.list_indexes, maxcount, facets, max_values)
 
-    def load_indexes():
-        if not INDEX_FILE.exists():
-            return {}
-        try:
-            return json.loads(INDEX_FILE.read_text(encoding='utf-8'))
-        except Exception:
-            return {}
+    class SearchIndexesRequest(BaseModel):
+        filters: Dict[str, List[str]]
+        limit: Optional[int] = None
+        cursor: Optional[str] = None
+        sort_by: Optional[str] = None
+        order: str = "asc"
+        fields: Optional[List[str]] = None
 
-    def extract_text_from_pdf(pdf_path: pathlib.Path) -> str:
-        """Extract text from a PDF using PyPDF2 (falls back to empty string)."""
-        if PdfReader is None:
-            return ""
+    @app.post("/api/v1/search")
+    async def search_indexes(req: SearchIndexesRequest):
+        """
+        Search documents by indexes. Request body: {"filters": {"customer": ["XYY"], "invoice_amount": [">5000"]}}
+        Filter values also take >=, <=, "between 4000..7000", ISO dates, prefixes/wildcards ("G*") and
+        negation ("!XYY"); see search_filters. A malformed value is rejected with 400.
+        Optional: "limit" (page size, at most 1000), "cursor" (next_cursor of the previous page),
+        "sort_by" (a field) with "order" ("asc" or "desc"), and "fields" to return those metadata fields too.
+        Without "limit" every match is returned, in index order unless sorted.
+        """
+        return await search_limiter.run(core.search, req.filters, req.limit, req.cursor, req.sort_by, req.order,
+                                        req.fields)
 
-        try:
-            reader = PdfReader(str(pdf_path))
-            text_parts = []
-            for page in reader.pages:
-                try:
-                    txt = page.extract_text() or ""
-                except Exception:
-                    txt = ""
-                text_parts.append(txt)
-            return "\n".join(text_parts)
-        except Exception:
-            return ""
+    class FullTextSearchRequest(BaseModel):
+        query: str
+        filters: Optional[Dict[str, List[str]]] = None
+        limit: int = 10
+        match: str = "all"
 
-    @app.get("/api/v1/indexes")
-    def get_indexes(maxcount: int = Query(default=9999, ge=1)):
-        """Return available index fields"""
-        idx = load_indexes()
-
-        # Apply maxcount limit
-        limited_items = list(idx.items())[:maxcount]
-
-        # build field->set(values)
-        fields = {}
-        for key, meta in limited_items:
-            for k, v in meta.items():
-                fields.setdefault(k, set()).add(str(v))
+    @app.post("/api/v1/fulltext_search")
+    async def fulltext_search(req: FullTextSearchRequest):
+        """
+        Ranked (BM25) search over the extracted document texts.
+        Request body: {"query": "\"500 deductible\" collision", "filters": {"customer": ["John Doe"]}, "limit": 10}
+        Quoted phrases must match exactly; match="any" ranks documents containing any term.
+        Optional metadata filters use the same rules as /api/v1/search.
+        """
+        if req.match not in {"all", "any"}:
+            raise HTTPException(status_code=400, detail="match must be 'all' or 'any'")
+        limit = max(1, min(req.limit, 100))
+
+        def search() -> List[Dict[str, Any]]:
+            fulltext_index.ensure_current()
+            try:
+                with stage("filter"):
+                    allowed = index_store.get().engine.search(req.filters) if req.filters else None
+            except FilterError as exc:
+                raise HTTPException(status_code=400, detail=str(exc))
+            with stage("fulltext"):
+                ranked = fulltext_index.search(req.query, limit=limit, match_all=req.match == "all", allowed=allowed)
+            results = []
+            for doc_id, score in ranked:
+                pdf_path = document_store.resolve(doc_id)
+                snippets = fulltext_index.snippets(document_store.get_text(pdf_path), req.query) if pdf_path else []
+                results.append({"document_id": doc_id, "score": score, "snippets": snippets})
+            return results
+
+        results = await search_limiter.run(search)
         return {
             "success": True,
-            "count": len(limited_items),
-            "fields": sorted(list(fields.keys()))
+            "count": len(results),
+            "document_ids": [r["document_id"] for r in results],
+            "results": results,
         }
 
-    from pydantic import BaseModel
-    class SearchIndexesRequest(BaseModel):
-        filters: Dict[str, List[str]]
-
-    @app.post("/api/v1/search")
-    def search_indexes(req: SearchIndexesRequest):
-        """Search documents by indexes. Request body: {"filters": {"customer": ["XYY"], "invoice_amount": [">5000"]}}"""
-        idx = load_indexes()
-        matches = []
-
-        # Simple matching: support exact matches and numeric comparisons for invoice_amount/balance
-        for docid, meta in idx.items():
-            ok = True
-            for key, vals in req.filters.items():
-                if key not in meta:
-                    ok = False
-                    break
-
-                # numeric comparison operator support when value starts with > or <
-                value = meta.get(key)
-                val_str = str(value)
-
-                # allow any of the provided vals to match
-                matched_any = False
-                for v in vals:
-                    if isinstance(value, (int, float)) and (v.startswith('>') or v.startswith('<')):
-                        try:
-                            cmp_val = float(v[1:])
-                            if v[0] == '>' and float(value) > cmp_val:
-                                matched_any = True
-                                break
-                            if v[0] == '<' and float(value) < cmp_val:
-                                matched_any = True
-                                break
-                        except Exception:
-                            continue
-                    else:
-                        # string equality (case-insensitive)
-                        if val_str.lower() == str(v).lower():
-                            matched_any = True
-                            break
-
-                if not matched_any:
-                    ok = False
-                    break
-
-            if ok:
-                matches.append(docid)
-
-        return {"success": True, "count": len(matches), "document_ids": matches}
+    # The admin endpoints change or expose server state, so they need
+    # "Authorization: Bearer <ADMIN_TOKEN>" and are not served at all when
+    # ADMIN_TOKEN is unset. They stay out of the OpenAPI schema, and with it out
+    # of the Salesforce External Service registered from /openapi_salesforce.json.
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+    def require_admin_token(authorization: Optional[str] = Header(None)) -> None:
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not token.strip():
+            raise HTTPException(status_code=401, detail="Admin token required",
+                                headers={"WWW-Authenticate": "Bearer"})
+        if not hmac.compare_digest(token.strip().encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    admin = APIRouter(prefix="/api/v1/admin", dependencies=[Depends(require_admin_token)], include_in_schema=False)
+
+    # The index admin endpoints write files and are rare, so they stay plain
+    # functions on FastAPI's threadpool rather than taking a search slot
+    @admin.post("/indexes/reload")
+    def reload_indexes():
+        """Force a re-read of the index file and return the index store counters."""
+        index_store.reload(force=True)
+        return {"success": True, **index_store.stats()}
+
+    class UpsertDocumentsRequest(BaseModel):
+        documents: Dict[str, Dict[str, Any]]
+
+    class DeleteDocumentsRequest(BaseModel):
+        document_ids: List[str]
+
+    def change_index(apply: Callable[[], Any]) -> Any:
+        try:
+            return apply()
+        except OSError as e:
+            raise HTTPException(status_code=503, detail=f"Could not write the index change log: {str(e)}")
+        except RuntimeError as e:
+            # Updates disabled, or compaction refused because the loaded index is incomplete
+            raise HTTPException(status_code=409, detail=str(e))
+
+    @admin.post("/indexes/documents")
+    def upsert_index_documents(req: UpsertDocumentsRequest):
+        """Add or replace index entries. Request body: {"documents": {"000008.pdf": {"customer": "XYY"}}}"""
+        counts = change_index(lambda: index_store.upsert(req.documents))
+        return {"success": True, **counts}
+
+    @admin.put("/indexes/documents/{doc_id}")
+    def upsert_index_document(doc_id: str, metadata: Dict[str, Any]):
+        """Add or replace the index entry of one document; the body is its metadata object."""
+        counts = change_index(lambda: index_store.upsert({doc_id: metadata}))
+        return {"success": True, "doc_id": doc_id, **counts}
+
+    @admin.post("/indexes/documents/delete")
+    def delete_index_documents(req: DeleteDocumentsRequest):
+        """Remove index entries. Request body: {"document_ids": ["000008.pdf"]}"""
+        deleted = change_index(lambda: index_store.delete(req.document_ids))
+        return {"success": True, "count": len(deleted), "document_ids": deleted}
+
+    @admin.delete("/indexes/documents/{doc_id}")
+    def delete_index_document(doc_id: str):
+        """Remove the index entry of one document."""
+        if not change_index(lambda: index_store.delete([doc_id])):
+            raise HTTPException(status_code=404, detail=f"Document {doc_id} is not indexed")
+        return {"success": True, "doc_id": doc_id}
+
+    @admin.post("/indexes/compact")
+    def compact_indexes():
+        """Fold the change log into the index file now instead of waiting for INDEX_COMPACT_EVERY changes."""
+        compacted = change_index(index_store.compact)
+        return {"success": True, "compacted": compacted, **index_store.stats()}
+
+    @admin.get("/indexes/stats")
+    async def index_stats():
+        """Index store counters (reloads, cache hits, logged changes) for monitoring."""
+        return {"success": True, **index_store.stats()}
+
+    @admin.get("/fulltext/stats")
+    async def fulltext_stats():
+        """Full-text index size and update counters."""
+        return {"success": True, **fulltext_index.stats()}
+
+    @admin.get("/text_cache/stats")
+    async def text_cache_stats():
+        """Document text cache counters (hits, misses, evictions) for monitoring."""
+        return {"success": True, **document_store.stats()}
+
+    @admin.get("/askme_cache/stats")
+    async def askme_cache_stats():
+        """/askme answer cache counters (hits, misses, coalesced requests) for monitoring."""
+        return {"success": True, **answer_cache.stats()}
+
+    @admin.get("/concurrency/stats")
+    async def concurrency_stats():
+        """Per endpoint class: concurrency limit, requests running and waiting, and requests turned away."""
+        return {"success": True, **{name: limiter.stats() for name, limiter in limiters.items()}}
+
+    if ADMIN_TOKEN:
+        app.include_router(admin)
+    else:
+        logger.info("ADMIN_TOKEN is not set; the /api/v1/admin endpoints are disabled")
+
+    # Cache, index and limiter counters are read from their stats() when /metrics is scraped
+    def collect_stats(source: Callable[[], Dict[str, Any]], key: str):
+        return lambda: [({}, source()[key])]
+
+    def collect_limiters(key: str):
+        return lambda: [({"class": name}, limiter.stats()[key]) for name, limiter in limiters.items()]
+
+    def cache_lookups() -> Dict[str, tuple]:
+        """(hits, misses) per cache; coalesced /askme requests count as hits, index reloads as misses."""
+        return {
+            "text": (document_store.hits, document_store.misses),
+            "askme": (answer_cache.hits + answer_cache.coalesced, answer_cache.misses),
+            "index": (index_store.cache_hits, index_store.reloads),
+        }
 
+    METRICS.collected("content_cache_hits_total", "counter", "Cache hits",
+                      lambda: [({"cache": name}, hits) for name, (hits, _) in cache_lookups().items()])
+    METRICS.collected("content_cache_misses_total", "counter", "Cache misses",
+                      lambda: [({"cache": name}, misses) for name, (_, misses) in cache_lookups().items()])
+    METRICS.collected("content_cache_hit_ratio", "gauge", "Cache hits / lookups since startup",
+                      lambda: [({"cache": name}, hits / (hits + misses) if hits + misses else 0.0)
+                               for name, (hits, misses) in cache_lookups().items()])
+    METRICS.collected("content_text_cache_bytes", "gauge", "Bytes of document text held in memory",
+                      collect_stats(document_store.stats, "bytes"))
+    METRICS.collected("content_text_cache_evictions_total", "counter", "Texts evicted from the memory cache",
+                      collect_stats(document_store.stats, "evictions"))
+    METRICS.collected("content_pdf_extractions_total", "counter", "PDF extractions",
+                      collect_stats(document_store.stats, "extractions"))
+    METRICS.collected("content_index_documents", "gauge", "Documents in the loaded index",
+                      collect_stats(index_store.stats, "documents"))
+    METRICS.collected("content_mobius_requests_total", "counter", "Requests sent to Mobius",
+                      collect_stats(mobius_client.stats, "requests"))
+    METRICS.collected("content_mobius_retries_total", "counter", "Mobius requests retried",
+                      collect_stats(mobius_client.stats, "retried"))
+    METRICS.collected("content_limiter_in_flight", "gauge", "Requests holding a concurrency slot, by class",
+                      collect_limiters("in_flight"))
+    METRICS.collected("content_limiter_waiting", "gauge", "Requests waiting for a concurrency slot, by class",
+                      collect_limiters("waiting"))
+    METRICS.collected("content_limiter_rejected_total", "counter", "Requests turned away with 503, by class",
+                      collect_limiters("rejected"))
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics: request and stage latency histograms, cache and concurrency counters."""
+        return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
+    resolve_document = core.resolve
+    read_document = core.read_document
+
+    def document_etag(pdf_path: pathlib.Path, *variant: Any) -> Optional[str]:
+        """Weak ETag from the PDF and cached text file stats plus the requested range."""
+        try:
+            pdf_stat = pdf_path.stat()
+            text_stat = document_store.text_path(pdf_path).stat()
+        except OSError:
+            return None
+        key = f"{pdf_stat.st_mtime_ns}:{pdf_stat.st_size}:{text_stat.st_mtime_ns}:{text_stat.st_size}:{variant!r}"
+        return f'W/"{hashlib.blake2b(key.encode(), digest_size=12).hexdigest()}"'
+
+    def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+        if not if_none_match or not etag:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # If-None-Match uses weak comparison
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+
+    def json_string_chunks(chunks: Iterator[str]) -> Iterator[str]:
+        """Encode a stream of text chunks as a single JSON string, chunk by chunk."""
+        yield '"'
+        for chunk in chunks:
+            yield json.dumps(chunk, ensure_ascii=False)[1:-1]
+        yield '"'
+
+    async def run_document_work(pdf_path: pathlib.Path, work: Callable[[], Any], ranged: bool) -> Any:
+        """
+        Run blocking document work off the event loop: on the extraction threads when the PDF may
+        have to be extracted, otherwise (the text is already on disk) on the default executor.
+        The full text of a document that is already in memory is served inline.
+        """
+        if not ranged and document_store.in_memory(pdf_path):
+            return work()
+        if document_store.needs_extraction(pdf_path, ranged):
+            def extract_then_work() -> Any:
+                # Extract up front so a streamed body only reads the text file later
+                if ranged:
+                    document_store.get_page_table(pdf_path)
+                else:
+                    document_store.get_text(pdf_path)
+                return work()
+
+            return await extraction_limiter.run(extract_then_work)
+        return await asyncio.to_thread(work)
+
+    def document_response(pdf_path: pathlib.Path, if_none_match: Optional[str], variant: tuple, render: Callable[[], Any]):
+        """304 when the client's ETag still matches, otherwise the rendered body with caching headers."""
+        etag = document_etag(pdf_path, *variant)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        body = render()
+        # The text file may only exist once the first request has extracted it
+        etag = etag or document_etag(pdf_path, *variant)
+        headers = {"Cache-Control": "no-cache"}
+        if etag:
+            headers["ETag"] = etag
+        if isinstance(body, Iterator):
+            return StreamingResponse(body, media_type="application/json", headers=headers)
+        return JSONResponse(body, headers=headers)
 
     @app.get("/api/v1/documents/{doc_id}/json")
-    def get_document_json(doc_id: str):
+    async def get_document_json(
+        doc_id: str,
+        page: Optional[int] = Query(default=None, ge=1, description="Return only this page (1-based)"),
+        page_range: Optional[str] = Query(default=None, description="Inclusive page range, e.g. '2-5' or '3-'"),
+        offset: Optional[int] = Query(default=None, ge=0, description="Character offset into the document text"),
+        length: Optional[int] = Query(default=None, ge=0, description="Number of characters to return from offset"),
+        stream: bool = Query(default=False, description="Send the content as a chunked stream"),
+        if_none_match: Optional[str] = Header(None),
+    ):
         """
         Original endpoint – keep as-is for other clients.
-        Returns both doc_id and content.
+        Returns both doc_id and content. With page, page_range or offset/length
+        only that part is returned, along with page_count and total_chars.
         """
-        pdf_path = ASSETS_DIR / f"{doc_id}"
-        print(f"pdf_path: {pdf_path}")
-        if not pdf_path.exists():
-            if not pdf_path.suffix:
-                pdf_path = ASSETS_DIR / f"{doc_id}.pdf"
-        if not pdf_path.exists():
-            raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found in assets")
-
-        ensure_text_dir()
-        text_file = TEXT_DIR / f"{pdf_path.stem}.txt"
-        if text_file.exists():
-            content = text_file.read_text(encoding="utf-8")
-        else:
-            content = extract_text_from_pdf(pdf_path)
-            try:
-                text_file.write_text(content, encoding="utf-8")
-            except Exception:
-                pass
+        pdf_path = resolve_document(doc_id)
+        logger.debug("document requested", extra={"doc_id": doc_id, "pdf_path": str(pdf_path)})
+
+        def render():
+            content, info = read_document(pdf_path, page, page_range, offset, length, stream)
+            result = {"doc_id": str(pdf_path.name)}
+            result.update(info or {})
+            if not stream:
+                result["content"] = content
+                return result
+            head = json.dumps(result, ensure_ascii=False)[:-1] + ', "content": '
+            return itertools.chain([head], json_string_chunks(content), ["}"])
+
+        ranged = page is not None or page_range is not None or offset is not None or length is not None
+        return await run_document_work(
+            pdf_path,
+            lambda: document_response(pdf_path, if_none_match, ("json", page, page_range, offset, length), render),
+            ranged,
+        )
+
+    @app.get("/api/v1/documents/{doc_id}/metadata")
+    async def get_document_metadata(doc_id: str):
+        """Page count, total length and per-page offsets, so clients can fetch only the part they need."""
+        pdf_path = resolve_document(doc_id)
+        table = await run_document_work(pdf_path, lambda: document_store.get_page_table(pdf_path), ranged=True)
+        return {
+            "success": True,
+            "doc_id": str(pdf_path.name),
+            "page_count": table.page_count,
+            "total_chars": table.total_chars,
+            "pages": table.describe(),
+        }
+
+
+
+    BATCH_MAX_DOCUMENTS = 100
 
-        return {"doc_id": str(pdf_path.name), "content": content}
+    class BatchDocumentsRequest(BaseModel):
+        doc_ids: Optional[List[str]] = None
+        filters: Optional[Dict[str, List[str]]] = None
+        limit: int = 20
+        page_range: Optional[str] = None
+        max_chars: Optional[int] = None
 
+    def fetch_batch_document(pdf_path: pathlib.Path, page_range: Optional[str], max_chars: Optional[int]) -> Dict[str, Any]:
+        """One entry of a batch response: the document's text (or an error), cut to ``max_chars``."""
+        try:
+            if page_range is None:
+                # Reads only the first max_chars characters from the text file
+                content, info = read_document(pdf_path, offset=0, length=max_chars)
+                truncated = len(content) < info["total_chars"]
+                del info["offset"], info["length"]
+            else:
+                # Unlike the single-document endpoints, a range past the end is cut to the last page
+                first, last = parse_page_range(page_range)
+                page_count = document_store.get_page_table(pdf_path).page_count
+                if first > page_count:
+                    return {"doc_id": pdf_path.name, "error": f"Document has {page_count} page(s); page_range starts at {first}"}
+                last = page_count if last is None else min(last, page_count)
+                content, info = read_document(pdf_path, page_range=f"{first}-{last}")
+                truncated = max_chars is not None and len(content) > max_chars
+                if truncated:
+                    content = content[:max_chars]
+        except InvalidRequest as exc:
+            return {"doc_id": pdf_path.name, "error": str(exc)}
+        except Exception as exc:
+            return {"doc_id": pdf_path.name, "error": f"Text extraction failed: {exc}"}
+        return {"doc_id": pdf_path.name, **info, "truncated": truncated, "content": content}
+
+    @app.post("/api/v1/documents/batch")
+    async def get_documents_batch(req: BatchDocumentsRequest):
+        """
+        Texts of several documents in one response, instead of one /api/v1/document_text call per ID.
+        Request body: {"doc_ids": ["000001.pdf", "000003.pdf"], "max_chars": 4000}
+        or {"filters": {"invoice_amount": [">5000"]}, "limit": 10, "page_range": "1-2"} to fetch the
+        matches of a search (same filters as /api/v1/search, first "limit" matches in index order).
+        "max_chars" caps each document's content; "truncated" says whether it was cut.
+        Documents that are not cached yet are extracted concurrently (up to EXTRACTION_CONCURRENCY at once).
+        """
+        if (req.doc_ids is None) == (req.filters is None):
+            raise HTTPException(status_code=400, detail="Provide exactly one of doc_ids or filters")
+        if req.max_chars is not None and req.max_chars < 1:
+            raise HTTPException(status_code=400, detail="max_chars must be at least 1")
+        if req.page_range is not None:
+            parse_page_range(req.page_range)  # reject a malformed range once, not per document
+        limit = max(1, min(req.limit, BATCH_MAX_DOCUMENTS))
+        if req.doc_ids is not None:
+            doc_ids = list(dict.fromkeys(req.doc_ids))
+            if len(doc_ids) > BATCH_MAX_DOCUMENTS:
+                raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_DOCUMENTS} doc_ids per request")
+            matched = len(doc_ids)
+        else:
+            found = await search_limiter.run(core.search, req.filters, limit)
+            doc_ids, matched = found["document_ids"], found["count"]
+
+        async def fetch(doc_id: str) -> Dict[str, Any]:
+            pdf_path = document_store.resolve(doc_id)
+            if pdf_path is None:
+                return {"doc_id": doc_id, "error": f"Document '{doc_id}' not found in assets"}
+            return await run_document_work(
+                pdf_path, lambda: fetch_batch_document(pdf_path, req.page_range, req.max_chars), ranged=True
+            )
 
+        documents = await asyncio.gather(*(fetch(doc_id) for doc_id in doc_ids))
+        return {
+            "success": True,
+            "count": len(documents),
+            "matched": matched,
+            "errors": sum(1 for doc in documents if "error" in doc),
+            "documents": documents,
+        }
 
     # 🔹 Salesforce-friendly alias: return just the text as a string
     @app.get("/api/v1/document_text", response_model=str)
-    def get_document_text(doc_id: str):
+    async def get_document_text(
+        doc_id: str,
+        page: Optional[int] = Query(default=None, ge=1, description="Return only this page (1-based)"),
+        page_range: Optional[str] = Query(default=None, description="Inclusive page range, e.g. '2-5' or '3-'"),
+        offset: Optional[int] = Query(default=None, ge=0, description="Character offset into the document text"),
+        length: Optional[int] = Query(default=None, ge=0, description="Number of characters to return from offset"),
+        stream: bool = Query(default=False, description="Send the content as a chunked stream"),
+        if_none_match: Optional[str] = Header(None),
+    ):
         """
         Alias endpoint for Salesforce External Services.
         Returns ONLY the document text as a string so Agentforce
         can safely use it as tool output.
         """
-        pdf_path = ASSETS_DIR / f"{doc_id}"
-        if not pdf_path.exists():
-            if not pdf_path.suffix:
-                pdf_path = ASSETS_DIR / f"{doc_id}.pdf"
-        if not pdf_path.exists():
-            raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found in assets")
-
-        ensure_text_dir()
-        text_file = TEXT_DIR / f"{pdf_path.stem}.txt"
-        if text_file.exists():
-            content = text_file.read_text(encoding="utf-8")
-        else:
-            content = extract_text_from_pdf(pdf_path)
-            try:
-                text_file.write_text(content, encoding="utf-8")
-            except Exception:
-                pass
-
-        return content  # <-- plain string
+        pdf_path = resolve_document(doc_id)
+
+        def render():
+            content, _ = read_document(pdf_path, page, page_range, offset, length, stream)
+            return json_string_chunks(content) if stream else content  # <-- plain string
+
+        ranged = page is not None or page_range is not None or offset is not None or length is not None
+        return await run_document_work(
+            pdf_path,
+            lambda: document_response(pdf_path, if_none_match, ("text", page, page_range, offset, length), render),
+            ranged,
+        )
     
     if __name__ == "__main__":
+        import uvicorn
+
         port = int(os.getenv("PORT", 10000))
-        uvicorn.run(app, host="0.0.0.0", port=port)
+        workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+        if workers > 1 and hasattr(os, "fork"):
+            try:
+                from .prefork import Supervisor
+            except ImportError:  # executed as a script: python src/content_mcp_server.py
+                from prefork import Supervisor
+
+            def preload() -> None:
+                # Runs in the supervisor before forking (and again on SIGHUP), so
+                # every worker starts with the index and text cache already in memory
+                core.warm_up()
+                if TEXT_CACHE_WARM:
+                    core.warm_text_cache()
+                else:
+                    core.warmup = {"state": "disabled"}
+
+            Supervisor(
+                app,
+                "0.0.0.0",
+                port,
+                workers,
+                preload=preload,
+                graceful_timeout=float(os.getenv("GRACEFUL_TIMEOUT", "30")),
+            ).run()
+        else:
+            uvicorn.run(app, host="0.0.0.0", port=port)
 
 
 
@@ -544,9 +965,13 @@ else:
         ) from exc
 
     mcp = FastMCP("Banking Content Server")
-    for func in TOOL_REGISTRY.values():
-        mcp.tool()(func)
+    for name, func in TOOL_REGISTRY.items():
+        mcp.tool(name=name)(func)
 
     if __name__ == "__main__":
         transport = os.getenv("MCP_TRANSPORT", "sse").strip().lower()
-        mcp.run(transport=transport, host="0.0.0.0", port=10000)
+        core.warm_up()
+        try:
+            mcp.run(transport=transport, host="0.0.0.0", port=10000)
+        finally:
+            core.shutdown()
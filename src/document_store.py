@@ -0,0 +1,391 @@
+"""
+Document content service shared by the document endpoints.
+
+Resolves document IDs to PDFs under ``assets/``, keeps extracted text in an
+in-memory LRU bounded by total size, and falls back to the on-disk text cache
+(``assets/texts/<stem>.txt``) and then to PDF extraction on a miss. Cached
+entries are revalidated against the source PDF's mtime, at most every
+``check_interval`` seconds, so hot documents are served without disk reads.
+
+Page and character ranges are served from the ``<stem>.pages.json`` offset
+sidecar: only the bytes covering the requested pages are read from the text
+file, so a ranged request never loads the whole document. A text file without
+a sidecar (committed or hand-edited texts) is indexed as it is, with form
+feeds as page breaks; only the sidecar is written, never the text.
+
+Concurrent misses for the same document are coalesced: one caller loads or
+extracts the text and the others wait for its result.
+"""
+
+import json
+import pathlib
+import sys
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+try:
+    from .observability import observe_extraction, stage
+    from .pdf_text import build_page_index, page_index_path, write_pages, write_text_atomic
+except ImportError:  # src/ is on sys.path rather than imported as a package
+    from observability import observe_extraction, stage
+    from pdf_text import build_page_index, page_index_path, write_pages, write_text_atomic
+
+
+class _Entry:
+    __slots__ = ("value", "source_mtime_ns", "size", "checked_at")
+
+    def __init__(self, value: Any, source_mtime_ns: int, size: int = 0):
+        self.value = value
+        self.source_mtime_ns = source_mtime_ns
+        self.size = size
+        self.checked_at = time.monotonic()
+
+
+class PageTable:
+    """Per-page character and byte offsets into a document's text file."""
+
+    __slots__ = ("char_starts", "char_lens", "byte_starts", "byte_lens", "total_chars", "total_bytes")
+
+    def __init__(self, index: Dict[str, Any]):
+        pages = index["pages"]
+        self.char_starts = [p[0] for p in pages]
+        self.char_lens = [p[1] for p in pages]
+        self.byte_starts = [p[2] for p in pages]
+        self.byte_lens = [p[3] for p in pages]
+        self.total_chars = index["total_chars"]
+        self.total_bytes = index["total_bytes"]
+
+    @property
+    def page_count(self) -> int:
+        return len(self.char_starts)
+
+    def page_span(self, first: int, last: int) -> Tuple[int, int]:
+        """Character span ``[start, end)`` of pages ``first``..``last`` (1-based, inclusive)."""
+        return self.char_starts[first - 1], self.char_starts[last - 1] + self.char_lens[last - 1]
+
+    def byte_span(self, start: int, end: int) -> Tuple[int, int, int]:
+        """Byte span covering characters ``[start, end)``, plus the char offset it begins at."""
+        first = max(bisect_right(self.char_starts, start) - 1, 0)
+        last = max(bisect_right(self.char_starts, max(end - 1, start)) - 1, first)
+        # Read through to the next page so the separating newline is included
+        byte_end = self.byte_starts[last + 1] if last + 1 < len(self.byte_starts) else self.total_bytes
+        return self.byte_starts[first], byte_end, self.char_starts[first]
+
+    def describe(self) -> List[Dict[str, int]]:
+        return [
+            {"page": i + 1, "offset": start, "chars": length}
+            for i, (start, length) in enumerate(zip(self.char_starts, self.char_lens))
+        ]
+
+
+class DocumentStore:
+    """Byte-bounded LRU of extracted document text in front of the disk cache."""
+
+    def __init__(
+        self,
+        assets_dir: pathlib.Path,
+        text_dir: pathlib.Path,
+        extract: Callable[[pathlib.Path], List[str]],
+        max_bytes: int = 64 * 1024 * 1024,
+        check_interval: float = 1.0,
+        max_page_tables: int = 4096,
+    ):
+        self.assets_dir = pathlib.Path(assets_dir)
+        self.text_dir = pathlib.Path(text_dir)
+        self.extract = extract
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.max_page_tables = max_page_tables
+        self._entries: "OrderedDict[pathlib.Path, _Entry]" = OrderedDict()
+        self._page_tables: "OrderedDict[pathlib.Path, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._text_dir_ready = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.extractions = 0
+        self.coalesced = 0
+        self.range_reads = 0
+
+    def resolve(self, doc_id: str) -> Optional[pathlib.Path]:
+        """Map a document ID (with or without ``.pdf``) to its file, or None."""
+        pdf_path = self.assets_dir / f"{doc_id}"
+        if not pdf_path.exists():
+            if not pdf_path.suffix:
+                pdf_path = self.assets_dir / f"{doc_id}.pdf"
+        if not pdf_path.exists():
+            return None
+        return pdf_path
+
+    def text_path(self, pdf_path: pathlib.Path) -> pathlib.Path:
+        return self.text_dir / f"{pdf_path.stem}.txt"
+
+    def _single_flight(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """Run ``load`` once per key; concurrent callers wait for the same result."""
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            return pending.result()
+
+        try:
+            value = load()
+        except BaseException as exc:
+            pending.set_exception(exc)
+            raise
+        else:
+            pending.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _cached(self, cache: "OrderedDict[pathlib.Path, _Entry]", pdf_path: pathlib.Path) -> Tuple[Any, bool]:
+        """Return ``(value, stale)``: the fresh cached value or None, and whether a stale one was found."""
+        with self._lock:
+            entry = cache.get(pdf_path)
+            if entry is None:
+                return None, False
+            if not self._is_fresh(pdf_path, entry):
+                return None, True
+            cache.move_to_end(pdf_path)
+            return entry.value, False
+
+    def in_memory(self, pdf_path: pathlib.Path) -> bool:
+        """Whether the full text is in the in-memory cache (and still fresh)."""
+        text, _ = self._cached(self._entries, pdf_path)
+        return text is not None
+
+    def needs_extraction(self, pdf_path: pathlib.Path, ranged: bool = False) -> bool:
+        """Whether serving ``pdf_path`` may have to extract it: its text is neither in memory (for a
+        full read; ``ranged`` reads go through the page offsets) nor on disk."""
+        if not ranged and self.in_memory(pdf_path):
+            return False
+        return not self.text_path(pdf_path).exists()
+
+    def get_text(self, pdf_path: pathlib.Path) -> str:
+        """Return the extracted text for ``pdf_path``, using the caches where possible."""
+        text, stale = self._cached(self._entries, pdf_path)
+        if text is not None:
+            self.hits += 1
+            return text
+        self.misses += 1
+
+        def load() -> str:
+            source_mtime_ns = self._mtime_ns(pdf_path)
+            text_file = self.text_path(pdf_path)
+            # A cached entry that failed revalidation means the PDF changed, so the
+            # text file on disk is stale as well, unless a ranged read re-extracted it
+            # meanwhile (its page table is then current)
+            current = not stale or self._cached(self._page_tables, pdf_path)[0] is not None
+            if current and text_file.exists():
+                with stage("text_read"):
+                    content = text_file.read_text(encoding="utf-8")
+                self._store(pdf_path, _Entry(content, source_mtime_ns, sys.getsizeof(content)))
+                return content
+            content, _ = self._extract_document(pdf_path)
+            return content
+
+        return self._single_flight(("text", pdf_path), load)
+
+    def iter_text(self, pdf_path: pathlib.Path, chunk_chars: int = 64 * 1024) -> Iterator[str]:
+        """Yield the document text in chunks, streaming from the text file when it isn't cached."""
+        text, stale = self._cached(self._entries, pdf_path)
+        text_file = self.text_path(pdf_path)
+        if text is None and not stale and text_file.exists():
+            # Stream straight from disk without pulling the whole document into the LRU.
+            # An atomic rename mid-stream doesn't affect the already-open file.
+            self.misses += 1
+            with text_file.open("r", encoding="utf-8") as handle:
+                for chunk in iter(lambda: handle.read(chunk_chars), ""):
+                    yield chunk
+            return
+
+        if text is None:
+            text = self.get_text(pdf_path)
+        else:
+            self.hits += 1
+        for start in range(0, len(text), chunk_chars):
+            yield text[start:start + chunk_chars]
+
+    def get_page_table(self, pdf_path: pathlib.Path) -> PageTable:
+        """Page offsets for ``pdf_path``, from the sidecar file, the text file or a fresh extraction."""
+        table, stale = self._cached(self._page_tables, pdf_path)
+        if table is not None:
+            return table
+
+        def load() -> PageTable:
+            source_mtime_ns = self._mtime_ns(pdf_path)
+            # As in get_text(): a full read may have re-extracted the changed PDF meanwhile
+            current = not stale or self._cached(self._entries, pdf_path)[0] is not None
+            index = self._read_page_index(pdf_path) if current else None
+            if index is None and current:
+                index = self._index_text_file(pdf_path)
+            if index is None:
+                # No text yet, or the PDF changed: re-extract so the text and offsets agree
+                _, page_table = self._extract_document(pdf_path)
+                return page_table
+            page_table = PageTable(index)
+            self._store_page_table(pdf_path, _Entry(page_table, source_mtime_ns))
+            return page_table
+
+        return self._single_flight(("pages", pdf_path), load)
+
+    def read_range(self, pdf_path: pathlib.Path, start: int, end: int) -> str:
+        """Characters ``[start, end)`` of the document text, reading only the pages they span."""
+        # Load the offsets first: building them may re-extract and replace the cached text
+        table = self.get_page_table(pdf_path)
+        text, _ = self._cached(self._entries, pdf_path)
+        start = max(0, min(start, table.total_chars))
+        end = max(start, min(end, table.total_chars))
+        if text is not None:
+            self.hits += 1
+            return text[start:end]
+        if start == end:
+            return ""
+
+        byte_start, byte_end, char_base = table.byte_span(start, end)
+        with stage("text_read"), self.text_path(pdf_path).open("rb") as handle:
+            handle.seek(byte_start)
+            chunk = handle.read(byte_end - byte_start).decode("utf-8")
+        self.range_reads += 1
+        return chunk[start - char_base:end - char_base]
+
+    def read_pages(self, pdf_path: pathlib.Path, first: int, last: int) -> str:
+        """Text of pages ``first``..``last`` (1-based, inclusive)."""
+        start, end = self.get_page_table(pdf_path).page_span(first, last)
+        return self.read_range(pdf_path, start, end)
+
+    def _read_page_index(self, pdf_path: pathlib.Path) -> Optional[Dict[str, Any]]:
+        text_file = self.text_path(pdf_path)
+        try:
+            with stage("text_read"):
+                index = json.loads(page_index_path(text_file).read_text(encoding="utf-8"))
+            if index.get("total_bytes") == text_file.stat().st_size:
+                return index
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _index_text_file(self, pdf_path: pathlib.Path) -> Optional[Dict[str, Any]]:
+        """Offsets for an existing text file that has no (or an outdated) sidecar; writes the sidecar."""
+        text_file = self.text_path(pdf_path)
+        try:
+            with stage("text_read"):
+                content = text_file.read_text(encoding="utf-8")
+        except OSError:
+            return None
+        # Form feeds mark page breaks; like the newline that joins extracted
+        # pages, each is one character and one byte
+        index = build_page_index(content.split("\f"))
+        try:
+            write_text_atomic(page_index_path(text_file), json.dumps(index))
+        except OSError:
+            pass  # read-only assets: the offsets are still cached in memory
+        return index
+
+    def _is_fresh(self, pdf_path: pathlib.Path, entry: _Entry) -> bool:
+        now = time.monotonic()
+        if now - entry.checked_at < self.check_interval:
+            return True
+        if self._mtime_ns(pdf_path) != entry.source_mtime_ns:
+            return False
+        entry.checked_at = now
+        return True
+
+    @staticmethod
+    def _mtime_ns(path: pathlib.Path) -> int:
+        try:
+            return path.stat().st_mtime_ns
+        except OSError:
+            return 0
+
+    def _extract(self, pdf_path: pathlib.Path) -> List[str]:
+        if not self._text_dir_ready:
+            self.text_dir.mkdir(parents=True, exist_ok=True)
+            self._text_dir_ready = True
+        start = time.perf_counter()
+        pages = self.extract(pdf_path)
+        observe_extraction(time.perf_counter() - start, len(pages))
+        self.extractions += 1
+        return pages
+
+    def _extract_document(self, pdf_path: pathlib.Path) -> Tuple[str, PageTable]:
+        """
+        Extract ``pdf_path`` and write its text and page offsets, caching both. Full and ranged
+        reads share one flight, so concurrent readers of any kind extract a PDF only once.
+        """
+        def extract() -> Tuple[str, PageTable]:
+            source_mtime_ns = self._mtime_ns(pdf_path)
+            pages = self._extract(pdf_path)
+            try:
+                content = write_pages(self.text_path(pdf_path), pages)
+            except Exception:
+                content = "\n".join(pages)
+            page_table = PageTable(build_page_index(pages))
+            self._store(pdf_path, _Entry(content, source_mtime_ns, sys.getsizeof(content)))
+            self._store_page_table(pdf_path, _Entry(page_table, source_mtime_ns))
+            return content, page_table
+
+        return self._single_flight(("extract", pdf_path), extract)
+
+    def _store(self, pdf_path: pathlib.Path, entry: _Entry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(pdf_path, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[pdf_path] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def _store_page_table(self, pdf_path: pathlib.Path, entry: _Entry) -> None:
+        with self._lock:
+            self._page_tables[pdf_path] = entry
+            self._page_tables.move_to_end(pdf_path)
+            while len(self._page_tables) > self.max_page_tables:
+                self._page_tables.popitem(last=False)
+
+    def invalidate(self, pdf_path: Optional[pathlib.Path] = None) -> None:
+        """Drop one document's text (or everything) from the in-memory cache."""
+        with self._lock:
+            if pdf_path is None:
+                self._entries.clear()
+                self._page_tables.clear()
+                self._bytes = 0
+                return
+            entry = self._entries.pop(pdf_path, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "extractions": self.extractions,
+            "coalesced": self.coalesced,
+            "range_reads": self.range_reads,
+            "page_tables": len(self._page_tables),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,120 @@
+"""
+Field catalog for ``/api/v1/indexes``, computed once per index snapshot.
+
+Holds the field names (with the position of the first document that has each
+field, so ``maxcount`` prefixes need no scan) and, per field, the distinct
+values with their document counts, sorted most common first.
+
+``add()`` and ``remove()`` keep the counts current as documents are upserted or
+deleted; a field's sorted facets are rebuilt on the next read after it changes.
+"""
+
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Mapping, Optional
+
+
+def _by_count(counter: Counter) -> List[tuple]:
+    return sorted(counter.items(), key=lambda item: (-item[1], item[0]))
+
+
+class FieldCatalog:
+    """Field names and value facets for one loaded index."""
+
+    def __init__(self, data: Mapping[str, Mapping[str, Any]]):
+        self.document_count = 0
+        self.first_seen: Dict[str, int] = {}
+        self.counters: Dict[str, Counter] = {}
+        self.distinct: Dict[str, int] = {}
+        self.present: Dict[str, int] = {}
+        self._facets: Dict[str, List[tuple]] = {}
+        self._lock = threading.Lock()
+        for pos, meta in enumerate(data.values()):
+            self._count(pos, meta, 1)
+        self.fields: List[str] = sorted(self.counters)
+
+    def _count(self, pos: int, meta: Mapping[str, Any], delta: int) -> None:
+        self.document_count += delta
+        for field, value in meta.items():
+            if field not in self.counters:
+                self.counters[field] = Counter()
+                self.first_seen[field] = pos
+                self.distinct[field] = 0
+                self.present[field] = 0
+            counter = self.counters[field]
+            key = str(value)
+            before = counter.get(key, 0)
+            after = before + delta
+            if after > 0:
+                counter[key] = after
+            else:
+                counter.pop(key, None)
+            # A catalog restored by from_dict() only lists the most common values, so
+            # its distinct counts become approximate once rarer values change
+            if before == 0 and after > 0:
+                self.distinct[field] += 1
+            elif before > 0 and after <= 0:
+                self.distinct[field] -= 1
+            self.present[field] += delta
+            self._facets.pop(field, None)
+            if self.present[field] <= 0:
+                for table in (self.counters, self.first_seen, self.distinct, self.present):
+                    del table[field]
+
+    def add(self, pos: int, meta: Mapping[str, Any]) -> None:
+        """Count a new or replacement document stored at ``pos``."""
+        with self._lock:
+            self._count(pos, meta, 1)
+            self.fields = sorted(self.counters)
+
+    def remove(self, meta: Mapping[str, Any]) -> None:
+        """Stop counting a deleted or replaced document."""
+        with self._lock:
+            self._count(-1, meta, -1)
+            self.fields = sorted(self.counters)
+
+    def facets(self, field: str) -> List[tuple]:
+        facets = self._facets.get(field)
+        if facets is None:
+            facets = self._facets[field] = _by_count(self.counters[field])
+        return facets
+
+    def to_dict(self, max_values: int) -> Dict[str, Any]:
+        """JSON-serialisable form, keeping at most ``max_values`` facet values per field."""
+        with self._lock:
+            return {
+                "document_count": self.document_count,
+                "first_seen": self.first_seen,
+                "distinct": self.distinct,
+                "present": self.present,
+                "facets": {field: [list(item) for item in self.facets(field)[:max_values]] for field in self.fields},
+            }
+
+    @classmethod
+    def from_dict(cls, stored: Mapping[str, Any]) -> "FieldCatalog":
+        """Rebuild a catalog saved with ``to_dict()`` without rescanning the documents."""
+        catalog = cls({})
+        catalog.document_count = stored["document_count"]
+        catalog.first_seen = dict(stored["first_seen"])
+        catalog.counters = {field: Counter(dict(values)) for field, values in stored["facets"].items()}
+        catalog.distinct = dict(stored["distinct"])
+        catalog.present = dict(stored["present"])
+        catalog.fields = sorted(catalog.counters)
+        return catalog
+
+    def field_names(self, maxcount: Optional[int] = None) -> List[str]:
+        """Sorted names of fields present in the first ``maxcount`` documents."""
+        if maxcount is None or maxcount >= self.document_count:
+            return self.fields
+        return [f for f in self.fields if self.first_seen[f] < maxcount]
+
+    def facet_summary(self, max_values: int) -> Dict[str, Dict[str, Any]]:
+        """Distinct values per field with document counts, at most ``max_values`` each."""
+        with self._lock:
+            return {
+                field: {
+                    "distinct": self.distinct[field],
+                    "values": [{"value": v, "count": c} for v, c in self.facets(field)[:max_values]],
+                }
+                for field in self.fields
+            }
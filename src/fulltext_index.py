@@ -0,0 +1,327 @@
+"""
+Full-text inverted index over the extracted texts in ``assets/texts``.
+
+Text is lowercased and split into ``\\w+`` tokens. For every term the index
+keeps postings of ``{document: [token positions]}``, which supports BM25
+ranking and exact phrase matching. The index is updated incrementally: only
+text files whose mtime or size changed are re-tokenized.
+
+It is persisted under ``<texts>/.fulltext_index/`` as ``shards`` JSON files,
+each holding the positions of the documents that hash to it, so a change
+rewrites only the shards of the documents it touched. Writes are debounced:
+changed shards are saved at most every ``persist_interval`` seconds (and on
+``save()``, e.g. at shutdown). Changes not yet saved are cheap to recover,
+since the next load re-tokenizes any text file that differs from the index.
+"""
+
+import json
+import math
+import pathlib
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from .pdf_text import write_text_atomic
+except ImportError:  # src/ is on sys.path rather than imported as a package
+    from pdf_text import write_text_atomic
+
+TOKEN_RE = re.compile(r"\w+")
+PHRASE_RE = re.compile(r'"([^"]+)"')
+INDEX_VERSION = 2
+INDEX_DIR_NAME = ".fulltext_index"
+SHARDS = 64
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+    """Split a query into loose terms and quoted phrases (each a list of terms)."""
+    phrases = [tokenize(p) for p in PHRASE_RE.findall(query)]
+    phrases = [p for p in phrases if p]
+    terms = tokenize(PHRASE_RE.sub(" ", query))
+    return terms, phrases
+
+
+class FullTextIndex:
+    """BM25 full-text index persisted in shards under ``index_dir`` and refreshed from ``text_dir``."""
+
+    def __init__(self, text_dir: pathlib.Path, index_dir: pathlib.Path, check_interval: float = 1.0,
+                 persist_interval: float = 30.0, shards: int = SHARDS, k1: float = 1.2, b: float = 0.75):
+        self.text_dir = pathlib.Path(text_dir)
+        self.index_dir = pathlib.Path(index_dir)
+        self.check_interval = check_interval
+        self.persist_interval = persist_interval
+        self.shards = shards
+        self.k1 = k1
+        self.b = b
+        # doc -> {"mtime_ns", "size", "length", "terms": [...]}
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        # term -> {doc: [positions]}
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._last_check = 0.0
+        self._dir_mtime_ns: Optional[int] = None
+        self._dirty: Set[int] = set()
+        self._last_save = float("-inf")
+        self.updates = 0
+        self.shard_writes = 0
+
+    # ------------------------------------------------------------------ storage
+    def shard_of(self, doc: str) -> int:
+        return zlib.crc32(doc.encode("utf-8")) % self.shards
+
+    def _shard_path(self, shard: int) -> pathlib.Path:
+        return self.index_dir / f"{shard:03d}.json"
+
+    def load(self) -> None:
+        """Load the persisted shards, if any (missing or outdated shards start empty)."""
+        docs: Dict[str, Dict[str, Any]] = {}
+        postings: Dict[str, Dict[str, List[int]]] = {}
+        for shard in range(self.shards):
+            try:
+                stored = json.loads(self._shard_path(shard).read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            if stored.get("version") != INDEX_VERSION or stored.get("shards") != self.shards:
+                continue
+            for doc, info in stored["docs"].items():
+                positions = info.pop("positions")
+                info["terms"] = sorted(positions)
+                docs[doc] = info
+                for term, plist in positions.items():
+                    postings.setdefault(term, {})[doc] = plist
+        with self._lock:
+            self.docs, self.postings = docs, postings
+            self.total_length = sum(d["length"] for d in docs.values())
+            self._dirty.clear()
+            self._loaded = True
+
+    def save(self) -> int:
+        """Write the shards changed since the last save; returns how many were written."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            by_shard: Dict[int, Dict[str, Any]] = {shard: {} for shard in dirty}
+            for doc, info in self.docs.items():
+                shard_docs = by_shard.get(self.shard_of(doc))
+                if shard_docs is not None:
+                    entry = {key: value for key, value in info.items() if key != "terms"}
+                    entry["positions"] = {term: self.postings[term][doc] for term in info["terms"]}
+                    shard_docs[doc] = entry
+            payloads = {
+                shard: json.dumps({"version": INDEX_VERSION, "shards": self.shards, "docs": shard_docs},
+                                  separators=(",", ":"))
+                for shard, shard_docs in by_shard.items()
+            }
+            self._last_save = time.monotonic()
+        written = 0
+        try:
+            if payloads:
+                self.index_dir.mkdir(parents=True, exist_ok=True)
+            for shard, payload in payloads.items():
+                write_text_atomic(self._shard_path(shard), payload)
+                written += 1
+        except OSError:
+            with self._lock:
+                self._dirty |= dirty  # retried on the next save
+            raise
+        finally:
+            self.shard_writes += written
+        return written
+
+    def _maybe_save(self) -> None:
+        if self._dirty and time.monotonic() - self._last_save >= self.persist_interval:
+            self.save()
+
+    # ------------------------------------------------------------------ updates
+    @staticmethod
+    def doc_id(text_file: pathlib.Path) -> str:
+        # Text files are named after their source PDF, which is the document ID
+        return f"{text_file.stem}.pdf"
+
+    def _remove(self, doc: str) -> None:
+        info = self.docs.pop(doc, None)
+        if info is None:
+            return
+        self.total_length -= info["length"]
+        for term in info["terms"]:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc, None)
+                if not postings:
+                    del self.postings[term]
+
+    def _add(self, doc: str, info: Dict[str, Any], positions: Dict[str, List[int]]) -> None:
+        self.docs[doc] = info
+        self.total_length += info["length"]
+        for term, plist in positions.items():
+            self.postings.setdefault(term, {})[doc] = plist
+
+    @staticmethod
+    def _analyze(text: str) -> Tuple[int, Dict[str, List[int]]]:
+        positions: Dict[str, List[int]] = defaultdict(list)
+        tokens = tokenize(text)
+        for pos, term in enumerate(tokens):
+            positions[term].append(pos)
+        return len(tokens), dict(positions)
+
+    def refresh(self, save: bool = True) -> int:
+        """
+        Re-index new or changed text files and drop deleted ones; returns the number of changes.
+        With ``save``, changed shards are written unless the last write was under ``persist_interval`` ago.
+        """
+        if not self._loaded:
+            self.load()
+        try:
+            dir_mtime_ns = self.text_dir.stat().st_mtime_ns
+        except OSError:
+            dir_mtime_ns = None
+        seen: Set[str] = set()
+        changed: List[Tuple[str, Dict[str, Any], Dict[str, List[int]]]] = []
+        for text_file in sorted(self.text_dir.glob("*.txt")):
+            doc = self.doc_id(text_file)
+            seen.add(doc)
+            try:
+                st = text_file.stat()
+                current = self.docs.get(doc)
+                if current and current["mtime_ns"] == st.st_mtime_ns and current["size"] == st.st_size:
+                    continue
+                length, positions = self._analyze(text_file.read_text(encoding="utf-8"))
+            except OSError:
+                continue
+            info = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "length": length, "terms": sorted(positions)}
+            changed.append((doc, info, positions))
+
+        with self._lock:
+            removed = [doc for doc in self.docs if doc not in seen]
+            for doc in removed:
+                self._remove(doc)
+            for doc, info, positions in changed:
+                self._remove(doc)
+                self._add(doc, info, positions)
+            self._dirty.update(self.shard_of(doc) for doc in removed)
+            self._dirty.update(self.shard_of(doc) for doc, _, _ in changed)
+            self._dir_mtime_ns = dir_mtime_ns
+            self._last_check = time.monotonic()
+            count = len(changed) + len(removed)
+            if count:
+                self.updates += count
+        if save:
+            self._maybe_save()
+        return count
+
+    def ensure_current(self) -> None:
+        """Refresh when the text directory changed; checked at most every ``check_interval`` seconds."""
+        if not self._loaded:
+            self.refresh()
+            return
+        if time.monotonic() - self._last_check < self.check_interval:
+            return
+        self._last_check = time.monotonic()
+        try:
+            dir_mtime_ns = self.text_dir.stat().st_mtime_ns
+        except OSError:
+            return
+        # Text files are written by atomic rename, which always updates the directory mtime
+        if dir_mtime_ns != self._dir_mtime_ns:
+            self.refresh()
+        else:
+            self._maybe_save()
+
+    # ------------------------------------------------------------------ search
+    def _phrase_docs(self, phrase: List[str], candidates: Optional[Set[str]]) -> Set[str]:
+        lists = [self.postings.get(term, {}) for term in phrase]
+        docs = set(lists[0])
+        for plist in lists[1:]:
+            docs &= plist.keys()
+        if candidates is not None:
+            docs &= candidates
+        matched = set()
+        for doc in docs:
+            starts = set(lists[0][doc])
+            for offset, plist in enumerate(lists[1:], start=1):
+                starts &= {p - offset for p in plist[doc]}
+                if not starts:
+                    break
+            if starts:
+                matched.add(doc)
+        return matched
+
+    def search(self, query: str, limit: int = 10, match_all: bool = True,
+               allowed: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Rank documents for ``query`` with BM25; returns ``[(doc_id, score)]`` best first."""
+        terms, phrases = parse_query(query)
+        scored_terms = list(dict.fromkeys(terms + [t for p in phrases for t in p]))
+        if not scored_terms:
+            return []
+        with self._lock:
+            candidates = set(allowed) if allowed is not None else None
+            if match_all:
+                for term in terms:
+                    docs = set(self.postings.get(term, {}))
+                    candidates = docs if candidates is None else candidates & docs
+            for phrase in phrases:
+                candidates = self._phrase_docs(phrase, candidates)
+
+            n_docs = len(self.docs)
+            avg_length = (self.total_length / n_docs) if n_docs else 0.0
+            scores: Dict[str, float] = defaultdict(float)
+            for term in scored_terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, plist in postings.items():
+                    if candidates is not None and doc not in candidates:
+                        continue
+                    tf = len(plist)
+                    norm = 1 - self.b + self.b * (self.docs[doc]["length"] / avg_length if avg_length else 0)
+                    scores[doc] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(doc, round(score, 4)) for doc, score in ranked[:limit]]
+
+    def snippets(self, text: str, query: str, max_snippets: int = 2, window: int = 80) -> List[str]:
+        """Text windows around the first query matches, with matched terms wrapped in ``**``."""
+        terms, phrases = parse_query(query)
+        wanted = set(terms) | {t for p in phrases for t in p}
+        spans = [m.span() for m in TOKEN_RE.finditer(text) if m.group().lower() in wanted]
+        results: List[str] = []
+        covered_until = -1
+        for start, end in spans:
+            if start < covered_until:
+                continue
+            lo = max(0, start - window)
+            hi = min(len(text), end + window)
+            pieces, cursor = [], lo
+            for s, e in spans:
+                if s >= lo and e <= hi:
+                    pieces.append(text[cursor:s])
+                    pieces.append(f"**{text[s:e]}**")
+                    cursor = e
+            pieces.append(text[cursor:hi])
+            snippet = " ".join("".join(pieces).split())
+            results.append(("..." if lo > 0 else "") + snippet + ("..." if hi < len(text) else ""))
+            covered_until = hi
+            if len(results) >= max_snippets:
+                break
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self.docs),
+            "terms": len(self.postings),
+            "tokens": self.total_length,
+            "updates": self.updates,
+            "shards": self.shards,
+            "unsaved_shards": len(self._dirty),
+            "shard_writes": self.shard_writes,
+            "index_dir": str(self.index_dir),
+        }
@@ -0,0 +1,441 @@
+"""
+Process-wide cache for the document index (``assets/indexes.json``).
+
+The index is parsed once and served from memory. With ``backend="columnar"``
+the file is a memory-mapped ``indexes.cidx`` (see ``columnar_index``) instead
+of JSON. The file's mtime and size are
+checked (at most every ``check_interval`` seconds) and, when they change, a new
+snapshot is built off to the side and swapped in with a single assignment, so
+readers never see a half-loaded index.
+
+Documents can also be upserted and deleted without rewriting the file. Each
+change is appended to ``log_file`` (one JSON line per change) and applied in
+place to the current snapshot; the log is replayed on top of the index file
+whenever it is loaded. After ``compact_every`` logged changes the merged index
+is written back to the index file in a background thread and the log is
+truncated to the changes made meanwhile.
+
+Several processes (the prefork workers) can share one index file and log.
+Each remembers how far into the log it has read and picks up the changes the
+others appended when it next checks the file. Appends, compaction and
+truncation hold an exclusive ``flock`` on ``<log_file>.lock`` (reads a shared
+one), and compaction replays the log from disk first, so it writes every
+process's changes rather than only its own. A second lock file serializes
+compactions, so only one process rewrites the index at a time.
+"""
+
+import fcntl
+import json
+import logging
+import pathlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+try:
+    from .columnar_index import ColumnarIndex, ColumnarQueryEngine, ColumnarView, write_columnar
+    from .field_catalog import FieldCatalog
+    from .observability import stage
+    from .pdf_text import write_bytes_atomic, write_text_atomic
+    from .query_engine import QueryEngine
+except ImportError:  # src/ is on sys.path rather than imported as a package
+    from columnar_index import ColumnarIndex, ColumnarQueryEngine, ColumnarView, write_columnar
+    from field_catalog import FieldCatalog
+    from observability import stage
+    from pdf_text import write_bytes_atomic, write_text_atomic
+    from query_engine import QueryEngine
+
+BACKENDS = ("json", "columnar")
+
+# A child of the server's logger, so it shares its handler and format
+logger = logging.getLogger("content_server.index_store")
+
+Signature = Optional[Tuple[int, int]]
+
+
+@contextmanager
+def _flock(path: pathlib.Path, exclusive: bool = True) -> Iterator[None]:
+    """Hold an exclusive (or shared) ``flock`` on ``path`` across processes."""
+    try:
+        handle = path.open("ab")
+    except OSError:
+        if exclusive:
+            raise
+        # Read-only deployments cannot create the lock file, and nothing there appends
+        yield
+        return
+    with handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class IndexSnapshot:
+    """One loaded version of the index file, plus the logged changes applied to it."""
+
+    def __init__(self, data: Mapping[str, Mapping[str, Any]], signature: Signature,
+                 source: Optional[pathlib.Path] = None):
+        self.signature = signature
+        # The file the data was read from; None for an empty index served because none could be read
+        self.source = source
+        if isinstance(data, ColumnarIndex):
+            # The columnar file already holds the per-field indexes and the catalog
+            self.engine: QueryEngine = ColumnarQueryEngine(data)
+            self.catalog = data.catalog
+            self.data: Mapping[str, Mapping[str, Any]] = ColumnarView(self.engine)
+        else:
+            self.engine = QueryEngine(data)
+            self.catalog = FieldCatalog(data)
+            self.data = data
+        self.loaded_at = time.time()
+
+    def upsert(self, doc_id: str, meta: Mapping[str, Any]) -> bool:
+        """Add or replace a document in place; returns True if it replaced one."""
+        old = self.engine.get(doc_id)
+        pos = self.engine.upsert(doc_id, meta)
+        if old is not None:
+            self.catalog.remove(old)
+        self.catalog.add(pos, meta)
+        if isinstance(self.data, dict):
+            self.data[doc_id] = meta
+        return old is not None
+
+    def delete(self, doc_id: str) -> bool:
+        """Remove a document in place; returns False if it was not indexed."""
+        old = self.engine.get(doc_id)
+        if old is None or not self.engine.delete(doc_id):
+            return False
+        self.catalog.remove(old)
+        if isinstance(self.data, dict):
+            del self.data[doc_id]
+        return True
+
+    def apply(self, change: Mapping[str, Any]) -> bool:
+        if change["op"] == "upsert":
+            return self.upsert(change["id"], change["metadata"])
+        return self.delete(change["id"])
+
+
+class IndexStore:
+    """Loads the index once and reloads it atomically when the file changes."""
+
+    def __init__(self, index_file: pathlib.Path, check_interval: float = 1.0, backend: str = "json",
+                 log_file: Optional[pathlib.Path] = None, compact_every: int = 10000):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown index backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+        self.index_file = pathlib.Path(index_file)
+        self.backend = backend
+        self.check_interval = check_interval
+        self.log_file = pathlib.Path(log_file) if log_file else None
+        self.compact_every = compact_every
+        self._snapshot: Optional[IndexSnapshot] = None
+        # Lock order: _lock (loading and compaction), the compaction file lock,
+        # _write_lock (changes), then the log file lock
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        self._log_locked = False
+        self._compacting = False
+        # The log file (device, inode) the snapshot has replayed, and how many bytes of it
+        self._log_identity: Optional[Tuple[int, int]] = None
+        self._log_offset = 0
+        self._last_check = 0.0
+        self.logged_changes = 0
+        self.reloads = 0
+        self.reload_errors = 0
+        self.cache_hits = 0
+        self.upserts = 0
+        self.deletes = 0
+        self.compactions = 0
+        self.compaction_errors = 0
+
+    def _signature(self) -> Signature:
+        try:
+            st = self.index_file.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read(self) -> Mapping[str, Mapping[str, Any]]:
+        if self.backend == "columnar":
+            return ColumnarIndex(self.index_file)
+        return json.loads(self.index_file.read_text(encoding="utf-8"))
+
+    def _read_missing(self) -> Tuple[Mapping[str, Mapping[str, Any]], Optional[pathlib.Path]]:
+        """What to serve while the index file does not exist: ``indexes.json`` until the columnar
+        file has been generated, otherwise an empty index."""
+        json_file = self.index_file.with_suffix(".json")
+        if self.backend == "columnar" and json_file.exists():
+            logger.warning("%s not found; serving %s until it is generated with scripts/convert_index.py",
+                           self.index_file, json_file)
+            try:
+                return json.loads(json_file.read_text(encoding="utf-8")), json_file
+            except (OSError, ValueError):
+                self.reload_errors += 1
+                logger.error("Could not read %s; serving an empty index", json_file, exc_info=True)
+                return {}, None
+        logger.warning("%s not found; serving an empty index", self.index_file)
+        return {}, None
+
+    def reload(self, force: bool = False) -> IndexSnapshot:
+        """Re-read the index file if it or the log was replaced (or unconditionally with ``force``)."""
+        with self._lock:
+            signature = self._signature()
+            current = self._snapshot
+            self._last_check = time.monotonic()
+            if current is not None and not force and current.signature == signature and self._tail_log():
+                return current
+            with stage("index_load"):
+                return self._load(signature, current)
+
+    def _load(self, signature: Signature, current: Optional[IndexSnapshot]) -> IndexSnapshot:
+        data: Mapping[str, Mapping[str, Any]] = {}
+        source: Optional[pathlib.Path] = None
+        if signature is None:
+            data, source = self._read_missing()
+        else:
+            try:
+                data, source = self._read(), self.index_file
+            except Exception:
+                # Keep serving the last good index if the file is mid-write or corrupt
+                self.reload_errors += 1
+                if current is not None:
+                    logger.warning("Could not read %s; serving the previously loaded index", self.index_file,
+                                   exc_info=True)
+                    return current
+                logger.error("Could not read %s; serving an empty index", self.index_file, exc_info=True)
+
+        with self._write_lock, self._locked_log(exclusive=False):
+            snapshot = IndexSnapshot(data, signature, source)
+            self._log_identity = self._current_log()
+            self._log_offset = 0
+            self.logged_changes = 0
+            self._tail(snapshot)
+            self._snapshot = snapshot
+        self.reloads += 1
+        return snapshot
+
+    # --------------------------------------------------------------- change log
+    @contextmanager
+    def _locked_log(self, exclusive: bool) -> Iterator[None]:
+        """Hold the log file lock; callers hold ``_write_lock``, and nested use keeps the outer lock."""
+        if self.log_file is None or self._log_locked:
+            yield
+            return
+        with _flock(self.log_file.with_name(self.log_file.name + ".lock"), exclusive):
+            self._log_locked = True
+            try:
+                yield
+            finally:
+                self._log_locked = False
+
+    def _current_log(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.log_file.stat() if self.log_file else None
+        except OSError:
+            return None
+        return (st.st_dev, st.st_ino) if st else None
+
+    def _tail(self, snapshot: IndexSnapshot) -> bool:
+        """
+        Apply the changes appended to the log since it was last read (by any process); the caller
+        holds the log lock. Returns False if the log was replaced, i.e. another process compacted
+        it, in which case the index file has to be loaded again.
+        """
+        if self.log_file is None:
+            return True
+        current = self._current_log()
+        if current != self._log_identity:
+            if self._log_identity is not None:
+                return False
+            # The log did not exist yet when the snapshot was loaded
+            self._log_identity = current
+        try:
+            with self.log_file.open("rb") as handle:
+                handle.seek(self._log_offset)
+                chunk = handle.read()
+        except OSError:
+            return True
+        # Stop before a partial last line; once the next append ends it, it is skipped as invalid
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            try:
+                change = json.loads(line)
+            except ValueError:
+                continue
+            snapshot.apply(change)
+            self.logged_changes += 1
+        self._log_offset += end
+        return True
+
+    def _tail_log(self) -> bool:
+        with self._write_lock, self._locked_log(exclusive=False):
+            return self._tail(self._snapshot)
+
+    def _sync(self) -> IndexSnapshot:
+        """The snapshot brought up to date with the index file and the whole log; the caller holds the log lock."""
+        snapshot = self._snapshot
+        signature = self._signature()
+        if snapshot is None or snapshot.signature != signature or not self._tail(snapshot):
+            snapshot = self._load(signature, snapshot)
+        return snapshot
+
+    def get(self) -> IndexSnapshot:
+        """Return the current snapshot, reloading first if the file has changed and applying new log entries."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.reload()
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self._last_check = time.monotonic()
+            if self._signature() != snapshot.signature or not self._tail_log():
+                return self.reload()
+            snapshot = self._snapshot
+        self.cache_hits += 1
+        return snapshot
+
+    # ------------------------------------------------------------------ updates
+    def _append(self, snapshot: IndexSnapshot, changes: List[Dict[str, Any]]) -> None:
+        """Append changes to the log and apply them (after any other process's) by reading it back."""
+        lines = "".join(json.dumps(change, separators=(",", ":")) + "\n" for change in changes).encode("utf-8")
+        with self.log_file.open("a+b") as handle:
+            size = handle.seek(0, 2)
+            if size:
+                # A crash mid-append can leave a partial last line: end it so this change starts a fresh one
+                handle.seek(size - 1)
+                if handle.read(1) != b"\n":
+                    lines = b"\n" + lines
+            handle.write(lines)
+        self._tail(snapshot)
+        self._maybe_compact()
+
+    def _check_writable(self) -> None:
+        if self.log_file is None:
+            raise RuntimeError("Index updates are disabled: no change log is configured")
+
+    def upsert(self, documents: Mapping[str, Mapping[str, Any]]) -> Dict[str, int]:
+        """Add or replace documents; returns how many were created and replaced."""
+        self._check_writable()
+        self.get()
+        changes = [{"op": "upsert", "id": doc_id, "metadata": dict(meta)} for doc_id, meta in documents.items()]
+        with self._write_lock, self._locked_log(exclusive=True):
+            snapshot = self._sync()
+            replaced = sum(1 for change in changes if snapshot.engine.get(change["id"]) is not None)
+            self._append(snapshot, changes)
+        self.upserts += len(changes)
+        return {"created": len(changes) - replaced, "replaced": replaced}
+
+    def delete(self, doc_ids: Iterable[str]) -> List[str]:
+        """Remove documents; returns the IDs that were indexed (and so deleted)."""
+        self._check_writable()
+        self.get()
+        with self._write_lock, self._locked_log(exclusive=True):
+            snapshot = self._sync()
+            deleted = [doc_id for doc_id in dict.fromkeys(doc_ids) if snapshot.engine.get(doc_id) is not None]
+            if deleted:
+                self._append(snapshot, [{"op": "delete", "id": doc_id} for doc_id in deleted])
+        self.deletes += len(deleted)
+        return deleted
+
+    def _maybe_compact(self) -> None:
+        if self.logged_changes >= self.compact_every and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._compact_in_background, name="index-compaction", daemon=True).start()
+
+    def _compact_in_background(self) -> None:
+        try:
+            # Another process may have compacted the shared log meanwhile
+            self.compact(min_changes=self.compact_every)
+        except Exception:
+            self.compaction_errors += 1
+            logger.warning("Index compaction failed; the change log is kept", exc_info=True)
+        finally:
+            self._compacting = False
+
+    def _write_index(self, data: Mapping[str, Mapping[str, Any]]) -> None:
+        text = json.dumps(data, indent=2) + "\n"
+        if self.backend == "columnar":
+            # indexes.json stays the source scripts/convert_index.py converts from. It is
+            # written first, so it is never newer than the columnar file (see _unsafe_to_compact)
+            write_text_atomic(self.index_file.with_suffix(".json"), text)
+            write_columnar(data, self.index_file)
+        else:
+            write_text_atomic(self.index_file, text)
+
+    def _unsafe_to_compact(self, snapshot: IndexSnapshot) -> Optional[str]:
+        """Why writing ``snapshot`` back would lose documents, or None if it is safe."""
+        if snapshot.source is None:
+            # Empty because the file was missing or unreadable: writing it would keep only the logged changes
+            return f"{self.index_file} is missing or could not be read"
+        if self.backend == "columnar" and snapshot.source == self.index_file:
+            json_file = self.index_file.with_suffix(".json")
+            try:
+                edited = json_file.stat().st_mtime_ns > snapshot.signature[0]
+            except OSError:
+                edited = False
+            if edited:
+                return f"{json_file} changed after {self.index_file} was generated; run scripts/convert_index.py"
+        return None
+
+    def compact(self, min_changes: int = 1) -> int:
+        """
+        Write the merged index to the index file and drop the logged changes it now contains,
+        if the log holds at least ``min_changes``; returns the number of changes compacted.
+        Raises RuntimeError, keeping the log, when the loaded index is not a complete copy
+        of the index file (it was missing or unreadable, or indexes.json was edited since
+        the columnar file was generated).
+        """
+        if self.log_file is None:
+            return 0
+        with self._lock, _flock(self.log_file.with_name(self.log_file.name + ".compact.lock")):
+            with self._write_lock, self._locked_log(exclusive=True):
+                # Every process's changes, not only this one's
+                snapshot = self._sync()
+                log_size = self._log_offset
+                if not log_size or self.logged_changes < min_changes:
+                    return 0
+                problem = self._unsafe_to_compact(snapshot)
+                if problem:
+                    raise RuntimeError(f"Not compacting the index: {problem}")
+                data = dict(snapshot.data)
+                compacted = self.logged_changes
+
+            # Changes keep being logged (and applied) while the file is written
+            self._write_index(data)
+
+            with self._write_lock, self._locked_log(exclusive=True):
+                # Compactions are serialized, so this is still the log that was read above
+                with self.log_file.open("rb") as handle:
+                    handle.seek(log_size)
+                    tail = handle.read()
+                write_bytes_atomic(self.log_file, [tail])
+                self._log_identity = self._current_log()
+                self._log_offset -= log_size
+                if self.backend == "columnar":
+                    # Map the new file; the changes made meanwhile are replayed from the log
+                    self.reload(force=True)
+                else:
+                    self._snapshot.signature = self._signature()
+                    self.logged_changes = tail[:self._log_offset].count(b"\n")
+            self.compactions += 1
+            return compacted
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "index_file": str(self.index_file),
+            "backend": self.backend,
+            "loaded": snapshot is not None,
+            "source": str(snapshot.source) if snapshot and snapshot.source else None,
+            "documents": len(snapshot.data) if snapshot else 0,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "cache_hits": self.cache_hits,
+            "upserts": self.upserts,
+            "deletes": self.deletes,
+            "logged_changes": self.logged_changes,
+            "compactions": self.compactions,
+            "compaction_errors": self.compaction_errors,
+        }
@@ -0,0 +1,270 @@
+"""
+Shared async HTTP client for the Mobius conversation service used by ``/askme``.
+
+``MobiusConfig`` reads and validates the ``MOBIUS_*`` settings and builds the
+TLS context once (from ``MOBIUS_CERT_CONTENT`` PEM text or ``MOBIUS_CERT_PATH``),
+so no environment lookups, temp files or certificate parsing happen per request.
+
+``MobiusClient`` owns one ``httpx.AsyncClient`` that is reused for every
+request, so connections (and their TLS sessions) are kept alive and pooled.
+HTTP/2 is used when the optional ``h2`` package is installed. Failures that
+happen before Mobius could have processed the request (connection errors, 503)
+are retried with exponential backoff. The configuration is rebuilt on
+``request_reload()`` (wired to SIGHUP) or when the certificate file changes.
+
+``httpx`` is imported when the client is first built (on the first request
+unless ``start()`` is called), so processes that never call Mobius, such as
+MCP mode or a cold Lambda serving a search, don't pay for it.
+"""
+
+import asyncio
+import importlib.util
+import os
+import ssl
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import httpx
+
+CONVERSATION_HEADERS = {
+    "Content-Type": "application/vnd.conversation-request.v1+json",
+    "Accept": "application/vnd.conversation-response.v1+json",
+}
+
+
+class MobiusError(Exception):
+    """A Mobius call failed; ``status_code`` is the HTTP status to return to our caller."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _is_ssl_error(exc: BaseException) -> bool:
+    while exc is not None:
+        if isinstance(exc, ssl.SSLError):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def _file_signature(path: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class MobiusConfig:
+    """Validated Mobius settings plus the TLS trust built from them."""
+
+    REQUIRED = ("MOBIUS_SERVER", "MOBIUS_PORT", "MOBIUS_REPOSITORY_ID")
+
+    def __init__(self, environ: Mapping[str, str]):
+        self.server = environ.get("MOBIUS_SERVER")
+        self.port = environ.get("MOBIUS_PORT")
+        self.repository_id = environ.get("MOBIUS_REPOSITORY_ID")
+        self.cert_path = environ.get("MOBIUS_CERT_PATH")
+        self.cert_content = environ.get("MOBIUS_CERT_CONTENT")
+        self.scheme = environ.get("MOBIUS_SCHEME", "https")
+        self.cert_signature = None if self.cert_content else _file_signature(self.cert_path)
+        self.missing: List[str] = [name for name in self.REQUIRED if not environ.get(name)]
+
+    @classmethod
+    def from_env(cls) -> "MobiusConfig":
+        return cls(os.environ)
+
+    @property
+    def url(self) -> str:
+        return f"{self.scheme}://{self.server}:{self.port}/mobius/rest/conversations"
+
+    def validate(self) -> None:
+        if self.missing:
+            raise MobiusError(500, f"Missing required environment variables: {', '.join(self.missing)}")
+        if not self.cert_content and self.cert_path and self.cert_signature is None:
+            raise MobiusError(500, f"Certificate file not found at path: {self.cert_path}")
+
+    def ssl_verify(self) -> Union[bool, ssl.SSLContext]:
+        """Build the TLS trust: the configured certificate, or the system CAs."""
+        try:
+            if self.cert_content:
+                return ssl.create_default_context(cadata=self.cert_content)
+            if self.cert_path:
+                return ssl.create_default_context(cafile=self.cert_path)
+        except (ssl.SSLError, OSError, ValueError) as exc:
+            raise MobiusError(500, f"Invalid Mobius TLS certificate configuration: {str(exc)}") from exc
+        return True
+
+
+class MobiusClient:
+    """Pooled, keep-alive client for ``POST /mobius/rest/conversations``."""
+
+    def __init__(
+        self,
+        config_loader: Callable[[], MobiusConfig] = MobiusConfig.from_env,
+        pool_size: int = 20,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        retries: int = 2,
+        backoff: float = 0.25,
+        http2: Optional[bool] = None,
+        check_interval: float = 5.0,
+        transport: Optional["httpx.AsyncBaseTransport"] = None,
+    ):
+        self.config_loader = config_loader
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.http2 = importlib.util.find_spec("h2") is not None if http2 is None else http2
+        self.check_interval = check_interval
+        self.transport = transport
+        self.config: Optional[MobiusConfig] = None
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._error: Optional[MobiusError] = None
+        self._reload_requested = False
+        self._last_check = 0.0
+        self.requests = 0
+        self.retried = 0
+        self.reloads = 0
+        self._start_lock = threading.Lock()
+
+    def _build(self) -> Tuple[MobiusConfig, Optional["httpx.AsyncClient"], Optional[MobiusError]]:
+        import httpx
+
+        config = self.config_loader()
+        try:
+            config.validate()
+            verify = config.ssl_verify()
+        except MobiusError as exc:
+            return config, None, exc
+        client = httpx.AsyncClient(
+            verify=verify,
+            http2=self.http2,
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            transport=self.transport,
+        )
+        return config, client, None
+
+    def start(self) -> None:
+        """
+        Load the configuration and create the pooled client; errors are kept and reported per request.
+        Safe to call from a worker thread, so the client can be built off the event loop.
+        """
+        if self.config is None:
+            with self._start_lock:
+                if self.config is None:
+                    config, self._client, self._error = self._build()
+                    self._last_check = time.monotonic()
+                    self.config = config  # set last: requests that see a config also see its client
+
+    def request_reload(self) -> None:
+        """Rebuild config and TLS state before the next request (safe to call from a signal handler)."""
+        self._reload_requested = True
+
+    async def reload(self) -> None:
+        old_client = self._client
+        self.config, self._client, self._error = self._build()
+        self._reload_requested = False
+        self._last_check = time.monotonic()
+        self.reloads += 1
+        if old_client is not None:
+            # Let requests already using the old pool finish before closing it
+            asyncio.get_running_loop().call_later(self.timeout, lambda: asyncio.ensure_future(old_client.aclose()))
+
+    async def _ensure_current(self) -> None:
+        self.start()
+        if self._reload_requested:
+            await self.reload()
+            return
+        if time.monotonic() - self._last_check < self.check_interval:
+            return
+        self._last_check = time.monotonic()
+        config = self.config
+        if config.cert_path and not config.cert_content and _file_signature(config.cert_path) != config.cert_signature:
+            await self.reload()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self.config = None
+
+    async def converse(self, user_query: str, conversation: str, auth: Tuple[str, str]) -> Dict[str, Any]:
+        """Send one conversation request and return the decoded JSON response."""
+        import httpx
+
+        await self._ensure_current()
+        if self._error is not None:
+            raise self._error
+        config = self.config
+        payload = {
+            "userQuery": user_query,
+            "documentIDs": [],
+            "repositories": [
+                {"id": config.repository_id}
+            ],
+            "context": {
+                "conversation": conversation
+            }
+        }
+        self.requests += 1
+        attempt = 0
+        while True:
+            try:
+                response = await self._client.post(config.url, json=payload, headers=CONVERSATION_HEADERS, auth=auth)
+                if response.status_code == 503 and attempt < self.retries:
+                    raise _Retry()
+                response.raise_for_status()
+                return response.json()
+            except (_Retry, httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as exc:
+                # Nothing reached Mobius (or it refused the work), so it is safe to retry
+                if attempt >= self.retries or _is_ssl_error(exc):
+                    raise self._translate(exc) from exc
+            except Exception as exc:
+                raise self._translate(exc) from exc
+            attempt += 1
+            self.retried += 1
+            await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
+
+    @staticmethod
+    def _translate(exc: Exception) -> MobiusError:
+        import httpx
+
+        if isinstance(exc, httpx.TimeoutException):
+            return MobiusError(504, "Mobius service request timed out")
+        if _is_ssl_error(exc):
+            return MobiusError(
+                503,
+                "SSL certificate verification failed. Verify MOBIUS_CERT_CONTENT or MOBIUS_CERT_PATH "
+                f"is set correctly. Error: {str(exc)}",
+            )
+        if isinstance(exc, httpx.TransportError):
+            return MobiusError(503, f"Failed to connect to Mobius service: {str(exc)}")
+        if isinstance(exc, httpx.HTTPStatusError):
+            return MobiusError(502, f"Mobius service returned an error: {str(exc)}")
+        if isinstance(exc, ValueError):
+            return MobiusError(502, f"Invalid response from Mobius service: {str(exc)}")
+        return MobiusError(500, f"Error communicating with Mobius service: {str(exc)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retried": self.retried,
+            "reloads": self.reloads,
+            "configured": self._error is None and self.config is not None,
+            "http2": self.http2,
+            "pool_size": self.pool_size,
+        }
+
+
+class _Retry(Exception):
+    """Internal marker for a retryable response status."""
@@ -0,0 +1,376 @@
+"""
+Metrics, per-stage timing and structured logging for the HTTP mode.
+
+``REGISTRY`` renders the Prometheus text format served at ``/metrics``:
+histograms and counters updated as requests run, plus collectors that read the
+existing ``stats()`` counters (caches, limiters) when the endpoint is scraped.
+No client library is needed.
+
+``stage(name)`` times one step of a request (index load, filter evaluation,
+PDF extraction, text reads, the Mobius call) into
+``content_stage_duration_seconds``. While a request is being served the same
+timings are collected for its ``Server-Timing`` header by
+``RequestMetricsMiddleware``. The collection lives in a context variable, so it
+follows the request into ``asyncio.to_thread`` and the concurrency limiters'
+threads.
+
+``StructuredFormatter`` writes log records with their ``extra`` fields, as
+``key=value`` text or (``LOG_FORMAT=json``) one JSON object per line.
+"""
+
+import contextvars
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; from a warm cache read up to a slow extraction or Mobius answer
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_labels(dict(zip(self.label_names, label_values)))} {_number(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str, count: int = 1) -> None:
+        """Record ``value`` (``count`` times, e.g. once per page of an extraction)."""
+        slot = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                slot = i
+                break
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            series[slot] += count
+            series[-1] += value * count
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> Iterator[str]:
+        with self._lock:
+            snapshot = sorted((key, list(series)) for key, series in self._series.items())
+        for label_values, series in snapshot:
+            labels = dict(zip(self.label_names, label_values))
+            cumulative = 0.0
+            for bound, hits in zip(self.buckets + (math.inf,), series):
+                cumulative += hits
+                yield f"{self.name}_bucket{_labels({**labels, 'le': _number(float(bound))})} {_number(cumulative)}"
+            yield f"{self.name}_sum{_labels(labels)} {_number(series[-1])}"
+            yield f"{self.name}_count{_labels(labels)} {_number(cumulative)}"
+
+
+class CollectedMetric:
+    """A gauge or counter whose samples are read from elsewhere at scrape time."""
+
+    def __init__(self, name: str, kind: str, help: str, collect: Callable[[], Iterable[Sample]]):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.collect = collect
+
+    def render(self) -> Iterator[str]:
+        for labels, value in self.collect():
+            if value is None:
+                continue
+            yield f"{self.name}{_labels(labels)} {_number(float(value))}"
+
+
+class Registry:
+    """The metrics served at ``/metrics``, in registration order."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Any, replace: bool = False) -> Any:
+        # Registering a name again (the server module imported twice, a second app)
+        # returns the existing metric, or swaps in the new collector
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not replace:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name!r} is already registered as a {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def collected(self, name: str, kind: str, help: str, collect: Callable[[], Iterable[Sample]]) -> CollectedMetric:
+        """Register a ``gauge`` or ``counter`` whose ``(labels, value)`` samples ``collect`` returns."""
+        return self._register(CollectedMetric(name, kind, help, collect), replace=True)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.render())
+            except Exception:
+                continue  # a failing collector must not break the whole scrape
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "content_stage_duration_seconds",
+    "Time spent in one stage of a request (index_load, filter, fulltext, extraction, text_read, mobius, *_queue)",
+    ("stage",),
+)
+EXTRACTION_PAGE_SECONDS = REGISTRY.histogram(
+    "content_extraction_page_seconds",
+    "PDF text extraction time per page (the extraction time divided over its pages)",
+)
+EXTRACTED_PAGES = REGISTRY.counter("content_extracted_pages_total", "PDF pages extracted")
+
+# Server-Timing entries of the request being served: (stage, seconds)
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    """Record a stage duration measured by the caller."""
+    STAGE_SECONDS.observe(seconds, name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as stage ``name``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def observe_extraction(seconds: float, pages: int) -> None:
+    observe_stage("extraction", seconds)
+    if pages:
+        EXTRACTION_PAGE_SECONDS.observe(seconds / pages, count=pages)
+        EXTRACTED_PAGES.inc(amount=pages)
+
+
+def begin_request() -> Tuple[contextvars.Token, List[Tuple[str, float]]]:
+    timings: List[Tuple[str, float]] = []
+    return _request_timings.set(timings), timings
+
+
+def end_request(token: contextvars.Token) -> None:
+    _request_timings.reset(token)
+
+
+def _summed(timings: List[Tuple[str, float]]) -> Dict[str, Tuple[float, int]]:
+    totals: Dict[str, Tuple[float, int]] = {}
+    for name, seconds in list(timings):
+        spent, count = totals.get(name, (0.0, 0))
+        totals[name] = (spent + seconds, count + 1)
+    return totals
+
+
+def stage_totals(timings: List[Tuple[str, float]]) -> Dict[str, float]:
+    """Milliseconds per stage, repeated stages summed."""
+    return {name: round(spent * 1000, 2) for name, (spent, _) in _summed(timings).items()}
+
+
+def server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    """``Server-Timing`` header value; repeated stages are summed, durations are in milliseconds."""
+    entries = []
+    for name, (spent, count) in _summed(timings).items():
+        desc = f';desc="{count}x"' if count > 1 else ""
+        entries.append(f"{name};dur={spent * 1000:.2f}{desc}")
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware: per-route latency histogram, in-flight gauge, a ``Server-Timing``
+    header on every response and a log line for requests slower than ``slow_seconds``.
+    Routes are labelled by their template (``/api/v1/documents/{doc_id}/json``) so
+    document IDs don't create new series.
+    """
+
+    def __init__(self, app: Any, registry: Registry = REGISTRY, logger: Optional[logging.Logger] = None,
+                 slow_seconds: float = 1.0):
+        self.app = app
+        self.logger = logger
+        self.slow_seconds = slow_seconds
+        self.in_flight = 0
+        self.latency = registry.histogram(
+            "content_http_request_duration_seconds",
+            "HTTP request latency until the response headers are sent, by route",
+            ("method", "route", "status"),
+        )
+        registry.collected(
+            "content_http_requests_in_flight", "gauge", "HTTP requests being served",
+            lambda: [({}, self.in_flight)],
+        )
+
+    @staticmethod
+    def route_of(scope: Dict[str, Any]) -> str:
+        route = scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        token, timings = begin_request()
+        self.in_flight += 1
+        recorded = False
+
+        def record(status: int) -> float:
+            nonlocal recorded
+            elapsed = time.perf_counter() - start
+            if not recorded:
+                recorded = True
+                route = self.route_of(scope)
+                self.latency.observe(elapsed, scope["method"], route, str(status))
+                if self.logger is not None and elapsed >= self.slow_seconds:
+                    self.logger.warning("slow request", extra={
+                        "method": scope["method"], "route": route, "path": scope.get("path"), "status": status,
+                        "duration_ms": round(elapsed * 1000, 2),
+                        "stages": stage_totals(timings),
+                    })
+            return elapsed
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                elapsed = record(message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, elapsed).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except BaseException:
+            record(500)
+            raise
+        finally:
+            self.in_flight -= 1
+            end_request(token)
+
+
+# ------------------------------------------------------------------ logging
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class StructuredFormatter(logging.Formatter):
+    """One line per record: JSON, or the message followed by ``key=value`` extras."""
+
+    def __init__(self, json_lines: bool = False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+        if self.json_lines:
+            entry = {
+                "ts": round(record.created, 3),
+                "level": record.levelname.lower(),
+                "logger": record.name,
+                "msg": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                entry["exc"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        extras = "".join(f" {key}={json.dumps(value, ensure_ascii=False, default=str)}" for key, value in fields.items())
+        line = f"{self.formatTime(record)} {record.levelname} {record.name}: {record.getMessage()}{extras}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def configure_logging(name: str) -> logging.Logger:
+    """The server's logger, writing to stderr as text or, with ``LOG_FORMAT=json``, JSON lines."""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(StructuredFormatter(os.getenv("LOG_FORMAT", "text").strip().lower() == "json"))
+        logger.addHandler(handler)
+        logger.setLevel(os.getenv("LOG_LEVEL", "INFO").strip().upper())
+        logger.propagate = False
+    return logger
@@ -0,0 +1,151 @@
+"""
+PDF text extraction, shared by the server and ``scripts/preextract_texts.py``.
+
+Extraction is CPU-bound and holds the GIL, so ``PdfExtractor`` can run it in a
+``ProcessPoolExecutor`` instead of the calling thread. Text files are written
+atomically (temp file plus rename) so concurrent readers never see a partial
+file.
+
+Each ``<stem>.txt`` holds the pages joined with newlines. A ``<stem>.pages.json``
+sidecar records every page's character and UTF-8 byte offsets into that file,
+so a page or character range can be read with a seek instead of loading the
+whole document.
+
+PyPDF2 is imported on the first extraction (``load_pdf_reader()``), so serving
+already-extracted text never loads it.
+"""
+
+import functools
+import json
+import os
+import pathlib
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+
+@functools.lru_cache(maxsize=None)
+def load_pdf_reader() -> Optional[type]:
+    """PyPDF2's ``PdfReader`` class, or None when PyPDF2 is not installed."""
+    try:
+        from PyPDF2 import PdfReader
+    except Exception:
+        return None
+    return PdfReader
+
+
+def extract_pages(pdf_path: Union[str, pathlib.Path], raise_errors: bool = False) -> List[str]:
+    """
+    Extract the text of each page of a PDF using PyPDF2. A page that fails is empty; if
+    the PDF cannot be read at all the result is an empty list, or with ``raise_errors``
+    the exception (RuntimeError when PyPDF2 is not installed).
+    """
+    PdfReader = load_pdf_reader()
+    if PdfReader is None:
+        if raise_errors:
+            raise RuntimeError("PyPDF2 is not installed")
+        return []
+
+    try:
+        reader = PdfReader(str(pdf_path))
+        text_parts = []
+        for page in reader.pages:
+            try:
+                txt = page.extract_text() or ""
+            except Exception:
+                txt = ""
+            text_parts.append(txt)
+        return text_parts
+    except Exception:
+        if raise_errors:
+            raise
+        return []
+
+
+def extract_text_from_pdf(pdf_path: Union[str, pathlib.Path]) -> str:
+    """Extract text from a PDF using PyPDF2 (falls back to empty string)."""
+    return "\n".join(extract_pages(pdf_path))
+
+
+def write_text_atomic(path: pathlib.Path, content: str) -> None:
+    """Write ``content`` to ``path`` via a temp file in the same directory and a rename."""
+    write_bytes_atomic(path, [content.encode("utf-8")])
+
+
+def write_bytes_atomic(path: pathlib.Path, chunks: Iterable[bytes]) -> None:
+    """Binary form of ``write_text_atomic()``, for content produced in pieces."""
+    path = pathlib.Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+        # mkstemp creates the file owner-only; match a normally created file
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def page_index_path(text_file: pathlib.Path) -> pathlib.Path:
+    text_file = pathlib.Path(text_file)
+    return text_file.with_name(f"{text_file.stem}.pages.json")
+
+
+def build_page_index(pages: List[str]) -> Dict[str, Any]:
+    """Character and byte offsets of each page within ``"\\n".join(pages)``."""
+    entries = []
+    char_pos = byte_pos = 0
+    for page in pages:
+        char_len = len(page)
+        byte_len = len(page.encode("utf-8"))
+        entries.append([char_pos, char_len, byte_pos, byte_len])
+        # Pages are separated by a single newline (one char, one byte)
+        char_pos += char_len + 1
+        byte_pos += byte_len + 1
+    return {
+        "version": 1,
+        "total_chars": max(char_pos - 1, 0),
+        "total_bytes": max(byte_pos - 1, 0),
+        "pages": entries,
+    }
+
+
+def write_pages(text_file: pathlib.Path, pages: List[str]) -> str:
+    """Write the joined text and its page index sidecar; returns the joined text."""
+    content = "\n".join(pages)
+    write_text_atomic(text_file, content)
+    write_text_atomic(page_index_path(text_file), json.dumps(build_page_index(pages)))
+    return content
+
+
+class PdfExtractor:
+    """Callable that extracts PDF pages in a process pool (or inline when ``workers`` is 0)."""
+
+    def __init__(self, workers: int = 0):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created on first use so importing the server never forks worker processes
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def __call__(self, pdf_path: pathlib.Path) -> List[str]:
+        if self.workers <= 0:
+            return extract_pages(pdf_path)
+        return self._get_executor().submit(extract_pages, str(pdf_path)).result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,273 @@
+"""
+Pre-forking supervisor for running several uvicorn workers on one port.
+
+``Supervisor.run()`` calls ``preload`` once in the parent (load the index, warm
+the text cache), freezes the garbage collector so the collector doesn't touch
+(and copy) the preloaded objects, binds the listening socket and forks the
+workers. Each child inherits the loaded data copy-on-write and serves the
+shared socket with its own event loop. A worker reports readiness over a pipe
+once its startup (lifespan) has completed and it is accepting connections.
+
+Signals to the parent:
+
+* ``SIGHUP`` - graceful restart: ``refresh`` runs in the parent (re-reads a
+  changed index, warms texts extracted meanwhile), then each worker is replaced
+  one at a time; the old worker is only asked to stop once its replacement is
+  ready, and finishes its in-flight requests first
+* ``SIGTERM``/``SIGINT`` - graceful shutdown: workers stop accepting, finish
+  in-flight requests (up to ``graceful_timeout`` seconds) and exit
+
+Workers that die are replaced, with a back-off when they die during startup.
+Code changes still need a full restart, since workers are forked from the
+parent's already-imported modules. Supervisor events go to the server's
+structured logger (``content_server.supervisor``).
+"""
+
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import uvicorn
+
+try:
+    from .observability import configure_logging
+except ImportError:  # src/ is on sys.path rather than imported as a package
+    from observability import configure_logging
+
+
+class _WorkerServer(uvicorn.Server):
+    """uvicorn server that tells the supervisor when it has started."""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        await super().startup(sockets=sockets)
+        if self.started and self.ready_fd >= 0:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+            self.ready_fd = -1
+
+
+class _Worker:
+    __slots__ = ("pid", "ready_fd", "started_at", "ready", "retiring")
+
+    def __init__(self, pid: int, ready_fd: int):
+        self.pid = pid
+        self.ready_fd = ready_fd
+        self.started_at = time.monotonic()
+        self.ready = False
+        self.retiring = False
+
+
+class Supervisor:
+    """Forks ``workers`` uvicorn processes serving ``app`` on one shared socket."""
+
+    def __init__(
+        self,
+        app: Any,
+        host: str,
+        port: int,
+        workers: int,
+        preload: Callable[[], None],
+        refresh: Optional[Callable[[], None]] = None,
+        graceful_timeout: float = 30.0,
+        ready_timeout: float = 120.0,
+        logger: Optional[logging.Logger] = None,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preload = preload
+        self.refresh = refresh or preload
+        self.graceful_timeout = graceful_timeout
+        self.ready_timeout = ready_timeout
+        self.logger = logger or configure_logging("content_server").getChild("supervisor")
+        self.socket: Optional[socket.socket] = None
+        self._workers: Dict[int, _Worker] = {}
+        self._stopping = False
+        self._restart_requested = False
+        self._crashes = 0
+        self._next_spawn_at = 0.0
+
+    # ------------------------------------------------------------------ parent
+
+    def run(self) -> None:
+        self.preload()
+        # Objects loaded so far go to the permanent generation: collections in the
+        # workers no longer write to their headers, so the pages stay shared
+        gc.freeze()
+        self.socket = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(2048)
+        self.socket.set_inheritable(True)
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_restart)
+        self.logger.info("supervisor started", extra={
+            "pid": os.getpid(), "url": f"http://{self.host}:{self.port}", "workers": self.workers,
+        })
+        for _ in range(self.workers):
+            self._spawn()
+        try:
+            while not self._stopping:
+                self._poll_ready(0.5)
+                self._reap()
+                if self._restart_requested:
+                    self._restart_requested = False
+                    self._rolling_restart()
+                self._maintain()
+        finally:
+            self._shutdown()
+
+    def _on_stop(self, signum: int, frame: Any) -> None:
+        self._stopping = True
+
+    def _on_restart(self, signum: int, frame: Any) -> None:
+        self._restart_requested = True
+
+    def _spawn(self) -> _Worker:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._child(write_fd)  # never returns
+        os.close(write_fd)
+        worker = _Worker(pid, read_fd)
+        self._workers[pid] = worker
+        return worker
+
+    def _poll_ready(self, timeout: float) -> None:
+        pending = {w.ready_fd: w for w in self._workers.values() if not w.ready and w.ready_fd >= 0}
+        if not pending:
+            time.sleep(timeout)
+            return
+        try:
+            readable, _, _ = select.select(list(pending), [], [], timeout)
+        except InterruptedError:
+            return
+        for fd in readable:
+            worker = pending[fd]
+            if os.read(fd, 1):
+                worker.ready = True
+                self._crashes = 0
+                self.logger.info("worker ready", extra={
+                    "pid": worker.pid, "startup_s": round(time.monotonic() - worker.started_at, 3),
+                })
+            os.close(fd)
+            worker.ready_fd = -1
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self._workers.pop(pid, None)
+            if worker is None:
+                continue
+            if worker.ready_fd >= 0:
+                os.close(worker.ready_fd)
+            if not worker.retiring and not self._stopping:
+                if not worker.ready:
+                    # Don't fork in a tight loop while workers keep failing during startup
+                    self._crashes += 1
+                    self._next_spawn_at = time.monotonic() + min(2 ** self._crashes, 30)
+                self.logger.warning("worker exited unexpectedly; replacing it", extra={
+                    "pid": pid, "status": status, "during_startup": not worker.ready,
+                    "respawn_delay_s": round(max(self._next_spawn_at - time.monotonic(), 0.0), 3),
+                })
+
+    def _maintain(self) -> None:
+        """Start workers until ``workers`` non-retiring ones are running."""
+        active = sum(1 for w in self._workers.values() if not w.retiring)
+        if active >= self.workers or self._stopping or time.monotonic() < self._next_spawn_at:
+            return
+        for _ in range(self.workers - active):
+            self._spawn()
+
+    def _wait_ready(self, worker: _Worker) -> bool:
+        deadline = time.monotonic() + self.ready_timeout
+        while not worker.ready and worker.pid in self._workers and time.monotonic() < deadline:
+            if self._stopping:
+                return False
+            self._poll_ready(0.2)
+            self._reap()
+        return worker.ready
+
+    def _rolling_restart(self) -> None:
+        self.logger.info("graceful restart: refreshing preloaded data")
+        try:
+            self.refresh()
+        except Exception:  # keep the old workers rather than forking from broken state
+            self.logger.exception("refresh failed; workers not restarted")
+            return
+        gc.freeze()
+        for old in [w for w in self._workers.values() if not w.retiring]:
+            replacement = self._spawn()
+            if not self._wait_ready(replacement):
+                self.logger.error("replacement worker did not become ready; keeping the old one", extra={
+                    "pid": replacement.pid, "old_pid": old.pid,
+                })
+                self._terminate(replacement)
+                return
+            self._terminate(old)
+
+    def _terminate(self, worker: _Worker) -> None:
+        worker.retiring = True
+        try:
+            os.kill(worker.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _shutdown(self) -> None:
+        self.logger.info("shutting down workers", extra={"workers": len(self._workers)})
+        for worker in list(self._workers.values()):
+            self._terminate(worker)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self._workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self._workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self._workers.clear()
+        if self.socket is not None:
+            self.socket.close()
+
+    # ------------------------------------------------------------------- child
+
+    def _child(self, ready_fd: int) -> None:
+        code = 0
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, signal.SIG_DFL)
+            # The app installs its own SIGHUP handler during startup
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            for worker in self._workers.values():
+                if worker.ready_fd >= 0:
+                    os.close(worker.ready_fd)
+            self._workers = {}
+            config = uvicorn.Config(self.app, timeout_graceful_shutdown=int(self.graceful_timeout))
+            _WorkerServer(config, ready_fd).run(sockets=[self.socket])
+        except BaseException:
+            self.logger.exception("worker failed", extra={"pid": os.getpid()})
+            code = 1
+        finally:
+            os._exit(code)
@@ -0,0 +1,425 @@
+"""
+Per-field indexes over the document index used by ``/api/v1/search``.
+
+For every field two structures are built when an index snapshot loads:
+
+* a hash index mapping ``str(value).lower()`` to the set of document positions,
+  used for the case-insensitive equality filters, and
+* a sorted numeric column (values plus positions, searched with ``bisect``) for
+  the numeric comparisons and ranges on fields such as ``invoice_amount``.
+
+The non-numeric values of a field are also kept sorted (for prefix and date
+filters, and sorted pages), built the first time a query needs them.
+
+Filter values are parsed once per request by ``search_filters``. Filters are
+ordered by estimated selectivity. The most selective one is resolved to a
+position set; the others are intersected in, or checked row by row once the
+candidate set is much smaller than theirs. Results come back in index order.
+
+``upsert()`` and ``delete()`` update the structures in place. A replaced
+document keeps its position; a new (or re-added) one is appended, which is
+the order the same change gives a Python dict and so ``indexes.json``.
+
+``page()`` returns one page of results, in index order or sorted by a field,
+with keyset cursors: a page starts after the last entry of the previous one,
+so nothing is skipped or repeated when documents change in between. Sorted
+pages walk the same sorted columns rather than sorting the matches, unless
+there are few enough matches to sort directly.
+"""
+
+import base64
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+try:
+    from .search_filters import _MISSING, FieldFilter, Term, as_number, parse_filters
+except ImportError:  # src/ is on sys.path rather than imported as a package
+    from search_filters import _MISSING, FieldFilter, Term, as_number, parse_filters
+
+# Sort entries are (segment, value, key): numbers first, then other values by
+# their lowercased string form, then documents without the field
+NUMBER, TEXT, MISSING = 0, 1, 2
+SortEntry = Tuple[int, Any, int]
+
+
+class SortedColumn:
+    """``(value, position)`` pairs kept sorted as documents change."""
+
+    __slots__ = ("values", "positions")
+
+    def __init__(self, pairs: List[tuple]):
+        pairs.sort()
+        self.values = [v for v, _ in pairs]
+        self.positions = [p for _, p in pairs]
+
+    def _slot(self, value: Any, pos: int) -> int:
+        # Pairs are sorted by value, then position
+        lo = bisect_left(self.values, value)
+        hi = bisect_right(self.values, value, lo)
+        return bisect_left(self.positions, pos, lo, hi)
+
+    def add(self, value: Any, pos: int) -> None:
+        i = self._slot(value, pos)
+        self.values.insert(i, value)
+        self.positions.insert(i, pos)
+
+    def remove(self, value: Any, pos: int) -> None:
+        i = self._slot(value, pos)
+        del self.values[i]
+        del self.positions[i]
+
+
+class NumericColumn(SortedColumn):
+    """Sorted ``(value, position)`` pairs for the numeric values of one field."""
+
+    __slots__ = ("members",)
+
+    def __init__(self, pairs: List[tuple]):
+        super().__init__(pairs)
+        self.members = set(self.positions)
+
+    def add(self, value: float, pos: int) -> None:
+        super().add(value, pos)
+        self.members.add(pos)
+
+    def remove(self, value: float, pos: int) -> None:
+        super().remove(value, pos)
+        self.members.discard(pos)
+
+
+def sort_entry(value: Any, key: int) -> SortEntry:
+    if value is _MISSING:
+        return (MISSING, 0, key)
+    number = as_number(value)
+    if number is not None:
+        return (NUMBER, number, key)
+    return (TEXT, str(value).lower(), key)
+
+
+class _Reversed:
+    __slots__ = ("item",)
+
+    def __init__(self, item: Any):
+        self.item = item
+
+    def __lt__(self, other: "_Reversed") -> bool:
+        return other.item < self.item
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Reversed) and self.item == other.item
+
+
+def iteration_key(entry: SortEntry, descending: bool) -> tuple:
+    """Orders entries as pages return them; documents without the field always come last, in index order."""
+    if entry[0] == MISSING:
+        return (1, entry[2])
+    return (0, _Reversed(entry) if descending else entry)
+
+
+def walk_sorted(values: Sequence[Any], positions: Sequence[int], segment: int,
+                after: Optional[SortEntry], descending: bool) -> Iterator[SortEntry]:
+    """Entries of one sorted column in page order, starting after the ``after`` entry."""
+    # Descending order is ascending order reversed: TEXT before NUMBER
+    rank = (TEXT, NUMBER) if descending else (NUMBER, TEXT)
+    lo, hi = 0, len(values)
+    if after is not None:
+        if after[0] == MISSING or rank.index(after[0]) > rank.index(segment):
+            return
+        if after[0] == segment:
+            a = bisect_left(values, after[1])
+            b = bisect_right(values, after[1], a)
+            if descending:
+                hi = bisect_left(positions, after[2], a, b)
+            else:
+                lo = bisect_right(positions, after[2], a, b)
+    indices = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+    for i in indices:
+        yield (segment, values[i], positions[i])
+
+
+def encode_cursor(sort_by: Optional[str], descending: bool, entry: SortEntry) -> str:
+    """Opaque cursor for the page that starts after ``entry``."""
+    state = {"s": sort_by, "d": descending, "k": list(entry)}
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: Optional[str], descending: bool) -> SortEntry:
+    """Inverse of ``encode_cursor()``; raises ValueError if the cursor is malformed or
+    was issued for a different sort."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        segment, value, key = state["k"]
+        valid = (state["s"] == sort_by and state["d"] is descending and type(key) is int
+                 and (segment, type(value)) in ((NUMBER, float), (TEXT, str), (MISSING, int)))
+    except (ValueError, TypeError, KeyError):
+        valid = False
+    if not valid:
+        raise ValueError("Invalid cursor for this query and sort order")
+    return (segment, value, key)
+
+
+class QueryEngine:
+    """Hash and sorted per-field indexes built from ``{doc_id: metadata}``."""
+
+    def __init__(self, data: Mapping[str, Mapping[str, Any]]):
+        self.doc_ids: List[str] = list(data.keys())
+        self.rows: List[Mapping[str, Any]] = list(data.values())
+        self.positions: Dict[str, int] = {doc_id: pos for pos, doc_id in enumerate(self.doc_ids)}
+        self.deleted: Set[int] = set()
+        self.equality: Dict[str, Dict[str, Set[int]]] = {}
+        self.numeric: Dict[str, NumericColumn] = {}
+        self.present: Dict[str, Set[int]] = {}
+        # Sorted non-numeric values per field, built the first time a query needs them
+        self.text: Dict[str, SortedColumn] = {}
+        self._lock = threading.RLock()
+
+        numeric_pairs: Dict[str, List[tuple]] = {}
+        for pos, meta in enumerate(self.rows):
+            for field, value in meta.items():
+                self.present.setdefault(field, set()).add(pos)
+                self.equality.setdefault(field, {}).setdefault(str(value).lower(), set()).add(pos)
+                number = as_number(value)
+                if number is not None:
+                    numeric_pairs.setdefault(field, []).append((number, pos))
+
+        for field, pairs in numeric_pairs.items():
+            self.numeric[field] = NumericColumn(pairs)
+
+    # ------------------------------------------------------------------ updates
+    def _index_row(self, pos: int, meta: Mapping[str, Any]) -> None:
+        for field, value in meta.items():
+            key = str(value).lower()
+            self.present.setdefault(field, set()).add(pos)
+            self.equality.setdefault(field, {}).setdefault(key, set()).add(pos)
+            number = as_number(value)
+            if number is not None:
+                self.numeric.setdefault(field, NumericColumn([])).add(number, pos)
+            elif field in self.text:
+                self.text[field].add(key, pos)
+
+    def _unindex_row(self, pos: int, meta: Mapping[str, Any]) -> None:
+        for field, value in meta.items():
+            number = as_number(value)
+            if number is not None:
+                column = self.numeric[field]
+                column.remove(number, pos)
+                if not column.values:
+                    del self.numeric[field]
+            key = str(value).lower()
+            if number is None and field in self.text:
+                self.text[field].remove(key, pos)
+            bucket = self.equality[field][key]
+            bucket.discard(pos)
+            if not bucket:
+                del self.equality[field][key]
+            present = self.present[field]
+            present.discard(pos)
+            if not present:
+                del self.present[field]
+                del self.equality[field]
+                self.text.pop(field, None)
+
+    def get(self, doc_id: str) -> Optional[Mapping[str, Any]]:
+        pos = self.positions.get(doc_id)
+        return None if pos is None else self.rows[pos]
+
+    def upsert(self, doc_id: str, meta: Mapping[str, Any]) -> int:
+        """Add or replace one document; returns its position."""
+        with self._lock:
+            pos = self.positions.get(doc_id)
+            if pos is None:
+                pos = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+                self.rows.append(meta)
+                self.positions[doc_id] = pos
+            else:
+                self._unindex_row(pos, self.rows[pos])
+                self.rows[pos] = meta
+            self._index_row(pos, meta)
+            return pos
+
+    def delete(self, doc_id: str) -> bool:
+        """Remove one document; returns False if it was not indexed."""
+        with self._lock:
+            pos = self.positions.pop(doc_id, None)
+            if pos is None:
+                return False
+            self._unindex_row(pos, self.rows[pos])
+            self.rows[pos] = {}
+            self.deleted.add(pos)
+            return True
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    # ------------------------------------------------------------------ search
+    def _term_positions(self, field: str, term: Term) -> Iterable[int]:
+        """Positions where ``field`` is present and matches a single term (ignoring negation)."""
+        if term.kind == "equal":
+            return self.equality[field].get(term.text, ())
+        if term.kind == "range":
+            column = self.numeric.get(field) if term.numeric else self._text_column(field)
+            if column is None:
+                return ()
+            lo, hi = term.span(column.values)
+            if term.check is None:
+                return column.positions[lo:hi]
+            return [p for v, p in zip(column.values[lo:hi], column.positions[lo:hi]) if term.check(v)]
+        # Wildcards test each distinct value once, not each document
+        numeric = self.numeric.get(field)
+        members = numeric.members if numeric is not None else ()
+        return [p for key, bucket in self.equality[field].items() if term.regex.fullmatch(key)
+                for p in bucket if p not in members]
+
+    def _all_positions(self) -> List[int]:
+        if not self.deleted:
+            return list(range(len(self.doc_ids)))
+        return [p for p in range(len(self.doc_ids)) if p not in self.deleted]
+
+    def _has_field(self, field: str) -> bool:
+        return field in self.present
+
+    def _match_field(self, flt: FieldFilter) -> Set[int]:
+        present = self._has_field(flt.field)
+        if flt.terms:
+            matched: Set[int] = set()
+            if present:
+                for term in flt.terms:
+                    matched.update(self._term_positions(flt.field, term))
+        else:
+            # Only negated values: every document (with the field or not) that none of them match
+            matched = set(self._all_positions()) if flt.negated else set()
+        if present and matched:
+            for term in flt.negated:
+                matched.difference_update(self._term_positions(flt.field, term))
+        return matched
+
+    def _term_estimate(self, field: str, term: Term) -> int:
+        if term.kind == "equal":
+            return len(self.equality[field].get(term.text, ()))
+        if term.kind == "range":
+            column = self.numeric.get(field) if term.numeric else self._text_column(field)
+            if column is None:
+                return 0
+            lo, hi = term.span(column.values)
+            return hi - lo
+        return len(self.present[field])
+
+    def estimate(self, flt: FieldFilter) -> int:
+        """Upper bound on the number of documents a filter can match, without materialising it."""
+        if not flt.terms:
+            return len(self) if flt.negated else 0
+        if flt.field not in self.present:
+            return 0
+        total = sum(self._term_estimate(flt.field, term) for term in flt.terms)
+        return min(total, len(self.present[flt.field]))
+
+    def _row_matches(self, pos: int, flt: FieldFilter) -> bool:
+        return flt.matches(self.rows[pos].get(flt.field, _MISSING))
+
+    def search(self, filters: Mapping[str, List[str]]) -> List[str]:
+        """Return document IDs matching every filter, in index order.
+
+        Raises ``FilterError`` (a ValueError) if a filter value is malformed.
+        """
+        parsed = parse_filters(filters)
+        with self._lock:
+            return [self.doc_ids[p] for p in self._search_positions(parsed)]
+
+    # ------------------------------------------------------------------ pages
+    # Keys identify documents in index order: positions here, order keys in
+    # ColumnarQueryEngine (which overrides these methods).
+    def search_keys(self, filters: Mapping[str, List[str]]) -> List[int]:
+        return self._search_positions(parse_filters(filters))
+
+    def doc_id_at(self, key: int) -> str:
+        return self.doc_ids[key]
+
+    def sort_value(self, key: int, field: str) -> Any:
+        return self.rows[key].get(field, _MISSING)
+
+    def _text_column(self, field: str) -> SortedColumn:
+        column = self.text.get(field)
+        if column is None:
+            numeric = self.numeric.get(field)
+            members = numeric.members if numeric is not None else ()
+            column = SortedColumn([(value, p) for value, bucket in self.equality.get(field, {}).items()
+                                   for p in bucket if p not in members])
+            if field in self.present:
+                # Kept (and maintained) only for fields that exist, not for every name asked for
+                self.text[field] = column
+        return column
+
+    def walk(self, field: str, descending: bool, after: Optional[SortEntry]) -> Iterator[SortEntry]:
+        """Every live document as a sort entry for ``field``, in page order, starting after ``after``."""
+        numeric = self.numeric.get(field)
+        text = self._text_column(field)
+        streams = [walk_sorted(text.values, text.positions, TEXT, after, descending)]
+        if numeric is not None:
+            numbers = walk_sorted(numeric.values, numeric.positions, NUMBER, after, descending)
+            streams.insert(len(streams) if descending else 0, numbers)
+        start = after[2] + 1 if after is not None and after[0] == MISSING else 0
+        present = self.present.get(field, set())
+        missing = ((MISSING, 0, p) for p in range(start, len(self.doc_ids))
+                   if p not in present and p not in self.deleted)
+        return chain(*streams, missing)
+
+    def page(self, filters: Mapping[str, List[str]], sort_by: Optional[str] = None, descending: bool = False,
+             limit: Optional[int] = None, after: Optional[SortEntry] = None
+             ) -> Tuple[List[str], int, Optional[SortEntry]]:
+        """One page of matching document IDs, the total number of matches, and the
+        entry to continue after (None on the last page).
+
+        Without ``sort_by`` pages follow index order; their entries are ``(MISSING, 0, key)``.
+        """
+        with self._lock:
+            keys = self.search_keys(filters)
+            total = len(keys)
+            if sort_by is None:
+                if descending:
+                    end = len(keys) if after is None else bisect_left(keys, after[2])
+                    entries: Iterable[SortEntry] = ((MISSING, 0, keys[i]) for i in range(end - 1, -1, -1))
+                else:
+                    start = 0 if after is None else bisect_right(keys, after[2])
+                    entries = ((MISSING, 0, k) for k in keys[start:])
+            elif total * 8 <= len(self):
+                # Few matches: sorting them is cheaper than walking the sorted column
+                def order(entry: SortEntry) -> tuple:
+                    return iteration_key(entry, descending)
+
+                ordered = sorted((sort_entry(self.sort_value(k, sort_by), k) for k in keys), key=order)
+                entries = ordered[0 if after is None else bisect_right(ordered, order(after), key=order):]
+            elif not filters:
+                entries = self.walk(sort_by, descending, after)
+            else:
+                matched = set(keys)
+                entries = (e for e in self.walk(sort_by, descending, after) if e[2] in matched)
+            page = list(islice(entries, None if limit is None else limit + 1))
+            last = None
+            if limit is not None and len(page) > limit:
+                page = page[:limit]
+                last = page[-1] if page else None
+            return [self.doc_id_at(e[2]) for e in page], total, last
+
+    def _search_positions(self, filters: List[FieldFilter]) -> List[int]:
+        if not filters:
+            return self._all_positions()
+
+        planned = sorted(((self.estimate(flt), flt) for flt in filters), key=lambda t: t[0])
+        if planned[0][0] == 0:
+            return []
+
+        result = self._match_field(planned[0][1])
+        for size, flt in planned[1:]:
+            if not result:
+                return []
+            if len(result) * 4 < size:
+                # Cheaper to test the few remaining candidates than to build a large set
+                result = {p for p in result if self._row_matches(p, flt)}
+            else:
+                result.intersection_update(self._match_field(flt))
+        return sorted(result)
@@ -0,0 +1,228 @@
+"""
+Filter grammar for ``/api/v1/search``, parsed once per request.
+
+Each filter maps a field to a list of values. A document matches a field's
+filter when it matches any of the plain values and none of the negated ones.
+Values are:
+
+* ``XYY`` - case-insensitive equality with ``str(value)``, as before
+* ``>5000``, ``<5000``, ``>=5000``, ``<=5000`` - numeric comparisons
+* ``between 4000..7000`` - inclusive numeric range
+* the same comparisons with ISO dates (``>=2024-01-01``,
+  ``between 2024-01-01..2024-03-31``) - match string values that start with
+  an ISO date; a bound given as a day covers that whole day
+* ``G*`` - prefix, and ``*agreement``/``inv-??12`` - wildcards (``*`` any run
+  of characters, ``?`` one character), case-insensitive on non-numeric values
+* ``!XYY``, ``!>5000``, ``!G*`` - negation; a document without the field
+  matches a negated value
+* ``=!XYY`` - a leading ``=`` makes the rest a literal equality value
+
+Anything else starting with a comparison operator or ``between`` is rejected
+with ``FilterError`` instead of being silently ignored. Range and prefix terms
+are lower/upper bounds (``Term.low``/``Term.high``) on the sorted columns the
+engines keep, so they are answered with ``bisect`` rather than a scan.
+"""
+
+import datetime
+import math
+import re
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, List, Mapping, Optional, Sequence, Tuple
+
+# Sorts after any character a value can contain: "g" + _HIGHEST bounds every string starting with "g"
+_HIGHEST = chr(0x10FFFF)
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_MISSING = object()
+
+
+class FilterError(ValueError):
+    """A filter value that is not valid in the filter grammar."""
+
+
+def as_number(value: Any) -> Optional[float]:
+    """The value as a float if it is a number (bools included, NaN excluded), else None."""
+    if not isinstance(value, (int, float)):
+        return None
+    try:
+        number = float(value)
+    except OverflowError:
+        return None
+    return None if math.isnan(number) else number
+
+
+def is_date_text(text: str) -> bool:
+    return _ISO_DATE.match(text) is not None
+
+
+class Term:
+    """One parsed filter value.
+
+    ``kind`` is ``"equal"`` (``text`` is the lowercased value), ``"range"``
+    (``numeric`` ranges compare numbers, the others compare lowercased text
+    between ``low`` and ``high``, optionally restricted by ``check``) or
+    ``"pattern"`` (``regex`` over the lowercased text of non-numeric values).
+    """
+
+    __slots__ = ("source", "kind", "negated", "text", "numeric", "low", "low_inclusive",
+                 "high", "high_inclusive", "check", "regex")
+
+    def __init__(self, source: str, kind: str, negated: bool = False, text: str = "", numeric: bool = False,
+                 low: Any = None, low_inclusive: bool = True, high: Any = None, high_inclusive: bool = True,
+                 check: Optional[Callable[[str], bool]] = None, regex: Optional["re.Pattern[str]"] = None):
+        self.source = source
+        self.kind = kind
+        self.negated = negated
+        self.text = text
+        self.numeric = numeric
+        self.low = low
+        self.low_inclusive = low_inclusive
+        self.high = high
+        self.high_inclusive = high_inclusive
+        self.check = check
+        self.regex = regex
+
+    def span(self, values: Sequence[Any]) -> Tuple[int, int]:
+        """Index range of ``values`` (sorted) inside this range term's bounds."""
+        lo = 0
+        if self.low is not None:
+            lo = bisect_left(values, self.low) if self.low_inclusive else bisect_right(values, self.low)
+        hi = len(values)
+        if self.high is not None:
+            hi = bisect_right(values, self.high) if self.high_inclusive else bisect_left(values, self.high)
+        return lo, max(lo, hi)
+
+    def in_range(self, key: Any) -> bool:
+        if self.low is not None and (key < self.low or (key == self.low and not self.low_inclusive)):
+            return False
+        if self.high is not None and (key > self.high or (key == self.high and not self.high_inclusive)):
+            return False
+        return self.check is None or self.check(key)
+
+    def matches(self, value: Any) -> bool:
+        """Whether a present field value satisfies this term (ignoring ``negated``)."""
+        if self.kind == "equal":
+            return str(value).lower() == self.text
+        number = as_number(value)
+        if self.kind == "range" and self.numeric:
+            return number is not None and self.in_range(number)
+        if number is not None:
+            return False
+        text = str(value).lower()
+        if self.kind == "range":
+            return self.in_range(text)
+        return self.regex.fullmatch(text) is not None
+
+
+class FieldFilter:
+    """The parsed values for one field: any of ``terms`` and none of ``negated``."""
+
+    __slots__ = ("field", "terms", "negated")
+
+    def __init__(self, field: str, terms: List[Term], negated: List[Term]):
+        self.field = field
+        self.terms = terms
+        self.negated = negated
+
+    def matches(self, value: Any) -> bool:
+        """Whether a document whose field holds ``value`` (``_MISSING`` if absent) passes."""
+        if not self.terms and not self.negated:
+            return False
+        if value is _MISSING:
+            # Documents without the field only pass a filter made of negated values
+            return not self.terms
+        if self.terms and not any(term.matches(value) for term in self.terms):
+            return False
+        return not any(term.matches(value) for term in self.negated)
+
+
+def _date_bound(text: str) -> Optional[str]:
+    if not is_date_text(text):
+        return None
+    try:
+        datetime.date.fromisoformat(text[:10])
+    except ValueError:
+        return None
+    return text.lower()
+
+
+def _number_bound(text: str) -> Optional[float]:
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return None if math.isnan(number) else number
+
+
+def _comparison(source: str, op: str, operand: str) -> Term:
+    number = _number_bound(operand)
+    if number is not None:
+        low_op = op in (">", ">=")
+        return Term(source, "range", numeric=True,
+                    low=number if low_op else None, low_inclusive=op == ">=",
+                    high=None if low_op else number, high_inclusive=op == "<=")
+    day = _date_bound(operand)
+    if day is None:
+        raise FilterError(f"Invalid filter value {source!r}: expected a number or an ISO date after {op!r}")
+    # Values are compared by their first len(bound) characters, so a day bound covers the whole day
+    if op == ">=":
+        return Term(source, "range", low=day, check=is_date_text)
+    if op == ">":
+        return Term(source, "range", low=day + _HIGHEST, check=is_date_text)
+    if op == "<":
+        return Term(source, "range", high=day, high_inclusive=False, check=is_date_text)
+    return Term(source, "range", high=day + _HIGHEST, high_inclusive=False, check=is_date_text)
+
+
+def _between(source: str, operand: str) -> Term:
+    low, sep, high = operand.partition("..")
+    low, high = low.strip(), high.strip()
+    if not sep or not low or not high:
+        raise FilterError(f"Invalid filter value {source!r}: expected 'between <low>..<high>'")
+    numbers = _number_bound(low), _number_bound(high)
+    if None not in numbers:
+        return Term(source, "range", numeric=True, low=numbers[0], high=numbers[1])
+    days = _date_bound(low), _date_bound(high)
+    if None not in days:
+        return Term(source, "range", low=days[0], high=days[1] + _HIGHEST, high_inclusive=False, check=is_date_text)
+    raise FilterError(f"Invalid filter value {source!r}: both bounds must be numbers or both ISO dates")
+
+
+def _wildcard(source: str, text: str) -> Term:
+    prefix = text[:-1]
+    if text.endswith("*") and "*" not in prefix and "?" not in prefix:
+        return Term(source, "range", low=prefix, high=prefix + _HIGHEST, high_inclusive=False)
+    pattern = "".join(".*" if c == "*" else "." if c == "?" else re.escape(c) for c in text)
+    return Term(source, "pattern", regex=re.compile(pattern, re.DOTALL))
+
+
+def parse_term(source: str) -> Term:
+    """Parse one filter value; raises FilterError if it is malformed."""
+    if not isinstance(source, str):
+        raise FilterError(f"Invalid filter value {source!r}: expected a string")
+    text = source
+    negated = text.startswith("!")
+    if negated:
+        text = text[1:]
+    if text.startswith("="):
+        term = Term(source, "equal", text=text[1:].lower())
+    elif text[:2] in (">=", "<="):
+        term = _comparison(source, text[:2], text[2:].strip())
+    elif text[:1] in (">", "<"):
+        term = _comparison(source, text[0], text[1:].strip())
+    elif text.lower().startswith("between "):
+        term = _between(source, text[8:].strip())
+    elif "*" in text or "?" in text:
+        term = _wildcard(source, text.lower())
+    else:
+        term = Term(source, "equal", text=text.lower())
+    term.negated = negated
+    return term
+
+
+def parse_filters(filters: Mapping[str, List[str]]) -> List[FieldFilter]:
+    """Parse every filter value of a request once; raises FilterError on the first bad one."""
+    parsed = []
+    for field, values in filters.items():
+        terms = [parse_term(value) for value in values]
+        parsed.append(FieldFilter(field, [t for t in terms if not t.negated], [t for t in terms if t.negated]))
+    return parsed
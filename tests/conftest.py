@@ -0,0 +1,5 @@
+import pathlib
+import sys
+
+# The server modules live in src/ and import each other as top-level modules
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,45 @@
+import importlib
+import json
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+
+
+def load_app(monkeypatch, tmp_path, admin_token=None):
+    (tmp_path / "indexes.json").write_text(json.dumps({"000001.pdf": {"customer": "Customer 1"}}), encoding="utf-8")
+    monkeypatch.setenv("MCP_SERVER_MODE", "http")
+    monkeypatch.setenv("CONTENT_ASSETS_DIR", str(tmp_path))
+    if admin_token is None:
+        monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    else:
+        monkeypatch.setenv("ADMIN_TOKEN", admin_token)
+    monkeypatch.delitem(sys.modules, "content_mcp_server", raising=False)
+    return importlib.import_module("content_mcp_server").app
+
+
+def test_admin_endpoints_are_off_without_token(monkeypatch, tmp_path):
+    client = TestClient(load_app(monkeypatch, tmp_path))
+    assert client.get("/api/v1/admin/indexes/stats").status_code == 404
+    assert client.post("/api/v1/admin/indexes/compact").status_code == 404
+
+
+def test_admin_endpoints_require_token(monkeypatch, tmp_path):
+    client = TestClient(load_app(monkeypatch, tmp_path, admin_token="s3cret"))
+    url = "/api/v1/admin/indexes/documents/000002.pdf"
+    assert client.put(url, json={"customer": "Customer 2"}).status_code == 401
+    assert client.put(url, json={"customer": "Customer 2"},
+                      headers={"Authorization": "Bearer wrong"}).status_code == 403
+    response = client.put(url, json={"customer": "Customer 2"}, headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+
+
+def test_admin_endpoints_stay_out_of_the_schemas(monkeypatch, tmp_path):
+    client = TestClient(load_app(monkeypatch, tmp_path, admin_token="s3cret"))
+    for schema in ("/openapi.json", "/openapi_salesforce.json"):
+        paths = client.get(schema).json()["paths"]
+        assert "/api/v1/search" in paths
+        assert not [path for path in paths if path.startswith("/api/v1/admin")]
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from answer_cache import AnswerCache
+
+
+class Upstream:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+
+    async def fetch(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return {"answer": self.calls}
+
+
+def test_miss_hit_and_coalesced():
+    async def run():
+        cache, upstream = AnswerCache(ttl=60), Upstream()
+        first = await asyncio.gather(*(cache.get_or_fetch("k", upstream.fetch) for _ in range(3)))
+        again = await cache.get_or_fetch("k", upstream.fetch)
+        return first, again, upstream.calls, cache.stats()
+
+    first, again, calls, stats = asyncio.run(run())
+    assert first == [({"answer": 1}, "MISS"), ({"answer": 1}, "COALESCED"), ({"answer": 1}, "COALESCED")]
+    assert again == ({"answer": 1}, "HIT")
+    assert calls == 1
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 2, 1)
+
+
+def test_entries_expire_after_ttl():
+    async def run():
+        cache, upstream = AnswerCache(ttl=0.1), Upstream(delay=0)
+        statuses = [(await cache.get_or_fetch("k", upstream.fetch))[1]]
+        statuses.append((await cache.get_or_fetch("k", upstream.fetch))[1])
+        await asyncio.sleep(0.15)
+        statuses.append((await cache.get_or_fetch("k", upstream.fetch))[1])
+        return statuses, upstream.calls
+
+    assert asyncio.run(run()) == (["MISS", "HIT", "MISS"], 2)
+
+
+def test_failures_are_not_cached():
+    async def run():
+        cache, upstream = AnswerCache(ttl=60), Upstream()
+        upstream.fail = True
+        results = await asyncio.gather(*(cache.get_or_fetch("k", upstream.fetch) for _ in range(2)),
+                                       return_exceptions=True)
+        upstream.fail = False
+        return results, await cache.get_or_fetch("k", upstream.fetch), upstream.calls
+
+    results, after, calls = asyncio.run(run())
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+    assert after == ({"answer": 2}, "MISS")
+    assert calls == 2
+
+
+def test_cancelled_first_caller_does_not_cancel_followers():
+    async def run():
+        cache, upstream = AnswerCache(ttl=60), Upstream()
+        leader = asyncio.ensure_future(cache.get_or_fetch("k", upstream.fetch))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(cache.get_or_fetch("k", upstream.fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers), await cache.get_or_fetch("k", upstream.fetch), upstream.calls
+
+    followers, after, calls = asyncio.run(run())
+    assert followers == [({"answer": 1}, "COALESCED")] * 2
+    assert after == ({"answer": 1}, "HIT")
+    assert calls == 1
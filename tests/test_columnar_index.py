@@ -0,0 +1,28 @@
+from columnar_index import ColumnarIndex, ColumnarQueryEngine, write_columnar
+
+
+def test_position_searches_mapped_doc_id_order(tmp_path):
+    # Unsorted, with non-ASCII IDs and a prefix of another ID
+    data = {doc_id: {"n": i} for i, doc_id in enumerate(["b.pdf", "é.pdf", "a.pdf", "a.pdf2", "Z.pdf", "ab.pdf"])}
+    write_columnar(data, tmp_path / "indexes.cidx")
+    index = ColumnarIndex(tmp_path / "indexes.cidx")
+
+    for pos, doc_id in enumerate(data):
+        assert index.position(doc_id) == pos
+        assert index[doc_id] == {"n": pos}
+    for missing in ("", "a", "c.pdf", "zz"):
+        assert index.position(missing) is None
+    # The order is read from the mapping, not built per process
+    assert isinstance(index._doc_id_order, memoryview)
+
+
+def test_engine_upsert_and_delete_by_position(tmp_path):
+    data = {f"{i:06d}.pdf": {"customer": f"Customer {i % 3}"} for i in range(50, 0, -1)}
+    write_columnar(data, tmp_path / "indexes.cidx")
+    engine = ColumnarQueryEngine(ColumnarIndex(tmp_path / "indexes.cidx"))
+
+    assert engine.upsert("000007.pdf", {"customer": "Customer 9"}) == list(data).index("000007.pdf")
+    assert engine.delete("000008.pdf")
+    assert engine.get("000008.pdf") is None
+    assert engine.search({"customer": ["Customer 9"]}) == ["000007.pdf"]
+    assert len(engine) == 49
@@ -0,0 +1,50 @@
+import pytest
+
+from content_core import ContentCore, InvalidRequest
+from pdf_text import write_pages
+
+
+def make_core(tmp_path, pages):
+    (tmp_path / "texts").mkdir()
+    (tmp_path / "doc.pdf").write_bytes(b"%PDF-1.4")
+    write_pages(tmp_path / "texts" / "doc.txt", pages)
+    return ContentCore(tmp_path, extraction_workers=0)
+
+
+def test_long_page_continues_by_offset(tmp_path):
+    pages = ["a" * 250, "second page", "third"]
+    core = make_core(tmp_path, pages)
+
+    result = core.document_page("doc.pdf", page=1, max_chars=100)
+    assert result["truncated"] is True
+    assert result["next_page"] is None
+    assert result["content"] == "a" * 100
+
+    text = result["content"]
+    while result["next_offset"] is not None:
+        result = core.document_page("doc.pdf", offset=result["next_offset"], max_chars=100)
+        text += result["content"]
+    assert text == "\n".join(pages)
+
+
+def test_whole_page_continues_with_next_page(tmp_path):
+    core = make_core(tmp_path, ["first", "second"])
+
+    result = core.document_page("doc.pdf", page=1, max_chars=100)
+    assert (result["content"], result["truncated"]) == ("first", False)
+    assert (result["next_offset"], result["next_page"]) == (None, 2)
+
+    result = core.document_page("doc.pdf", page_range="2-", max_chars=3)
+    assert (result["content"], result["truncated"]) == ("sec", True)
+    assert result["next_offset"] == len("first\n") + 3
+
+
+def test_length_with_page_selector_is_rejected(tmp_path):
+    core = make_core(tmp_path, ["first", "second"])
+    pdf_path = core.resolve("doc.pdf")
+
+    for selector in ({"page": 2}, {"page_range": "2-"}):
+        with pytest.raises(InvalidRequest, match="length applies to offset"):
+            core.read_document(pdf_path, length=3, **selector)
+    assert core.read_document(pdf_path, length=3) == ("fir", {"page_count": 2, "total_chars": 12,
+                                                              "offset": 0, "length": 3})
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from document_store import DocumentStore
+from pdf_text import page_index_path
+
+
+def make_store(tmp_path, extract=None):
+    calls = []
+
+    def fail_extract(pdf_path):
+        calls.append(pdf_path)
+        return ["extracted"]
+
+    (tmp_path / "texts").mkdir()
+    store = DocumentStore(tmp_path, tmp_path / "texts", extract or fail_extract)
+    return store, calls
+
+
+def test_page_table_from_text_file_without_sidecar_keeps_text(tmp_path):
+    store, calls = make_store(tmp_path)
+    (tmp_path / "doc.pdf").write_bytes(b"%PDF-1.4")
+    text_file = tmp_path / "texts" / "doc.txt"
+    text_file.write_text("First page é\fSecond page\fThird", encoding="utf-8")
+    before = text_file.read_bytes()
+
+    table = store.get_page_table(tmp_path / "doc.pdf")
+
+    assert calls == []
+    assert text_file.read_bytes() == before
+    assert table.page_count == 3
+    assert store.read_pages(tmp_path / "doc.pdf", 2, 2) == "Second page"
+    assert store.read_range(tmp_path / "doc.pdf", 6, 12) == "page é"
+    index = json.loads(page_index_path(text_file).read_text(encoding="utf-8"))
+    assert index["total_bytes"] == len(before)
+
+
+def test_outdated_sidecar_is_rebuilt_from_text_file(tmp_path):
+    store, calls = make_store(tmp_path)
+    (tmp_path / "doc.pdf").write_bytes(b"%PDF-1.4")
+    text_file = tmp_path / "texts" / "doc.txt"
+    text_file.write_text("hand-edited text", encoding="utf-8")
+    page_index_path(text_file).write_text(json.dumps({"total_bytes": 3, "total_chars": 3, "pages": [[0, 3, 0, 3]]}))
+
+    assert store.read_range(tmp_path / "doc.pdf", 0, 11) == "hand-edited"
+    assert calls == []
+    assert text_file.read_text(encoding="utf-8") == "hand-edited text"
+
+
+def test_missing_text_is_extracted(tmp_path):
+    store, calls = make_store(tmp_path)
+    (tmp_path / "doc.pdf").write_bytes(b"%PDF-1.4")
+
+    assert store.needs_extraction(tmp_path / "doc.pdf", ranged=True)
+    assert store.get_page_table(tmp_path / "doc.pdf").page_count == 1
+    assert len(calls) == 1
+    assert (tmp_path / "texts" / "doc.txt").read_text(encoding="utf-8") == "extracted"
+
+
+def slow_extract(calls, text="page one"):
+    def extract(pdf_path):
+        calls.append(pdf_path)
+        time.sleep(0.2)
+        return [text, "page two"]
+    return extract
+
+
+def read_concurrently(store, pdf_path):
+    readers = [lambda: store.get_text(pdf_path)] * 4 + [lambda: store.read_range(pdf_path, 0, 4)] * 4
+    with ThreadPoolExecutor(len(readers)) as pool:
+        return [future.result() for future in [pool.submit(reader) for reader in readers]]
+
+
+def test_concurrent_full_and_ranged_reads_extract_once(tmp_path):
+    calls = []
+    store, _ = make_store(tmp_path, slow_extract(calls))
+    (tmp_path / "doc.pdf").write_bytes(b"%PDF-1.4")
+
+    assert read_concurrently(store, tmp_path / "doc.pdf") == ["page one\npage two"] * 4 + ["page"] * 4
+    assert len(calls) == 1
+    assert store.extractions == 1
+
+
+def test_concurrent_reads_of_changed_pdf_extract_once(tmp_path):
+    calls = []
+    store, _ = make_store(tmp_path, slow_extract(calls, "old one"))
+    store.check_interval = 0
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    store.get_text(pdf_path), store.get_page_table(pdf_path)
+
+    store.extract = slow_extract(calls, "new one")
+    os.utime(pdf_path, ns=(1, 1))
+    assert read_concurrently(store, pdf_path) == ["new one\npage two"] * 4 + ["new "] * 4
+    assert len(calls) == 2
@@ -0,0 +1,58 @@
+import os
+
+from fulltext_index import INDEX_DIR_NAME, FullTextIndex
+
+
+def write_texts(text_dir, count):
+    text_dir.mkdir(exist_ok=True)
+    for i in range(count):
+        (text_dir / f"{i:06d}.txt").write_text(f"document {i} about collision deductible policy {i % 3}",
+                                               encoding="utf-8")
+
+
+def test_persisted_shards_round_trip(tmp_path):
+    write_texts(tmp_path, 40)
+    index = FullTextIndex(tmp_path, tmp_path / INDEX_DIR_NAME, shards=8)
+    assert index.refresh() == 40
+    expected = index.search('"collision deductible" policy', limit=50)
+
+    reloaded = FullTextIndex(tmp_path, tmp_path / INDEX_DIR_NAME, shards=8)
+    assert reloaded.refresh() == 0
+    assert reloaded.search('"collision deductible" policy', limit=50) == expected
+    assert len(expected) == 40
+
+
+def test_change_rewrites_only_its_shard(tmp_path):
+    write_texts(tmp_path, 40)
+    index = FullTextIndex(tmp_path, tmp_path / INDEX_DIR_NAME, shards=8, persist_interval=0)
+    index.refresh()
+    written = index.shard_writes
+
+    changed = tmp_path / "000007.txt"
+    changed.write_text("entirely new wording", encoding="utf-8")
+    os.utime(changed, ns=(1, 1))
+    assert index.refresh() == 1
+    assert index.shard_writes == written + 1
+
+    reloaded = FullTextIndex(tmp_path, tmp_path / INDEX_DIR_NAME, shards=8)
+    reloaded.load()
+    assert reloaded.search("wording") == index.search("wording")
+    assert reloaded.docs["000007.pdf"]["mtime_ns"] == 1
+
+
+def test_writes_are_debounced_until_save(tmp_path):
+    write_texts(tmp_path, 5)
+    index = FullTextIndex(tmp_path, tmp_path / INDEX_DIR_NAME, shards=4, persist_interval=3600)
+    index.refresh()  # first write is immediate
+    written = index.shard_writes
+
+    (tmp_path / "000099.txt").write_text("late arrival", encoding="utf-8")
+    index.refresh()
+    assert index.shard_writes == written
+    assert index.stats()["unsaved_shards"] == 1
+    assert index.search("arrival")
+
+    assert index.save() == 1
+    reloaded = FullTextIndex(tmp_path, tmp_path / INDEX_DIR_NAME, shards=4)
+    reloaded.load()
+    assert reloaded.search("arrival") == index.search("arrival")
@@ -0,0 +1,125 @@
+import json
+import logging
+import multiprocessing
+
+import pytest
+
+from columnar_index import write_columnar
+from index_store import IndexStore
+
+INDEX = {"000001.pdf": {"customer": "Customer 1"}, "000002.pdf": {"customer": "Customer 2"}}
+
+
+def make_store(tmp_path, backend="json", **kwargs):
+    if backend == "columnar":
+        index_file = tmp_path / "indexes.cidx"
+        if not index_file.exists():
+            write_columnar(INDEX, index_file)
+    else:
+        index_file = tmp_path / "indexes.json"
+        if not index_file.exists():
+            index_file.write_text(json.dumps(INDEX), encoding="utf-8")
+    return IndexStore(index_file, check_interval=0, backend=backend, log_file=tmp_path / "indexes.log", **kwargs)
+
+
+@pytest.mark.parametrize("backend", ["json", "columnar"])
+def test_stores_sharing_a_log_see_each_others_changes(tmp_path, backend):
+    a = make_store(tmp_path, backend)
+    b = make_store(tmp_path, backend)
+    a.get(), b.get()
+
+    a.upsert({"000003.pdf": {"customer": "Customer 3"}})
+    assert b.get().engine.get("000003.pdf") == {"customer": "Customer 3"}
+    assert b.delete(["000001.pdf"]) == ["000001.pdf"]
+    assert a.get().engine.get("000001.pdf") is None
+
+    # B compacts: A's upsert is written to the index file rather than lost
+    assert b.compact() == 2
+    b.upsert({"000004.pdf": {"customer": "Customer 4"}})
+    for store in (a, b, make_store(tmp_path, backend)):
+        assert sorted(store.get().data) == ["000002.pdf", "000003.pdf", "000004.pdf"]
+
+
+def write_documents(tmp_path, worker, count):
+    store = make_store(tmp_path, compact_every=7)
+    for i in range(count):
+        store.upsert({f"{worker}-{i:03d}.pdf": {"worker": worker}})
+    store.delete([f"{worker}-000.pdf"])
+    store.compact()
+
+
+def test_concurrent_processes_keep_every_change(tmp_path):
+    make_store(tmp_path).get()
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=write_documents, args=(tmp_path, w, 40)) for w in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    expected = set(INDEX) | {f"{w}-{i:03d}.pdf" for w in range(4) for i in range(1, 40)}
+    assert set(make_store(tmp_path).get().data) == expected
+    # Everything was folded into the index file
+    assert set(json.loads((tmp_path / "indexes.json").read_text(encoding="utf-8"))) == expected
+
+
+def test_columnar_backend_falls_back_to_json_until_converted(tmp_path, caplog):
+    (tmp_path / "indexes.json").write_text(json.dumps(INDEX), encoding="utf-8")
+    store = IndexStore(tmp_path / "indexes.cidx", check_interval=0, backend="columnar",
+                       log_file=tmp_path / "indexes.log")
+    logging.getLogger("content_server.index_store").addHandler(caplog.handler)
+    try:
+        assert dict(store.get().data) == INDEX
+    finally:
+        logging.getLogger("content_server.index_store").removeHandler(caplog.handler)
+    assert "indexes.cidx not found; serving" in caplog.text
+    assert store.stats()["source"] == str(tmp_path / "indexes.json")
+
+    write_columnar(INDEX, tmp_path / "indexes.cidx")
+    assert dict(store.get().data) == INDEX
+    assert store.stats()["source"] == str(tmp_path / "indexes.cidx")
+
+
+def test_unreadable_index_is_reported(tmp_path):
+    (tmp_path / "indexes.json").write_text("{not json", encoding="utf-8")
+    store = make_store(tmp_path)
+    assert dict(store.get().data) == {}
+    assert store.stats()["reload_errors"] == 1
+    assert store.stats()["source"] is None
+
+
+def test_compaction_keeps_indexes_json_without_columnar_file(tmp_path):
+    (tmp_path / "indexes.json").write_text(json.dumps(INDEX), encoding="utf-8")
+    store = IndexStore(tmp_path / "indexes.cidx", check_interval=0, backend="columnar",
+                       log_file=tmp_path / "indexes.log")
+    store.upsert({"000008.pdf": {"customer": "XYY"}})
+    assert store.compact() == 1
+
+    expected = {**INDEX, "000008.pdf": {"customer": "XYY"}}
+    assert json.loads((tmp_path / "indexes.json").read_text(encoding="utf-8")) == expected
+    assert dict(store.get().data) == expected
+    assert store.stats()["source"] == str(tmp_path / "indexes.cidx")
+
+
+def test_compaction_refuses_to_replace_unreadable_index(tmp_path):
+    (tmp_path / "indexes.json").write_text("{not json", encoding="utf-8")
+    store = make_store(tmp_path)
+    store.upsert({"000008.pdf": {"customer": "XYY"}})
+
+    with pytest.raises(RuntimeError, match="missing or could not be read"):
+        store.compact()
+    assert (tmp_path / "indexes.json").read_text(encoding="utf-8") == "{not json"
+    assert (tmp_path / "indexes.log").stat().st_size > 0
+
+
+def test_compaction_refuses_to_replace_edited_indexes_json(tmp_path):
+    store = make_store(tmp_path, "columnar")
+    store.get()
+    edited = json.dumps({**INDEX, "000009.pdf": {"customer": "Edited"}})
+    (tmp_path / "indexes.json").write_text(edited, encoding="utf-8")
+    store.upsert({"000008.pdf": {"customer": "XYY"}})
+
+    with pytest.raises(RuntimeError, match="convert_index"):
+        store.compact()
+    assert (tmp_path / "indexes.json").read_text(encoding="utf-8") == edited
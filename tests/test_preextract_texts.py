@@ -0,0 +1,35 @@
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("PyPDF2")
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SCRIPT = REPO_ROOT / "scripts" / "preextract_texts.py"
+
+
+def run(assets_dir):
+    return subprocess.run([sys.executable, str(SCRIPT), "--assets-dir", str(assets_dir), "--workers", "1"],
+                          capture_output=True, text=True)
+
+
+def test_failed_pdf_is_reported_and_retried(tmp_path):
+    shutil.copy(REPO_ROOT / "assets" / "000001.pdf", tmp_path / "000001.pdf")
+    (tmp_path / "broken.pdf").write_bytes(b"not a pdf")
+
+    done = run(tmp_path)
+    assert done.returncode == 1
+    assert "Failed to extract broken.pdf" in done.stdout
+    manifest = json.loads((tmp_path / "texts" / ".manifest.json").read_text(encoding="utf-8"))
+    assert list(manifest) == ["000001.pdf"]
+    assert (tmp_path / "texts" / "000001.txt").exists()
+    assert not (tmp_path / "texts" / "broken.txt").exists()
+
+    # Not recorded as up to date: the next run tries it again
+    done = run(tmp_path)
+    assert done.returncode == 1
+    assert "1 unchanged, 1 to extract" in done.stdout
@@ -0,0 +1,168 @@
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("uvicorn")
+import prefork
+from prefork import Supervisor, _Worker
+
+
+def make_supervisor(workers=2):
+    supervisor = Supervisor(None, "127.0.0.1", 0, workers, preload=lambda: None)
+    spawned = []
+
+    def spawn():
+        worker = _Worker(1000 + len(spawned), -1)
+        supervisor._workers[worker.pid] = worker
+        spawned.append(worker)
+        return worker
+
+    supervisor._spawn = spawn
+    return supervisor, spawned
+
+
+def exit_workers(monkeypatch, *pids):
+    exits = [(pid, 256) for pid in pids]
+    monkeypatch.setattr(prefork.os, "waitpid", lambda pid, options: exits.pop(0) if exits else (0, 0))
+
+
+def test_workers_dying_during_startup_back_off(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(prefork.time, "monotonic", lambda: clock[0])
+    supervisor, spawned = make_supervisor()
+    supervisor._maintain()
+    assert len(spawned) == 2
+
+    for delay in (2, 4, 8, 16, 30, 30):
+        exit_workers(monkeypatch, spawned[-1].pid)
+        supervisor._reap()
+        assert supervisor._next_spawn_at == clock[0] + delay
+        clock[0] += delay - 0.5
+        supervisor._maintain()
+        assert len(supervisor._workers) == 1
+        clock[0] += 0.5
+        supervisor._maintain()
+        assert len(supervisor._workers) == 2
+
+
+def test_ready_worker_exit_is_replaced_at_once(monkeypatch):
+    supervisor, spawned = make_supervisor()
+    supervisor._crashes = 3
+    supervisor._maintain()
+    spawned[0].ready = True
+
+    exit_workers(monkeypatch, spawned[0].pid)
+    supervisor._reap()
+    assert (supervisor._crashes, supervisor._next_spawn_at) == (3, 0.0)
+    supervisor._maintain()
+    assert len(spawned) == 3 and len(supervisor._workers) == 2
+
+
+class Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_events_go_to_the_structured_logger(monkeypatch):
+    supervisor, spawned = make_supervisor()
+    assert supervisor.logger.name == "content_server.supervisor"
+    assert supervisor.logger.parent.handlers  # configured by observability.configure_logging
+    supervisor._maintain()
+
+    handler = Records()
+    supervisor.logger.addHandler(handler)
+    try:
+        exit_workers(monkeypatch, spawned[0].pid)
+        supervisor._reap()
+    finally:
+        supervisor.logger.removeHandler(handler)
+    [record] = handler.records
+    assert record.levelno == logging.WARNING
+    assert (record.pid, record.status, record.during_startup) == (spawned[0].pid, 256, True)
+
+
+SERVER = """
+import sys
+from prefork import Supervisor
+
+generation = 0
+
+def load():
+    global generation
+    generation += 1
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    import os
+    body = f"{os.getpid()} {generation}".encode()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+Supervisor(app, "127.0.0.1", int(sys.argv[1]), 2, preload=load, graceful_timeout=5).run()
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def responses(port, count=20):
+    """The distinct ``pid generation`` answers of ``count`` requests."""
+    seen = set()
+    for _ in range(count):
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5) as response:
+            seen.add(response.read().decode())
+    return seen
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            result = condition()
+            if result:
+                return result
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise AssertionError("timed out")
+
+
+def test_forked_workers_restart_on_sighup(tmp_path):
+    port = free_port()
+    src = Path(__file__).resolve().parent.parent / "src"
+    script = tmp_path / "server.py"
+    script.write_text(textwrap.dedent(SERVER), encoding="utf-8")
+    env = {**os.environ, "PYTHONPATH": str(src)}
+    process = subprocess.Popen([sys.executable, str(script), str(port)], env=env,
+                               stderr=subprocess.PIPE, text=True)
+    try:
+        before = wait_for(lambda: responses(port))
+        assert {answer.split()[1] for answer in before} == {"1"}
+
+        process.send_signal(signal.SIGHUP)
+        after = wait_for(lambda: (seen := responses(port)) and all(a.endswith(" 2") for a in seen) and seen)
+        old_pids = {answer.split()[0] for answer in before}
+        assert not old_pids & {answer.split()[0] for answer in after}
+    finally:
+        process.send_signal(signal.SIGTERM)
+        _, stderr = process.communicate(timeout=30)
+    assert process.returncode == 0
+    assert "content_server.supervisor: worker ready" in stderr
+    assert "graceful restart" in stderr
@@ -0,0 +1,124 @@
+import random
+
+import pytest
+
+from columnar_index import ColumnarIndex, ColumnarQueryEngine, write_columnar
+from query_engine import QueryEngine, decode_cursor, encode_cursor, iteration_key, sort_entry
+from search_filters import _MISSING, parse_filters
+
+FILTERS = [
+    {},
+    {"customer": ["Customer 3"]},
+    {"customer": ["customer 1*", "!customer 12"]},
+    {"invoice_amount": [">5000"]},
+    {"invoice_amount": ["between 2000..4000"], "document_type": ["loan agreement"]},
+    {"balance": ["<=50", "!0"]},
+    {"issued": [">=2024-06-01"]},
+    {"document_type": ["*agreement"], "balance": [">0"]},
+    {"reference": ["inv-??1?"]},
+    {"invoice_amount": ["!>100"]},
+]
+SORTS = [None, "invoice_amount", "customer", "issued", "reference", "unknown_field"]
+
+
+def generate(count, seed=11):
+    rng = random.Random(seed)
+    data = {}
+    for i in range(count):
+        meta = {
+            "document_type": rng.choice(["Loan Agreement", "Auto Insurance Policy", "Services Agreement"]),
+            "customer": f"Customer {rng.randrange(20)}",
+            "issued": f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+        }
+        # Missing fields, mixed numbers and numeric strings, like real indexes
+        if rng.random() < 0.85:
+            meta["invoice_amount"] = rng.choice([rng.randrange(100, 10000), rng.randrange(100, 10000) + 0.5,
+                                                 str(rng.randrange(100, 10000))])
+        if rng.random() < 0.7:
+            meta["balance"] = rng.choice([0, 50, rng.randrange(0, 2000)])
+        if rng.random() < 0.5:
+            meta["reference"] = f"INV-{rng.randrange(10000):04d}"
+        data[f"{i:06d}.pdf"] = meta
+    return data
+
+
+def scan(data, filters):
+    """The linear scan the indexed engines replace: every document tested against every filter."""
+    parsed = parse_filters(filters)
+    return [doc_id for doc_id, meta in data.items() if all(f.matches(meta.get(f.field, _MISSING)) for f in parsed)]
+
+
+def scan_sorted(data, filters, sort_by, descending):
+    matches = set(scan(data, filters))
+    entries = [sort_entry(meta.get(sort_by, _MISSING), pos)
+               for pos, (doc_id, meta) in enumerate(data.items()) if doc_id in matches]
+    entries.sort(key=lambda entry: iteration_key(entry, descending))
+    doc_ids = list(data)
+    return [doc_ids[entry[2]] for entry in entries]
+
+
+def all_pages(engine, filters, sort_by, descending, limit):
+    doc_ids, after = [], None
+    while True:
+        page, total, after = engine.page(filters, sort_by, descending, limit, after)
+        doc_ids += page
+        if after is None:
+            return doc_ids, total
+        # Through the opaque cursor, as /api/v1/search hands it to clients
+        after = decode_cursor(encode_cursor(sort_by, descending, after), sort_by, descending)
+
+
+def engines(data, tmp_path):
+    write_columnar(data, tmp_path / "indexes.cidx")
+    return [QueryEngine(dict(data)), ColumnarQueryEngine(ColumnarIndex(tmp_path / "indexes.cidx"))]
+
+
+def change(data, engine_list):
+    """The same upserts and deletes applied to the reference dict and every engine."""
+    rng = random.Random(5)
+    for doc_id in rng.sample(sorted(data), 30):
+        meta = {"customer": f"Customer {rng.randrange(20)}", "invoice_amount": rng.randrange(100, 10000)}
+        data[doc_id] = meta
+        for engine in engine_list:
+            engine.upsert(doc_id, meta)
+    for doc_id in rng.sample(sorted(data), 20):
+        del data[doc_id]
+        for engine in engine_list:
+            engine.delete(doc_id)
+    for i in range(10):
+        meta = {"customer": "Customer 3", "reference": f"INV-{i:04d}", "balance": i}
+        data[f"new-{i}.pdf"] = meta
+        for engine in engine_list:
+            engine.upsert(f"new-{i}.pdf", meta)
+
+
+@pytest.mark.parametrize("changed", [False, True])
+def test_search_matches_linear_scan(tmp_path, changed):
+    data = generate(600)
+    engine_list = engines(data, tmp_path)
+    if changed:
+        change(data, engine_list)
+    for filters in FILTERS:
+        expected = scan(data, filters)
+        for engine in engine_list:
+            assert engine.search(filters) == expected, (type(engine).__name__, filters)
+
+
+@pytest.mark.parametrize("changed", [False, True])
+def test_pages_match_sorted_scan(tmp_path, changed):
+    data = generate(400)
+    engine_list = engines(data, tmp_path)
+    if changed:
+        change(data, engine_list)
+    for filters in FILTERS:
+        for sort_by in SORTS:
+            for descending in (False, True):
+                if sort_by is None:
+                    expected = scan(data, filters)[::-1] if descending else scan(data, filters)
+                else:
+                    expected = scan_sorted(data, filters, sort_by, descending)
+                for engine in engine_list:
+                    label = (type(engine).__name__, filters, sort_by, descending)
+                    # Cursor paging in small pages, and everything in one page
+                    assert all_pages(engine, filters, sort_by, descending, 7) == (expected, len(expected)), label
+                    assert engine.page(filters, sort_by, descending)[0] == expected, label